@@ -7,10 +7,14 @@ from typing import Iterable
 
 import duckdb
 import httpx
+import shapely
 import xarray as xr
 from rioxarray.exceptions import NoDataInBounds
 from shapely.geometry import shape
 
+from app.domain.repositories.aoi_geometry_catalog import aoi_geometry_catalog
+from app.domain.repositories.zarr_store_registry import zarr_store_registry
+
 JULIAN_DATE_2021 = 2459215
 
 
@@ -27,7 +31,14 @@ async def send_request_to_data_api(url, params):
     return response.json()
 
 
-async def get_geojsons_from_data_api(aoi, send_request=send_request_to_data_api):
+async def get_geojsons_from_data_api(
+    aoi, send_request=send_request_to_data_api, catalog=aoi_geometry_catalog
+):
+    if catalog is not None:
+        geojsons = get_geojsons_from_catalog(aoi, catalog)
+        if geojsons is not None:
+            return geojsons
+
     url, params = get_geojson_request_for_data_api(aoi)
     response = await send_request(url, params)
 
@@ -41,6 +52,20 @@ async def get_geojsons_from_data_api(aoi, send_request=send_request_to_data_api)
     return geojsons
 
 
+def get_geojsons_from_catalog(aoi, catalog):
+    """Read the AOI geometries from the local catalog, in the same order the Data
+    API returns them. Returns None unless every id is in the catalog."""
+    ids = sorted(str(i) for i in aoi["ids"])
+    rows = catalog.lookup(aoi["type"], ids)
+    if any(aoi_id not in rows for aoi_id in ids):
+        return None
+    return [
+        json.loads(shapely.to_geojson(geometry))
+        for aoi_id in ids
+        for geometry, _ in rows[aoi_id]
+    ]
+
+
 def get_geojson_request_for_data_api(aoi):
     value_list = get_sql_in_list(aoi["ids"])
     if aoi["type"] == "key_biodiversity_area":
@@ -105,11 +130,7 @@ def read_zarr(uri, group: str | None = None):
 
 
 def _open_zarr(uri, group: str | None = None):
-    return xr.open_zarr(
-        uri,
-        group=group,
-        storage_options={"requester_pays": True},
-    )
+    return zarr_store_registry.open(uri, group=group)
 
 
 def _get_api_key():
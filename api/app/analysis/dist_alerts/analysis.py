@@ -2,21 +2,29 @@ from functools import partial
 from typing import Dict, Optional
 
 import dask.dataframe as dd
-import duckdb
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import xarray as xr
 from dask.dataframe import DataFrame as DaskDataFrame
 from flox.xarray import xarray_reduce
 
 from ...domain.models.dataset import Dataset
+from ...infrastructure.external_services.admin_results_mirror import (
+    admin_results_mirror,
+)
+from ...infrastructure.external_services.duck_db_query_service import process_pool
 from ..common.analysis import (
     JULIAN_DATE_2021,
     get_geojson,
-    initialize_duckdb,
     read_zarr_clipped_to_geojson,
 )
-from .query import create_gadm_dist_query
+from .query import (
+    GADM_LEVEL_COLUMNS,
+    INTERSECTION_COLUMNS,
+    create_batched_gadm_dist_query,
+)
 
 NATURAL_LANDS_CLASSES = {
     2: "Natural forests",
@@ -213,7 +221,11 @@ async def zonal_statistics(
 
 
 async def get_precomputed_statistics(
-    aoi, intersection: Optional[str], dask_client, version: str
+    aoi,
+    intersection: Optional[str],
+    version: str,
+    query_pool=process_pool,
+    resident_tables=None,
 ):
     if aoi["type"] != "admin" or intersection not in [
         None,
@@ -227,16 +239,62 @@ async def get_precomputed_statistics(
         )
 
     table = get_precomputed_table(aoi["type"], intersection, version)
-    precompute_partial = partial(
-        get_precomputed_statistic_on_gadm_aoi, table=table, intersection=intersection
-    )
-    futures = dask_client.map(precompute_partial, aoi["ids"])
-    results = await dask_client.gather(futures)
-    alerts_df = pd.concat(results)
+    resident_table = None
+    if resident_tables is not None:
+        resident_table = resident_tables.get(table)
+    if resident_table is not None:
+        alerts_df = query_resident_table(resident_table, aoi["ids"], intersection)
+        alerts_df["aoi_type"] = "admin"
+        return alerts_df
+
+    if admin_results_mirror is not None:
+        table = admin_results_mirror.resolve(table)
+
+    # one scan for every requested id, on the API's warm DuckDB workers
+    query = create_batched_gadm_dist_query(aoi["ids"], table, intersection)
+    alerts_df = await query_pool.run(query)
+    alerts_df["aoi_type"] = "admin"
 
     return alerts_df
 
 
+def query_resident_table(table, aoi_ids, intersection: Optional[str]) -> pd.DataFrame:
+    """Answer ``create_batched_gadm_dist_query`` from a resident DIST table.
+
+    The table is keyed by country; each id's rows are narrowed to its region
+    and subregion, then grouped and summed like its own query. Concatenating
+    the ids' results gives the batched query's row order, columns and dtypes.
+    """
+    intersection_col = INTERSECTION_COLUMNS.get(intersection)
+    results = []
+    for aoi_id in aoi_ids:
+        gadm_id = aoi_id.split(".")
+        rows = table.rows([gadm_id[0]])
+        for column, part in zip(GADM_LEVEL_COLUMNS[1:], gadm_id[1:]):
+            rows = rows.filter(pc.equal(rows.column(column), int(part)))
+
+        keys = GADM_LEVEL_COLUMNS[: len(gadm_id)]
+        if intersection_col:
+            keys = keys + [intersection_col]
+        keys = keys + ["dist_alert_date", "dist_alert_confidence"]
+        summed = (
+            rows.group_by(keys)
+            .aggregate([("area_ha", "sum")])
+            .sort_by([(key, "ascending") for key in keys])
+        )
+        dates = pc.cast(summed.column("dist_alert_date"), pa.timestamp("s"))
+        result = summed.select(keys[:-2]).to_pandas()
+        result["dist_alert_date"] = pc.strftime(dates, "%Y-%m-%d").to_pandas()
+        result["dist_alert_confidence"] = summed.column(
+            "dist_alert_confidence"
+        ).to_pandas()
+        result["area_ha"] = summed.column("area_ha_sum").to_pandas().astype("float32")
+        result["aoi_id"] = aoi_id
+        results.append(result)
+
+    return pd.concat(results, ignore_index=True)
+
+
 def get_precomputed_table(
     aoi_type: str, intersection: Optional[str], version: str
 ) -> str:
@@ -258,17 +316,3 @@ def get_precomputed_table(
         raise ValueError(f"No way to calculate aoi type {aoi_type}")
 
     return f"s3://lcl-analytics/zonal-statistics/dist-alerts/{version}/{table}.parquet"
-
-
-async def get_precomputed_statistic_on_gadm_aoi(id, table, intersection):
-    # GADM IDs are coming joined by '.', e.g. IDN.24.9
-    gadm_id = id.split(".")
-
-    initialize_duckdb()
-    query = create_gadm_dist_query(gadm_id, table, intersection)
-    alerts_df = duckdb.query(query).df()
-
-    alerts_df["aoi_id"] = id
-    alerts_df["aoi_type"] = "admin"
-
-    return alerts_df
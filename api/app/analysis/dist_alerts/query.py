@@ -1,4 +1,12 @@
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
+
+GADM_LEVEL_COLUMNS = ["country", "region", "subregion"]
+INTERSECTION_COLUMNS = {
+    "driver": "driver",
+    "natural_lands": "natural_land_class",
+    "grasslands": "grasslands",
+    "land_cover": "land_cover",
+}
 
 
 def create_gadm_dist_query(
@@ -9,16 +17,7 @@ def create_gadm_dist_query(
     # TODO this should be done in a background task and written to file
     # Build up the DuckDB query based on GADM ID and intersection
 
-    intersection_col = None
-    if intersection is not None:
-        if intersection == "driver":
-            intersection_col = "driver"
-        elif intersection == "natural_lands":
-            intersection_col = "natural_land_class"
-        elif intersection == "grasslands":
-            intersection_col = "grasslands"
-        elif intersection == "land_cover":
-            intersection_col = "land_cover"
+    intersection_col = INTERSECTION_COLUMNS.get(intersection)
 
     from_clause = f"FROM '{table}'"
     select_clause = "SELECT country"
@@ -51,3 +50,92 @@ def create_gadm_dist_query(
     query = f"{select_clause} {from_clause} {where_clause} {group_by_clause} {order_by_clause}"
 
     return query
+
+
+def create_batched_gadm_dist_query(
+    aoi_ids: List[str], table: str, intersection: Optional[str] = None
+) -> str:
+    """One query returning what ``create_gadm_dist_query`` returns for each id.
+
+    Ids may be at different admin levels. Each level is one grouped join
+    against the requested ids at that level, and the levels are combined with
+    UNION ALL BY NAME, so region/subregion are NULL for ids above that level.
+    Rows come back in request order, each id ordered as its own query would be,
+    with an ``aoi_id`` column added.
+    """
+    intersection_col = INTERSECTION_COLUMNS.get(intersection)
+
+    # level (1 = country) -> [(aoi_id, position in request, gadm id parts)]
+    ids_by_level: Dict[int, List[Tuple[str, int, List[str]]]] = {}
+    for position, aoi_id in enumerate(aoi_ids):
+        gadm_id = aoi_id.split(".")
+        ids_by_level.setdefault(len(gadm_id), []).append((aoi_id, position, gadm_id))
+
+    level_queries = []
+    for level, ids in sorted(ids_by_level.items()):
+        columns = GADM_LEVEL_COLUMNS[:level]
+        values = ", ".join(
+            f"('{aoi_id}', {position}, '{gadm_id[0]}'"
+            + "".join(f", {int(part)}" for part in gadm_id[1:])
+            + ")"
+            for aoi_id, position, gadm_id in ids
+        )
+        countries = ", ".join(sorted({f"'{gadm_id[0]}'" for _, _, gadm_id in ids}))
+        group_columns = [f"t.{column}" for column in columns]
+        if intersection_col:
+            group_columns.append(f"t.{intersection_col}")
+
+        level_queries.append(
+            f"SELECT ids.aoi_id, ids.position, {', '.join(group_columns)}, "
+            "STRFTIME(t.dist_alert_date, '%Y-%m-%d') AS dist_alert_date, "
+            "t.dist_alert_confidence, SUM(t.area_ha)::FLOAT AS area_ha "
+            f"FROM '{table}' t "
+            f"JOIN (VALUES {values}) AS ids(aoi_id, position, {', '.join(columns)}) "
+            f"ON {' AND '.join(f't.{column} = ids.{column}' for column in columns)} "
+            f"WHERE t.country IN ({countries}) "
+            f"GROUP BY ids.aoi_id, ids.position, {', '.join(group_columns)}, "
+            "t.dist_alert_date, t.dist_alert_confidence"
+        )
+
+    output_columns = GADM_LEVEL_COLUMNS[: max(ids_by_level)]
+    if intersection_col:
+        output_columns.append(intersection_col)
+    by_columns = ", ".join(
+        output_columns + ["dist_alert_date", "dist_alert_confidence"]
+    )
+    union = " UNION ALL BY NAME ".join(f"({query})" for query in level_queries)
+    return (
+        f"SELECT {', '.join(_batched_select_columns(aoi_ids, intersection_col))} "
+        f"FROM ({union}) ORDER BY position, {by_columns}"
+    )
+
+
+def _batched_select_columns(
+    aoi_ids: List[str], intersection_col: Optional[str]
+) -> List[str]:
+    """Columns in the order concatenating the per-id results gave them.
+
+    That order is each column's first appearance across the ids in request
+    order. A level column that some ids don't have was float64 with NaN after
+    concatenation, so it's selected as DOUBLE rather than a nullable integer.
+    """
+    levels = [len(aoi_id.split(".")) for aoi_id in aoi_ids]
+    columns: List[str] = []
+    for level in levels:
+        id_columns = GADM_LEVEL_COLUMNS[:level]
+        if intersection_col:
+            id_columns = id_columns + [intersection_col]
+        id_columns = id_columns + [
+            "dist_alert_date",
+            "dist_alert_confidence",
+            "area_ha",
+            "aoi_id",
+        ]
+        columns.extend(column for column in id_columns if column not in columns)
+
+    # level columns below the highest requested level are NULL for some ids
+    nullable = set(GADM_LEVEL_COLUMNS) - set(GADM_LEVEL_COLUMNS[: min(levels)])
+    return [
+        f"{column}::DOUBLE AS {column}" if column in nullable else column
+        for column in columns
+    ]
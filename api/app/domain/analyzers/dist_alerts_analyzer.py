@@ -38,9 +38,11 @@ class DistAlertsAnalyzer(Analyzer):
         self,
         compute_engine=None,
         input_uris: Dict[str, str] | None = None,
+        resident_tables=None,
     ):
         self.compute_engine = compute_engine  # Dask Client, or not?
         self.input_uris = input_uris
+        self.resident_tables = resident_tables
 
     async def analyze(self, analysis: Analysis) -> None:
         if self.input_uris is None:
@@ -60,8 +62,8 @@ class DistAlertsAnalyzer(Analyzer):
             alerts_df = await get_precomputed_statistics(
                 aoi_dict,
                 intersection,
-                self.compute_engine,
                 version,
+                resident_tables=self.resident_tables,
             )
         else:
             alerts_df = await zonal_statistics_on_aois(
@@ -1,8 +1,11 @@
+from datetime import date
 from functools import partial
 from typing import Dict
 
 import dask.dataframe as dd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 from flox.xarray import xarray_reduce
 
 from app.analysis.common.analysis import JULIAN_DATE_2021, read_zarr_clipped_to_geojson
@@ -73,6 +76,36 @@ class IntegratedAlertsAnalyzer(ZonalStatisticsAnalyzer):
             "ORDER BY aoi_id, alert_date, alert_confidence"
         )
 
+    def query_resident_table(self, table, analytics_in) -> Dict:
+        # same rows and order as build_admin_query, without leaving the process
+        rows = table.rows(analytics_in.aoi.ids)
+        alert_date = pc.cast(rows.column("alert_date"), pa.date32(), safe=False)
+        in_range = pc.and_(
+            pc.greater_equal(alert_date, date.fromisoformat(analytics_in.start_date)),
+            pc.less_equal(alert_date, date.fromisoformat(analytics_in.end_date)),
+        )
+        rows = (
+            rows.set_column(
+                rows.column_names.index("alert_date"), "alert_date", alert_date
+            )
+            .filter(in_range)
+            .sort_by(
+                [
+                    ("aoi_id", "ascending"),
+                    ("alert_date", "ascending"),
+                    ("alert_confidence", "ascending"),
+                ]
+            )
+        )
+        return {
+            "aoi_id": rows.column("aoi_id").to_pylist(),
+            "alert_date": pc.strftime(
+                pc.cast(rows.column("alert_date"), pa.timestamp("s")), "%Y-%m-%d"
+            ).to_pylist(),
+            "alert_confidence": rows.column("alert_confidence").to_pylist(),
+            "area_ha": rows.column("area_ha").to_pylist(),
+        }
+
     def build_area_task(self, analytics_in):
         return partial(
             self.analyze_area,
@@ -69,5 +69,6 @@ class TreeCoverAnalyzer(Analyzer):
             aggregate=DatasetAggregate(datasets=[Dataset.area_hectares], func="sum"),
             group_bys=groupbys,
             filters=filters,
+            approximate=analytics_in.approximate,
         )
         analysis.result = await self.compute_engine.compute(analytics_in.aoi, query)
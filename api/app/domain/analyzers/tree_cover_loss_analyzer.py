@@ -8,6 +8,9 @@ from app.domain.compute_engines.dask_client_router import DaskClientRouter
 from app.domain.compute_engines.handlers.otf_implementations.flox_otf_handler import (
     FloxOTFHandler,
 )
+from app.domain.compute_engines.handlers.otf_implementations.otf_result_cache import (
+    OTFResultCache,
+)
 from app.domain.compute_engines.handlers.precalc_implementations.precalc_sql_query_builder import (  # noqa: E501
     PrecalcSqlQueryBuilder,
 )
@@ -23,6 +26,10 @@ from app.domain.repositories.data_api_aoi_geometry_repository import (
     DataApiAoiGeometryRepository,
 )
 from app.domain.repositories.zarr_dataset_repository import ZarrDatasetRepository
+from app.infrastructure.external_services.arrow_precalc_query_service import (
+    ArrowPrecalcQueryService,
+    ResidentAdminTables,
+)
 from app.infrastructure.external_services.duck_db_query_service import (
     DuckDbPrecalcQueryService,
 )
@@ -80,6 +87,7 @@ def _build_query(analytics_in: TreeCoverLossAnalyticsIn) -> DatasetQuery:
                 value=analytics_in.end_year,
             ),
         ],
+        approximate=analytics_in.approximate,
     )
 
     # if by driver, return across all years since that's how the model is
@@ -131,11 +139,15 @@ class TreeCoverLossAnalyzer(Analyzer):
         dataset_repository: ZarrDatasetRepository | None = None,
         aoi_geometry_repository: DataApiAoiGeometryRepository | None = None,
         input_uris: Dict[str, str] | None = None,
+        otf_result_cache: OTFResultCache | None = None,
+        resident_tables: ResidentAdminTables | None = None,
     ):
         self.dask_client_router = dask_client_router
         self.dataset_repository = dataset_repository
         self.aoi_geometry_repository = aoi_geometry_repository
         self.input_uris = input_uris
+        self.otf_result_cache = otf_result_cache
+        self.resident_tables = resident_tables
 
     @nr_agent.function_trace(name="TreeCoverLossAnalyzer.analyze")
     async def analyze(self, analysis: Analysis) -> None:
@@ -172,13 +184,23 @@ class TreeCoverLossAnalyzer(Analyzer):
         if self.input_uris is None:
             raise Exception("Input URIs must be provided for actual analysis")
 
-        query_service = DuckDbPrecalcQueryService(self.input_uris["admin_results_uri"])
-
+        admin_results_uri = self.input_uris["admin_results_uri"]
         query: DatasetQuery = _build_query(analytics_in)
-        query_builder = PrecalcSqlQueryBuilder()
-        sql_str: str = query_builder.build(analytics_in.aoi.ids, query)
 
-        results: Dict = await query_service.execute(sql_str)
+        resident_table = (
+            self.resident_tables.get(admin_results_uri)
+            if self.resident_tables is not None
+            else None
+        )
+        if resident_table is not None:
+            results: Dict = ArrowPrecalcQueryService(resident_table).execute(
+                analytics_in.aoi.ids, query
+            )
+        else:
+            query_service = DuckDbPrecalcQueryService(admin_results_uri)
+            query_builder = PrecalcSqlQueryBuilder()
+            sql_str: str = query_builder.build(analytics_in.aoi.ids, query)
+            results = await query_service.execute(sql_str)
 
         results["aoi_type"] = ["admin"] * len(results["aoi_id"])
 
@@ -193,6 +215,7 @@ class TreeCoverLossAnalyzer(Analyzer):
             dataset_repository=self.dataset_repository,
             aoi_geometry_repository=self.aoi_geometry_repository,
             dask_client_router=self.dask_client_router,
+            result_cache=self.otf_result_cache,
         )
 
         results = await handler.handle(analytics_in.aoi, query)
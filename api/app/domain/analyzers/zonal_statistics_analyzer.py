@@ -27,11 +27,13 @@ class ZonalStatisticsAnalyzer(Analyzer):
         duckdb_query_service=None,
         input_uris: Dict[str, str] | None = None,
         otf_timeout_seconds: float = 600,
+        resident_tables=None,
     ):
         self.compute_engine = compute_engine  # Dask Client, or not?
         self.duckdb_query_service = duckdb_query_service
         self.input_uris = input_uris
         self.otf_timeout_seconds = otf_timeout_seconds
+        self.resident_tables = resident_tables
 
     @nr_agent.function_trace(name="ZonalStatisticsAnalyzer.analyze")
     async def analyze(self, analysis: Analysis) -> None:
@@ -46,9 +48,15 @@ class ZonalStatisticsAnalyzer(Analyzer):
             analysis.result = await self._run_on_the_fly(analytics_in)
 
     async def _run_precomputed(self, analytics_in) -> Dict[str, Any]:
-        data: Dict = await self.duckdb_query_service.execute(
-            self.build_admin_query(analytics_in)
-        )
+        data = None
+        if self.resident_tables is not None:
+            table = self.resident_tables.get(self.duckdb_query_service.table_uri)
+            if table is not None:
+                data = self.query_resident_table(table, analytics_in)
+        if data is None:
+            data = await self.duckdb_query_service.execute(
+                self.build_admin_query(analytics_in)
+            )
         data["aoi_type"] = ["admin"] * len(data["aoi_id"])
         return data
 
@@ -84,6 +92,13 @@ class ZonalStatisticsAnalyzer(Analyzer):
     def build_admin_query(self, analytics_in) -> str:
         """Return the SQL to run against the precomputed admin table."""
 
+    def query_resident_table(self, table, analytics_in) -> Dict[str, Any] | None:
+        """Answer the admin query from an in-memory ``ResidentAdminTable``.
+
+        Returns None, i.e. use the SQL, unless a subclass implements it.
+        """
+        return None
+
     @abstractmethod
     def build_area_task(self, analytics_in):
         """Return a picklable callable ``(aoi, geojson) -> dd.DataFrame`` that
@@ -1,5 +1,9 @@
+import asyncio
 import logging
+import math
 import os
+from dataclasses import dataclass
+from typing import Iterable, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -8,12 +12,123 @@ logger = logging.getLogger(__name__)
 LOCAL_CLUSTER_AREA_THRESHOLD_HA = float(
     os.environ.get("LOCAL_CLUSTER_AREA_THRESHOLD_HA", 50_000_000)
 )
+# When the chunks a query reads can be estimated, these replace the area
+# threshold: the local cluster takes queries reading at most this many chunks
+# and bytes (uncompressed, summed over datasets).
+LOCAL_CLUSTER_MAX_CHUNKS = int(os.environ.get("LOCAL_CLUSTER_MAX_CHUNKS", 1_000))
+LOCAL_CLUSTER_MAX_BYTES = int(os.environ.get("LOCAL_CLUSTER_MAX_BYTES", 2 * 1024**3))
+# A cluster counts as busy with more tasks than this per worker thread, or
+# with its workers using more than this fraction of their memory limit.
+CLUSTER_BUSY_TASKS_PER_THREAD = float(
+    os.environ.get("CLUSTER_BUSY_TASKS_PER_THREAD", 4)
+)
+CLUSTER_BUSY_MEMORY_FRACTION = float(
+    os.environ.get("CLUSTER_BUSY_MEMORY_FRACTION", 0.8)
+)
+# How long to wait for a scheduler to report its load before routing without it.
+CLUSTER_LOAD_TIMEOUT_SECONDS = float(os.environ.get("CLUSTER_LOAD_TIMEOUT_SECONDS", 1))
+
+
+@dataclass(frozen=True)
+class DatasetGrid:
+    """Pixel grid and chunking of a raster dataset, in degrees."""
+
+    resolution: float
+    origin_x: float
+    origin_y: float
+    chunk_width: int
+    chunk_height: int
+    itemsize: int
+
+    @property
+    def chunk_bytes(self) -> int:
+        return self.chunk_width * self.chunk_height * self.itemsize
+
+
+@dataclass(frozen=True)
+class ReadEstimate:
+    chunks: int
+    bytes: int
+
+
+@dataclass(frozen=True)
+class ClusterLoad:
+    tasks: int
+    threads: int
+    memory: int
+    memory_limit: int
+
+    @property
+    def tasks_per_thread(self) -> float:
+        return self.tasks / max(self.threads, 1)
+
+    @property
+    def memory_fraction(self) -> float:
+        return self.memory / self.memory_limit if self.memory_limit else 0.0
+
+    @property
+    def busy(self) -> bool:
+        return (
+            self.tasks_per_thread > CLUSTER_BUSY_TASKS_PER_THREAD
+            or self.memory_fraction > CLUSTER_BUSY_MEMORY_FRACTION
+        )
+
+
+def estimate_read(geometries: Iterable, grids: Iterable[DatasetGrid]) -> ReadEstimate:
+    """Chunks and bytes read to cover each geometry's bbox in every grid.
+
+    Geometries are counted separately, so overlapping AOIs make this an upper
+    bound, as does reading whole chunks at the bbox edges.
+    """
+    bounds = [geometry.bounds for geometry in geometries]
+    chunks = 0
+    nbytes = 0
+    for grid in grids:
+        chunk_x = grid.resolution * grid.chunk_width
+        chunk_y = grid.resolution * grid.chunk_height
+        grid_chunks = 0
+        for min_x, min_y, max_x, max_y in bounds:
+            cols = math.floor((max_x - grid.origin_x) / chunk_x) - math.floor(
+                (min_x - grid.origin_x) / chunk_x
+            )
+            rows = math.floor((grid.origin_y - min_y) / chunk_y) - math.floor(
+                (grid.origin_y - max_y) / chunk_y
+            )
+            grid_chunks += (cols + 1) * (rows + 1)
+        chunks += grid_chunks
+        nbytes += grid_chunks * grid.chunk_bytes
+    return ReadEstimate(chunks=chunks, bytes=nbytes)
+
+
+def _scheduler_load(dask_scheduler) -> dict:
+    workers = list(dask_scheduler.workers.values())
+    return {
+        "tasks": sum(len(ws.processing) for ws in workers)
+        + len(dask_scheduler.queued)
+        + len(dask_scheduler.unrunnable),
+        "threads": dask_scheduler.total_nthreads,
+        "memory": sum(ws.memory.process for ws in workers),
+        "memory_limit": sum(ws.memory_limit or 0 for ws in workers),
+    }
 
 
 class DaskClientRouter:
-    """Selects a local or remote dask client based on total AOI area."""
+    """Selects a local or remote dask client for an on-the-fly analysis.
 
-    def __init__(self, local_client, remote_client, threshold_ha=None):
+    Queries whose read estimate fits the local limits go to the local cluster,
+    larger ones to the remote cluster. Without an estimate the total AOI area
+    decides. A query that fits locally still goes remote while the local
+    cluster is busy and the remote one isn't.
+    """
+
+    def __init__(
+        self,
+        local_client,
+        remote_client,
+        threshold_ha=None,
+        max_chunks: int = LOCAL_CLUSTER_MAX_CHUNKS,
+        max_bytes: int = LOCAL_CLUSTER_MAX_BYTES,
+    ):
         self.local_client = local_client
         self.remote_client = remote_client
         self.threshold_ha = (
@@ -21,18 +136,95 @@ class DaskClientRouter:
             if threshold_ha is not None
             else LOCAL_CLUSTER_AREA_THRESHOLD_HA
         )
+        self.max_chunks = max_chunks
+        self.max_bytes = max_bytes
+
+    async def route(
+        self, total_area_ha: float, estimate: Optional[ReadEstimate] = None
+    ):
+        """Like ``get_client``, also taking both clusters' current load into account."""
+        local_load = remote_load = None
+        if (
+            self.remote_client is not None
+            and self.remote_client is not self.local_client
+        ):
+            local_load, remote_load = await asyncio.gather(
+                self.sample_load(self.local_client),
+                self.sample_load(self.remote_client),
+            )
+        return self.get_client(total_area_ha, estimate, local_load, remote_load)
 
-    def get_client(self, total_area_ha: float):
-        if total_area_ha <= self.threshold_ha:
-            logger.info(
-                "Routing to local dask cluster (total_area_ha=%.2f, threshold=%.2f)",
-                total_area_ha,
-                self.threshold_ha,
+    def get_client(
+        self,
+        total_area_ha: float,
+        estimate: Optional[ReadEstimate] = None,
+        local_load: Optional[ClusterLoad] = None,
+        remote_load: Optional[ClusterLoad] = None,
+    ):
+        if estimate is not None:
+            fits_local = (
+                estimate.chunks <= self.max_chunks and estimate.bytes <= self.max_bytes
             )
-            return self.local_client
+        else:
+            fits_local = total_area_ha <= self.threshold_ha
+
+        use_local = fits_local
+        if (
+            fits_local
+            and local_load is not None
+            and local_load.busy
+            and not (remote_load is not None and remote_load.busy)
+        ):
+            use_local = False
+        if self.remote_client is None:
+            use_local = True
+
         logger.info(
-            "Routing to remote dask cluster (total_area_ha=%.2f, threshold=%.2f)",
-            total_area_ha,
-            self.threshold_ha,
+            {
+                "event": "dask_cluster_routed",
+                "cluster": "local" if use_local else "remote",
+                "fits_local": fits_local,
+                "total_area_ha": total_area_ha,
+                "threshold_ha": self.threshold_ha,
+                "estimated_chunks": estimate.chunks if estimate else None,
+                "estimated_bytes": estimate.bytes if estimate else None,
+                "max_chunks": self.max_chunks,
+                "max_bytes": self.max_bytes,
+                "local_tasks_per_thread": _tasks_per_thread(local_load),
+                "local_memory_fraction": _memory_fraction(local_load),
+                "remote_tasks_per_thread": _tasks_per_thread(remote_load),
+                "remote_memory_fraction": _memory_fraction(remote_load),
+            }
         )
-        return self.remote_client
+        return self.local_client if use_local else self.remote_client
+
+    @staticmethod
+    async def sample_load(client) -> Optional[ClusterLoad]:
+        """The cluster's queued and running tasks and worker memory, if available."""
+        run_on_scheduler = getattr(client, "run_on_scheduler", None)
+        if run_on_scheduler is None:
+            return None
+        try:
+            load = await asyncio.wait_for(
+                run_on_scheduler(_scheduler_load),
+                timeout=CLUSTER_LOAD_TIMEOUT_SECONDS,
+            )
+        except Exception as e:
+            logger.warning(
+                {
+                    "event": "dask_cluster_load_unavailable",
+                    "severity": "low",
+                    "error_type": e.__class__.__name__,
+                    "error_details": str(e),
+                }
+            )
+            return None
+        return ClusterLoad(**load)
+
+
+def _tasks_per_thread(load: Optional[ClusterLoad]) -> Optional[float]:
+    return round(load.tasks_per_thread, 2) if load else None
+
+
+def _memory_fraction(load: Optional[ClusterLoad]) -> Optional[float]:
+    return round(load.memory_fraction, 3) if load else None
@@ -1,26 +1,99 @@
+import asyncio
+import logging
+import math
+import os
 from functools import partial
-from typing import Optional
+from typing import List, Optional
 
 import numpy as np
 import pandas as pd
+import shapely
 import xarray as xr
 from flox.xarray import xarray_reduce
-from shapely.geometry import shape
+from shapely import STRtree
+from shapely.geometry import box, shape
 
 from app.analysis.common.geodesic_area import (
     compute_total_feature_collection_area_ha,
 )
-from app.domain.compute_engines.dask_client_router import DaskClientRouter
+from app.domain.compute_engines.dask_client_router import (
+    DaskClientRouter,
+    DatasetGrid,
+    estimate_read,
+)
 from app.domain.compute_engines.handlers.analytics_otf_handler import (
     AnalyticsOTFHandler,
 )
+from app.domain.compute_engines.handlers.otf_implementations.otf_result_cache import (
+    OTFResultCache,
+    result_cache_key,
+)
 from app.domain.models.dataset import Dataset, DatasetQuery
 from app.domain.models.environment import Environment
+from app.domain.repositories.chunk_summary_repository import (
+    ChunkSummaryRepository,
+    chunk_summary_repository,
+)
 from app.domain.repositories.data_api_aoi_geometry_repository import (
     DataApiAoiGeometryRepository,
 )
 from app.domain.repositories.zarr_dataset_repository import ZarrDatasetRepository
 
+# Reduce many AOIs in one task over a label raster instead of one task per AOI.
+OTF_LABEL_RASTER_ENABLED = (
+    os.environ.get("OTF_LABEL_RASTER_ENABLED", "false").lower() == "true"
+)
+# Skip the labelled pass when the AOIs' union bbox is more than this many times
+# the sum of their own bboxes, i.e. when they're too scattered to share chunks.
+OTF_LABEL_RASTER_MAX_EXTENT_RATIO = float(
+    os.environ.get("OTF_LABEL_RASTER_MAX_EXTENT_RATIO", 4)
+)
+AOI_LABEL = "aoi_label"
+# AOIs whose bbox covers more chunks than this are split into pieces reduced in
+# parallel. 0 disables splitting.
+OTF_SPLIT_MIN_CHUNKS = int(os.environ.get("OTF_SPLIT_MIN_CHUNKS", 64))
+# Width and height, in chunks, of the tiles an AOI is split along.
+OTF_SPLIT_TILE_CHUNKS = int(os.environ.get("OTF_SPLIT_TILE_CHUNKS", 4))
+
+
+def split_along_chunks(geometry, grid: DatasetGrid, tile_chunks: int):
+    """Cut ``geometry`` into the parts falling in each tile of
+    ``tile_chunks`` x ``tile_chunks`` chunks of ``grid``."""
+    tile_width = grid.resolution * grid.chunk_width * tile_chunks
+    tile_height = grid.resolution * grid.chunk_height * tile_chunks
+    min_x, min_y, max_x, max_y = geometry.bounds
+    cols = range(
+        math.floor((min_x - grid.origin_x) / tile_width),
+        math.floor((max_x - grid.origin_x) / tile_width) + 1,
+    )
+    rows = range(
+        math.floor((grid.origin_y - max_y) / tile_height),
+        math.floor((grid.origin_y - min_y) / tile_height) + 1,
+    )
+    tiles = np.array(
+        [
+            box(
+                grid.origin_x + col * tile_width,
+                grid.origin_y - (row + 1) * tile_height,
+                grid.origin_x + (col + 1) * tile_width,
+                grid.origin_y - row * tile_height,
+            )
+            for row in rows
+            for col in cols
+        ],
+        dtype=object,
+    )
+    shapely.prepare(geometry)
+    tiles = tiles[shapely.intersects(geometry, tiles)]
+    pieces = []
+    for piece in shapely.intersection(geometry, tiles):
+        if piece.geom_type == "GeometryCollection":
+            # drop the lines and points left where the AOI touches a tile edge
+            piece = shapely.union_all([p for p in piece.geoms if p.area > 0])
+        if piece.area > 0:
+            pieces.append(piece)
+    return pieces
+
 
 class FloxOTFHandler(AnalyticsOTFHandler):
     EXPECTED_GROUPS = {
@@ -38,6 +111,8 @@ class FloxOTFHandler(AnalyticsOTFHandler):
         aoi_geometry_repository=DataApiAoiGeometryRepository(),
         dask_client=None,
         dask_client_router: Optional[DaskClientRouter] = None,
+        result_cache: Optional[OTFResultCache] = None,
+        chunk_summaries: Optional[ChunkSummaryRepository] = chunk_summary_repository,
     ):
         if dataset_repository is None:
             dataset_repository = ZarrDatasetRepository(environment=environment)
@@ -45,12 +120,42 @@ class FloxOTFHandler(AnalyticsOTFHandler):
         self.aoi_geometry_repository = aoi_geometry_repository
         self.dask_client = dask_client
         self.dask_client_router = dask_client_router
+        self.result_cache = result_cache
+        self.chunk_summaries = chunk_summaries
 
-    def _resolve_dask_client(self, total_area_ha: float):
+    async def _resolve_dask_client(self, total_area_ha: float, geometries, grids):
         if self.dask_client_router is not None:
-            return self.dask_client_router.get_client(total_area_ha)
+            estimate = estimate_read(geometries, grids) if grids else None
+            return await self.dask_client_router.route(total_area_ha, estimate)
         return self.dask_client
 
+    async def _dataset_grids(
+        self, query: DatasetQuery, dataset_repository
+    ) -> List[DatasetGrid]:
+        """Grids of the datasets the query reads, or [] if they aren't known."""
+        grid = getattr(dataset_repository, "grid", None)
+        if grid is None:
+            return []
+
+        datasets = dict.fromkeys(
+            query.aggregate.datasets
+            + query.group_bys
+            + [filt.dataset for filt in query.filters]
+        )
+        try:
+            # opening a store the first time goes to S3
+            return await asyncio.to_thread(lambda: [grid(ds) for ds in datasets])
+        except Exception as e:
+            logging.warning(
+                {
+                    "event": "dataset_grid_unavailable",
+                    "severity": "low",
+                    "error_type": e.__class__.__name__,
+                    "error_details": str(e),
+                }
+            )
+            return []
+
     async def handle(self, aoi, query: DatasetQuery):
         if aoi.type == "feature_collection":
             aoi_geometries = [
@@ -65,43 +170,350 @@ class FloxOTFHandler(AnalyticsOTFHandler):
             )
             total_area_ha = sum(areas_ha)
 
-        dask_client = self._resolve_dask_client(total_area_ha)
+        aois = list(zip(aoi.ids, aoi_geometries))
+        dataset_repository = self._dataset_repository_for(query)
+        cache_keys = self._result_cache_keys(aoi_geometries, query, dataset_repository)
+        results_per_aoi = self._get_cached_results(aoi.ids, cache_keys)
 
-        aoi_partial = partial(
-            self._handle,
-            query=query,
-            dataset_repository=self.dataset_repository,
-            expected_groups_per_dataset=self.EXPECTED_GROUPS,
-        )
-        futures = dask_client.map(aoi_partial, list(zip(aoi.ids, aoi_geometries)))
-        results_per_aoi = await dask_client.gather(futures)
+        missing = [i for i, result in enumerate(results_per_aoi) if result is None]
+        if missing:
+            missing_aois = [aois[i] for i in missing]
+            grids = await self._dataset_grids(query, dataset_repository)
+            dask_client = await self._resolve_dask_client(
+                total_area_ha, [geometry for _, geometry in missing_aois], grids
+            )
+
+            chunk_summary = (
+                self.chunk_summaries.find(query)
+                if self.chunk_summaries is not None and not query.approximate
+                else None
+            )
+            aoi_partial = partial(
+                self._handle,
+                query=query,
+                dataset_repository=dataset_repository,
+                expected_groups_per_dataset=self.EXPECTED_GROUPS,
+                chunk_summary=chunk_summary,
+            )
+            pieces = self._split_aois(missing_aois, grids)
+            if len(pieces) > len(missing_aois):
+                # reduce every piece in parallel, then add up each AOI's pieces
+                futures = dask_client.map(aoi_partial, pieces)
+                partials = await dask_client.gather(futures)
+                computed = [
+                    self._merge_partial_results(
+                        [
+                            result
+                            for (piece_id, _), result in zip(pieces, partials)
+                            if piece_id == aoi_id
+                        ],
+                        query,
+                    )
+                    for aoi_id, _ in missing_aois
+                ]
+            elif chunk_summary is None and self._can_label(missing_aois):
+                labelled_partial = partial(
+                    self._handle_labelled,
+                    query=query,
+                    dataset_repository=dataset_repository,
+                    expected_groups_per_dataset=self.EXPECTED_GROUPS,
+                )
+                futures = dask_client.map(labelled_partial, [missing_aois])
+                (combined,) = await dask_client.gather(futures)
+                computed = [
+                    combined[combined["aoi_id"] == aoi_id].reset_index(drop=True)
+                    for aoi_id, _ in missing_aois
+                ]
+            else:
+                futures = dask_client.map(aoi_partial, missing_aois)
+                computed = await dask_client.gather(futures)
+
+            for i, result in zip(missing, computed):
+                results_per_aoi[i] = result
+                if self.result_cache is not None:
+                    self.result_cache.set(cache_keys[i], result)
 
         results = pd.concat(results_per_aoi)
 
         for dataset in query.group_bys:
             col = dataset.get_field_name()
-            results[col] = self.dataset_repository.unpack(dataset, results[col])
+            results[col] = dataset_repository.unpack(dataset, results[col])
 
         results["aoi_type"] = aoi.type
         return results.to_dict(orient="list")
 
     @staticmethod
-    def _handle(aoi, query, dataset_repository, expected_groups_per_dataset):
+    def _split_aois(aois, grids: List[DatasetGrid]):
+        """Split AOIs covering many chunks into pieces along the chunk grid.
+
+        Tiles follow the chunk boundaries of the coarsest-chunked dataset, which
+        fall on pixel edges, so every pixel centre lands in exactly one piece
+        and the pieces' group sums add up to the whole AOI's.
+        """
+        if not grids or OTF_SPLIT_MIN_CHUNKS <= 0:
+            return list(aois)
+
+        grid = max(grids, key=lambda g: g.resolution * g.chunk_width)
+        pieces = []
+        for aoi_id, geometry in aois:
+            if estimate_read([geometry], [grid]).chunks <= OTF_SPLIT_MIN_CHUNKS:
+                pieces.append((aoi_id, geometry))
+                continue
+            pieces.extend(
+                (aoi_id, piece)
+                for piece in split_along_chunks(geometry, grid, OTF_SPLIT_TILE_CHUNKS)
+            )
+        return pieces
+
+    @staticmethod
+    def _merge_partial_results(partials, query) -> pd.DataFrame:
+        """Add up the group sums (or counts) of an AOI's pieces."""
+        results = pd.concat(partials, ignore_index=True)
+        keys = ["aoi_id"] + [ds.get_field_name() for ds in query.group_bys]
+        agg_col_names = [ds.get_field_name() for ds in query.aggregate.datasets]
+        merged = (
+            results.groupby(keys, sort=True)[agg_col_names]
+            .sum(min_count=1)
+            .reset_index()
+        )
+        return FloxOTFHandler._drop_empty_rows(merged[results.columns], query)
+
+    @staticmethod
+    def _can_label(aois) -> bool:
+        """Whether ``aois`` can be reduced in a single labelled pass.
+
+        The AOIs must not overlap, since a pixel carries only one label, and
+        must be close together, since the pass reads their whole union bbox.
+        """
+        if not OTF_LABEL_RASTER_ENABLED or len(aois) < 2:
+            return False
+
+        geometries = np.array([geometry for _, geometry in aois], dtype=object)
+        extent_area = shapely.area(box(*shapely.total_bounds(geometries)))
+        bbox_area = shapely.area(shapely.envelope(geometries)).sum()
+        if extent_area > bbox_area * OTF_LABEL_RASTER_MAX_EXTENT_RATIO:
+            return False
+
+        left, right = STRtree(geometries).query(geometries, predicate="intersects")
+        pairs = left < right
+        overlaps = shapely.area(
+            shapely.intersection(geometries[left[pairs]], geometries[right[pairs]])
+        )
+        return not (overlaps > 0).any()
+
+    def _dataset_repository_for(self, query: DatasetQuery):
+        """The repository to read from: coarse overviews for approximate sums."""
+        overview = getattr(self.dataset_repository, "overview", None)
+        if not query.approximate or query.aggregate.func != "sum" or overview is None:
+            return self.dataset_repository
+        dataset_repository = overview(
+            query.aggregate.datasets
+            + query.group_bys
+            + [filt.dataset for filt in query.filters]
+        )
+        if dataset_repository is self.dataset_repository:
+            # request validation should have ruled this out
+            logging.warning(
+                {
+                    "event": "otf_approximate_overview_unavailable",
+                    "severity": "medium",
+                    "query": query.model_dump(mode="json"),
+                }
+            )
+        return dataset_repository
+
+    def _result_cache_keys(
+        self, aoi_geometries, query: DatasetQuery, dataset_repository
+    ):
+        if self.result_cache is None:
+            return [None] * len(aoi_geometries)
+
+        datasets = {
+            *query.aggregate.datasets,
+            *query.group_bys,
+            *(filter.dataset for filter in query.filters),
+        }
+        if Dataset.tree_cover_loss_from_fires in datasets:
+            datasets.add(Dataset.area_hectares)
+        dataset_uris = [
+            dataset_repository.resolve_zarr_uri(ds, dataset_repository.environment)
+            for ds in datasets
+        ]
+        return [
+            result_cache_key(geometry, query, dataset_uris)
+            for geometry in aoi_geometries
+        ]
+
+    def _get_cached_results(self, aoi_ids, cache_keys):
+        if self.result_cache is None:
+            return [None] * len(cache_keys)
+
+        results = []
+        for aoi_id, key in zip(aoi_ids, cache_keys):
+            result = self.result_cache.get(key)
+            if result is not None:
+                # the same geometry may have been cached under a different id
+                result["aoi_id"] = aoi_id
+            results.append(result)
+        return results
+
+    @staticmethod
+    def _handle(
+        aoi, query, dataset_repository, expected_groups_per_dataset, chunk_summary=None
+    ):
+        aoi_id, aoi_geometry = aoi
+        if chunk_summary is not None:
+            interior = chunk_summary.interior_chunks(aoi_geometry)
+            if interior:
+                return FloxOTFHandler._handle_with_summary(
+                    aoi,
+                    interior,
+                    query,
+                    dataset_repository,
+                    expected_groups_per_dataset,
+                    chunk_summary,
+                )
+
+        results = FloxOTFHandler._reduce(
+            query,
+            _AoiDatasetCache(dataset_repository, aoi_geometry),
+            expected_groups_per_dataset,
+        )
+        results["aoi_id"] = aoi_id
+        return FloxOTFHandler._drop_empty_rows(results, query)
+
+    @staticmethod
+    def _handle_with_summary(
+        aoi,
+        interior,
+        query,
+        dataset_repository,
+        expected_groups_per_dataset,
+        chunk_summary,
+    ):
+        """Answer ``interior`` chunks from the summary, and only read pixels for
+        the rest of the AOI.
+
+        Loads slice by a geometry's bounds, so the rest of the AOI is reduced
+        one chunk at a time; a load for the whole boundary would span, and
+        read, the interior chunks too. Chunk edges are pixel edges, so no pixel
+        is in two parts.
+        """
         aoi_id, aoi_geometry = aoi
+        summed = FloxOTFHandler._reduce_summary(
+            chunk_summary.rows(interior),
+            query,
+            dataset_repository,
+            expected_groups_per_dataset,
+        )
+        summed["aoi_id"] = aoi_id
+        partials = [summed]
+
+        boundary = shapely.difference(
+            aoi_geometry,
+            shapely.union_all([chunk_summary.chunk_box(chunk) for chunk in interior]),
+        )
+        if boundary.area > 0:
+            partials.extend(
+                FloxOTFHandler._handle(
+                    (aoi_id, piece),
+                    query,
+                    dataset_repository,
+                    expected_groups_per_dataset,
+                )
+                for piece in split_along_chunks(boundary, chunk_summary.grid, 1)
+            )
+        return FloxOTFHandler._merge_partial_results(partials, query)
+
+    @staticmethod
+    def _reduce_summary(
+        rows, query, dataset_repository, expected_groups_per_dataset
+    ) -> pd.DataFrame:
+        """Same filters, groups and sums as ``_reduce``, over summary rows."""
+        expected_groups_per_dataset = dict(expected_groups_per_dataset)
+
+        mask = np.ones(len(rows), dtype=bool)
+        for filter in query.filters:
+            translated_value = dataset_repository.translate(
+                filter.dataset, filter.value
+            )
+            mask &= FloxOTFHandler._get_filter_by_op(
+                rows[filter.dataset.get_field_name()].to_numpy(),
+                filter.op,
+                translated_value,
+            )
+            if filter.dataset in query.group_bys:
+                expected_groups_per_dataset[
+                    filter.dataset
+                ] = expected_groups_per_dataset[filter.dataset][
+                    FloxOTFHandler._get_filter_by_op(
+                        expected_groups_per_dataset[filter.dataset],
+                        filter.op,
+                        translated_value,
+                    )
+                ]
+        rows = rows[mask]
+
+        agg_col_names = [ds.get_field_name() for ds in query.aggregate.datasets]
+        if not query.group_bys:
+            return rows[agg_col_names].sum().to_frame().T
+
+        keys = [ds.get_field_name() for ds in query.group_bys]
+        expected_groups = [expected_groups_per_dataset[ds] for ds in query.group_bys]
+        # like flox, leave out values that aren't expected and emit every
+        # expected combination, empty ones as 0
+        for key, expected in zip(keys, expected_groups):
+            rows = rows[rows[key].isin(expected)]
+        index = (
+            pd.MultiIndex.from_product(expected_groups, names=keys)
+            if len(keys) > 1
+            else pd.Index(expected_groups[0], name=keys[0])
+        )
+        return (
+            rows.groupby(keys)[agg_col_names]
+            .sum()
+            .reindex(index, fill_value=0)
+            .reset_index()
+        )
+
+    @staticmethod
+    def _handle_labelled(aois, query, dataset_repository, expected_groups_per_dataset):
+        """Compute several non-overlapping AOIs in one pass over their extent.
+
+        Each AOI is burned into a label raster over the union bbox, and the label
+        becomes the first group-by, so every chunk is read once no matter how
+        many AOIs touch it.
+        """
+        aoi_ids, geometries = zip(*aois)
+        extent = box(*shapely.total_bounds(geometries))
+        results = FloxOTFHandler._reduce(
+            query,
+            _AoiDatasetCache(dataset_repository, extent),
+            expected_groups_per_dataset,
+            label_geometries=geometries,
+        )
+        results["aoi_id"] = np.asarray(aoi_ids)[results.pop(AOI_LABEL) - 1]
+        return FloxOTFHandler._drop_empty_rows(results, query)
+
+    @staticmethod
+    def _reduce(
+        query, datasets, expected_groups_per_dataset, label_geometries=None
+    ) -> pd.DataFrame:
         func = query.aggregate.func
+        dataset_repository = datasets.dataset_repository
+        # narrowed below per query, so don't mutate the caller's dict
+        expected_groups_per_dataset = dict(expected_groups_per_dataset)
 
         by = xr.Dataset()
         for ds in query.aggregate.datasets:
-            xarr = dataset_repository.load(ds, geometry=aoi_geometry).reindex_like(
-                by, method="nearest", tolerance=1e-5
-            )
+            xarr = datasets.load(ds).reindex_like(by, method="nearest", tolerance=1e-5)
             if ds == Dataset.tree_cover_loss_from_fires:
                 # TCLF zarr encodes lossyear identical to TCL, so here we get pixels
                 # where TCLF exists and replace with area_ha
                 if "area_ha" not in by:
-                    area_xarr = dataset_repository.load(
-                        Dataset.area_hectares, geometry=aoi_geometry
-                    ).reindex_like(by, method="nearest", tolerance=1e-5)
+                    area_xarr = datasets.load(Dataset.area_hectares).reindex_like(
+                        by, method="nearest", tolerance=1e-5
+                    )
                     by["area_ha"] = area_xarr
                 by[ds.get_field_name()] = xr.where(xarr > 0, by["area_ha"], 0)
             else:
@@ -109,15 +521,20 @@ class FloxOTFHandler(AnalyticsOTFHandler):
 
         objs = []
         expected_groups = []
+        # all filters on the same dataset (e.g. a TCL year range) are fused into a
+        # single mask over a single load
+        masks = {}
         for filter in query.filters:
             translated_value = dataset_repository.translate(
                 filter.dataset, filter.value
             )
-            da = dataset_repository.load(filter.dataset, geometry=aoi_geometry)
             filter_arr = FloxOTFHandler._get_filter_by_op(
-                da, filter.op, translated_value
+                datasets.load(filter.dataset), filter.op, translated_value
             )
-            by = by.where(filter_arr)
+            if filter.dataset in masks:
+                masks[filter.dataset] = masks[filter.dataset] & filter_arr
+            else:
+                masks[filter.dataset] = filter_arr
 
             if filter.dataset in query.group_bys:
                 # filter expected groups by the filter itself so it doesn't appear
@@ -132,8 +549,18 @@ class FloxOTFHandler(AnalyticsOTFHandler):
                     )
                 ]
 
+        for mask in masks.values():
+            by = by.where(mask)
+
+        if label_geometries is not None:
+            labels = dataset_repository.label_geometries(
+                by[next(iter(by.data_vars))], label_geometries
+            )
+            objs.append(labels.rename(AOI_LABEL))
+            expected_groups.append(np.arange(1, len(label_geometries) + 1))
+
         for group_by in query.group_bys:
-            da = dataset_repository.load(group_by, geometry=aoi_geometry).reindex_like(
+            da = datasets.load(group_by).reindex_like(
                 by, method="nearest", tolerance=1e-5
             )
             objs.append(da)
@@ -150,8 +577,11 @@ class FloxOTFHandler(AnalyticsOTFHandler):
         else:
             results = FloxOTFHandler._apply_xarr_func(by, func)
 
+        return results
+
+    @staticmethod
+    def _drop_empty_rows(results, query):
         # Filter out rows where results for all aggregate datasets are NaN
-        results["aoi_id"] = aoi_id
         agg_col_names = [ds.get_field_name() for ds in query.aggregate.datasets]
         filtered_results = results[~results[agg_col_names].isna().all(axis=1)]
 
@@ -217,3 +647,24 @@ class FloxOTFHandler(AnalyticsOTFHandler):
                 return expected_group != value
             case "in":
                 return set(expected_group) & set(value)
+
+
+class _AoiDatasetCache:
+    """Loads each dataset at most once while handling a single AOI.
+
+    A query commonly touches the same dataset several times (TCL as a >= and a
+    <= filter and as a group-by, area as an aggregate and for fires), and each
+    load re-slices and re-masks the store.
+    """
+
+    def __init__(self, dataset_repository, geometry):
+        self.dataset_repository = dataset_repository
+        self.geometry = geometry
+        self.loaded = {}
+
+    def load(self, dataset: Dataset) -> xr.DataArray:
+        if dataset not in self.loaded:
+            self.loaded[dataset] = self.dataset_repository.load(
+                dataset, geometry=self.geometry
+            )
+        return self.loaded[dataset]
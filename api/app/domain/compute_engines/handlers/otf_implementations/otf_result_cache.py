@@ -0,0 +1,167 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import pandas as pd
+from shapely import Geometry
+
+from app.domain.models.dataset import DatasetQuery
+
+# Memory budget for cached per-AOI results, in bytes. Defaults to 256 MiB.
+OTF_RESULT_CACHE_MAX_BYTES = int(
+    os.environ.get("OTF_RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+)
+# Optional directory for the on-disk tier. Unset disables it.
+OTF_RESULT_CACHE_DIR = os.environ.get("OTF_RESULT_CACHE_DIR")
+
+
+def geometry_hash(geometry: Geometry) -> str:
+    """Hash a geometry independent of ring orientation and vertex start point."""
+    return hashlib.sha256(geometry.normalize().wkb).hexdigest()
+
+
+def result_cache_key(
+    geometry: Geometry, query: DatasetQuery, dataset_uris: Iterable[str]
+) -> str:
+    """Build the cache key for a single AOI's partial result.
+
+    The key covers everything that determines the result: the AOI geometry, the
+    query (filters are order-independent, so they are sorted), and the URIs of
+    every dataset read. Dataset URIs carry their version, so publishing a new
+    version changes the key instead of serving stale results.
+    """
+    # exact queries leave out the flag, so their keys predate approximate mode
+    canonical_query = query.model_dump(
+        mode="json", exclude=None if query.approximate else {"approximate"}
+    )
+    canonical_query["filters"] = sorted(
+        canonical_query["filters"], key=lambda f: json.dumps(f, sort_keys=True)
+    )
+    payload = json.dumps(
+        {
+            "geometry": geometry_hash(geometry),
+            "query": canonical_query,
+            "dataset_uris": sorted(set(dataset_uris)),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class OTFResultCache:
+    """A size-bounded LRU of per-AOI on-the-fly results.
+
+    Entries live in memory up to ``max_bytes``. When ``directory`` is set, every
+    entry is also written there as parquet, so results survive memory eviction
+    and process restarts. Results are immutable for a given key, so there is no
+    TTL; eviction is purely by size.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = OTF_RESULT_CACHE_MAX_BYTES,
+        directory: Optional[str] = OTF_RESULT_CACHE_DIR,
+    ):
+        self.max_bytes = max_bytes
+        self.directory = Path(directory) if directory else None
+        self.entries: OrderedDict[str, pd.DataFrame] = OrderedDict()
+        self.sizes: Dict[str, int] = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        with self._lock:
+            df = self.entries.get(key)
+            if df is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return df.copy()
+
+        df = self._read_from_disk(key)
+        with self._lock:
+            if df is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        self._put_in_memory(key, df)
+        return df.copy()
+
+    def set(self, key: str, df: pd.DataFrame) -> None:
+        self._put_in_memory(key, df.copy())
+        self._write_to_disk(key, df)
+
+    def _put_in_memory(self, key: str, df: pd.DataFrame) -> None:
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self.entries:
+                self.total_bytes -= self.sizes.pop(key)
+                del self.entries[key]
+
+            self.entries[key] = df
+            self.sizes[key] = size
+            self.total_bytes += size
+
+            while self.total_bytes > self.max_bytes:
+                evicted_key, _ = self.entries.popitem(last=False)
+                self.total_bytes -= self.sizes.pop(evicted_key)
+
+    def _path_for(self, key: str) -> Path:
+        return self.directory / f"{key}.parquet"
+
+    def _read_from_disk(self, key: str) -> Optional[pd.DataFrame]:
+        if self.directory is None:
+            return None
+
+        path = self._path_for(key)
+        if not path.exists():
+            return None
+
+        try:
+            return pd.read_parquet(path)
+        except Exception as e:
+            # A partial write or a corrupt file is just a miss.
+            logging.warning(
+                {
+                    "event": "otf_result_cache_read_failure",
+                    "severity": "low",
+                    "path": str(path),
+                    "error_type": e.__class__.__name__,
+                    "error_details": str(e),
+                }
+            )
+            return None
+
+    def _write_to_disk(self, key: str, df: pd.DataFrame) -> None:
+        if self.directory is None:
+            return
+
+        path = self._path_for(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logging.warning(
+                {
+                    "event": "otf_result_cache_write_failure",
+                    "severity": "low",
+                    "path": str(path),
+                    "error_type": e.__class__.__name__,
+                    "error_details": str(e),
+                }
+            )
+            tmp_path.unlink(missing_ok=True)
@@ -65,3 +65,5 @@ class DatasetQuery(StrictBaseModel):
     aggregate: DatasetAggregate
     group_bys: List[Dataset]
     filters: List[DatasetFilter]
+    # read coarse overviews instead of every pixel, for a quick preview
+    approximate: bool = False
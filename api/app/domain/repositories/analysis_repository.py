@@ -1,3 +1,4 @@
+import asyncio
 import uuid
 from abc import ABC, abstractmethod
 
@@ -12,3 +13,20 @@ class AnalysisRepository(ABC):
     @abstractmethod
     async def store_analysis(self, resource_id: uuid.UUID, analytics: Analysis):
         pass
+
+    async def acquire_lease(self, resource_id: uuid.UUID) -> bool:
+        """Claim the right to compute ``resource_id``.
+
+        Returns False if another process already holds it. Repositories that
+        aren't shared between processes have nothing to coordinate.
+        """
+        return True
+
+    async def wait_for_write(self, resource_id: uuid.UUID, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for ``resource_id`` to be written.
+
+        Returns True if a write was seen. Repositories that can't observe
+        writes wait out the timeout, so callers fall back to re-reading.
+        """
+        await asyncio.sleep(timeout)
+        return False
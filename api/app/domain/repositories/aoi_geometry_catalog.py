@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pyarrow.parquet as pq
+import shapely
+from shapely import Geometry
+
+# Local directory holding the catalog, synced from the pipeline's S3 output
+# (e.g. `aws s3 sync` at container start). Unset disables the catalog.
+AOI_GEOMETRY_CATALOG_DIR = os.environ.get("AOI_GEOMETRY_CATALOG_DIR")
+
+MANIFEST_FILE = "manifest.json"
+
+# Every row for one id, as (geometry, gfw_area__ha) pairs.
+AoiRows = List[Tuple[Geometry, float]]
+
+# aoi_id -> [(row group, row within the row group)]
+AoiIndex = Dict[str, List[Tuple[int, int]]]
+
+
+class AoiGeometryCatalog:
+    """Local, versioned GeoParquet copies of the predefined AOI layers.
+
+    The pipeline writes one GeoParquet file per AOI type with ``aoi_id``,
+    ``geometry`` (WKB) and ``gfw_area__ha`` columns, sorted by ``aoi_id``, and a
+    ``manifest.json`` mapping each AOI type to its version and file::
+
+        {
+            "protected_area": {
+                "version": "v202510",
+                "path": "protected_area/v202510.parquet",
+            }
+        }
+
+    Only the id column is read up front, to index ids to row groups. Lookups
+    then read just the row groups holding the requested ids, so even WDPA is
+    served without holding every polygon in memory. The manifest is re-read
+    whenever its mtime changes, so syncing a new version takes effect without a
+    restart.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._manifest: Dict[str, Dict[str, str]] = {}
+        # -1 so the first call always reads; None once the manifest is missing
+        self._manifest_mtime: Optional[int] = -1
+        # aoi_type -> (layer path, open file, id index)
+        self._indexes: Dict[str, Tuple[str, pq.ParquetFile, AoiIndex]] = {}
+        self._lock = threading.Lock()
+
+    def version(self, aoi_type: str) -> Optional[str]:
+        layer = self._layers().get(aoi_type)
+        return layer["version"] if layer else None
+
+    def lookup(self, aoi_type: str, aoi_ids: Iterable[str]) -> Dict[str, AoiRows]:
+        """Return the rows of every requested id the catalog has.
+
+        Ids missing from the catalog (or an AOI type it doesn't cover) are simply
+        absent from the result, so callers can fall back for just those.
+        """
+        indexed = self._index(aoi_type)
+        if indexed is None:
+            return {}
+        parquet_file, index = indexed
+
+        locations = {
+            aoi_id: index[aoi_id] for aoi_id in map(str, aoi_ids) if aoi_id in index
+        }
+        row_groups = sorted({rg for locs in locations.values() for rg, _ in locs})
+        if not row_groups:
+            return {}
+
+        table = parquet_file.read_row_groups(
+            row_groups, columns=["geometry", "gfw_area__ha"]
+        )
+        # row offset of each row group within the table we just read
+        offsets, offset = {}, 0
+        for rg in row_groups:
+            offsets[rg] = offset
+            offset += parquet_file.metadata.row_group(rg).num_rows
+
+        wkbs = table.column("geometry").to_pylist()
+        areas = table.column("gfw_area__ha").to_pylist()
+        rows: Dict[str, AoiRows] = {}
+        for aoi_id, locs in locations.items():
+            rows[aoi_id] = [
+                (
+                    shapely.from_wkb(wkbs[offsets[rg] + i]),
+                    areas[offsets[rg] + i] or 0,
+                )
+                for rg, i in locs
+            ]
+        return rows
+
+    def _layers(self) -> Dict[str, Dict[str, str]]:
+        path = self.directory / MANIFEST_FILE
+        try:
+            mtime: Optional[int] = path.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+
+        with self._lock:
+            if mtime != self._manifest_mtime:
+                self._manifest = self._read_manifest(path)
+                self._manifest_mtime = mtime
+            return self._manifest
+
+    @staticmethod
+    def _read_manifest(path: Path) -> Dict[str, Dict[str, str]]:
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError) as e:
+            logging.warning(
+                {
+                    "event": "aoi_geometry_catalog_unavailable",
+                    "severity": "medium",
+                    "path": str(path),
+                    "error_type": e.__class__.__name__,
+                    "error_details": str(e),
+                }
+            )
+            return {}
+
+    def _index(self, aoi_type: str) -> Optional[Tuple[pq.ParquetFile, AoiIndex]]:
+        layer = self._layers().get(aoi_type)
+        if layer is None:
+            return None
+
+        with self._lock:
+            cached = self._indexes.get(aoi_type)
+            if cached is None or cached[0] != layer["path"]:
+                parquet_file = pq.ParquetFile(self.directory / layer["path"])
+                index: AoiIndex = {}
+                for rg in range(parquet_file.num_row_groups):
+                    ids = parquet_file.read_row_group(rg, columns=["aoi_id"])
+                    for i, aoi_id in enumerate(ids.column("aoi_id").to_pylist()):
+                        index.setdefault(str(aoi_id), []).append((rg, i))
+                cached = (layer["path"], parquet_file, index)
+                self._indexes[aoi_type] = cached
+            return cached[1], cached[2]
+
+
+aoi_geometry_catalog = (
+    AoiGeometryCatalog(AOI_GEOMETRY_CATALOG_DIR) if AOI_GEOMETRY_CATALOG_DIR else None
+)
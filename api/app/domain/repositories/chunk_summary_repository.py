@@ -0,0 +1,141 @@
+import json
+import os
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+import fsspec
+import pandas as pd
+import pyarrow.parquet as pq
+import shapely
+from shapely.geometry import box
+
+from app.domain.compute_engines.dask_client_router import DatasetGrid
+from app.domain.models.dataset import Dataset, DatasetQuery
+
+# Answer chunks lying fully inside an AOI from precomputed per-chunk summaries.
+OTF_CHUNK_SUMMARIES_ENABLED = (
+    os.environ.get("OTF_CHUNK_SUMMARIES_ENABLED", "false").lower() == "true"
+)
+
+# Key of the grid in the summary parquet's schema metadata.
+GRID_METADATA_KEY = b"chunk_summary_grid"
+
+Chunk = Tuple[int, int]
+
+
+@lru_cache(maxsize=16)
+def _read_grid(uri: str) -> DatasetGrid:
+    fs, path = _filesystem(uri)
+    metadata = pq.read_schema(path, filesystem=fs).metadata
+    return DatasetGrid(**json.loads(metadata[GRID_METADATA_KEY]))
+
+
+def _filesystem(uri: str):
+    storage_options = {"requester_pays": True} if uri.startswith("s3://") else {}
+    return fsspec.core.url_to_fs(uri, **storage_options)
+
+
+class ChunkSummary:
+    """Group sums per chunk of a dataset grid, written by the pipelines.
+
+    One row per (chunk_row, chunk_col) and combination of raw ``group_bys``
+    pixel values, with the sums of ``aggregates`` over every pixel of that
+    chunk. Columns are named by field name, and the grid is stored in the
+    parquet metadata so chunk indices don't depend on any one zarr.
+    """
+
+    def __init__(self, uri: str, group_bys: List[Dataset], aggregates: List[Dataset]):
+        self.uri = uri
+        self.group_bys = group_bys
+        self.aggregates = aggregates
+
+    def covers(self, query: DatasetQuery) -> bool:
+        """Whether ``query`` can be answered from this summary."""
+        return (
+            query.aggregate.func == "sum"
+            and set(query.aggregate.datasets) <= set(self.aggregates)
+            and set(query.group_bys) <= set(self.group_bys)
+            and {filt.dataset for filt in query.filters} <= set(self.group_bys)
+        )
+
+    @property
+    def grid(self) -> DatasetGrid:
+        return _read_grid(self.uri)
+
+    def chunk_box(self, chunk: Chunk):
+        row, col = chunk
+        chunk_x = self.grid.resolution * self.grid.chunk_width
+        chunk_y = self.grid.resolution * self.grid.chunk_height
+        return box(
+            self.grid.origin_x + col * chunk_x,
+            self.grid.origin_y - (row + 1) * chunk_y,
+            self.grid.origin_x + (col + 1) * chunk_x,
+            self.grid.origin_y - row * chunk_y,
+        )
+
+    def interior_chunks(self, geometry) -> List[Chunk]:
+        """Chunks lying entirely inside ``geometry``."""
+        grid = self.grid
+        chunk_x = grid.resolution * grid.chunk_width
+        chunk_y = grid.resolution * grid.chunk_height
+        min_x, min_y, max_x, max_y = geometry.bounds
+        chunks = [
+            (row, col)
+            for row in range(
+                int((grid.origin_y - max_y) // chunk_y),
+                int((grid.origin_y - min_y) // chunk_y) + 1,
+            )
+            for col in range(
+                int((min_x - grid.origin_x) // chunk_x),
+                int((max_x - grid.origin_x) // chunk_x) + 1,
+            )
+        ]
+        if not chunks:
+            return []
+        boxes = [self.chunk_box(chunk) for chunk in chunks]
+        shapely.prepare(geometry)
+        inside = shapely.contains(geometry, boxes)
+        return [chunk for chunk, is_inside in zip(chunks, inside) if is_inside]
+
+    def rows(self, chunks: Iterable[Chunk]) -> pd.DataFrame:
+        chunks = pd.DataFrame(list(chunks), columns=["chunk_row", "chunk_col"])
+        fs, path = _filesystem(self.uri)
+        table = pq.read_table(
+            path,
+            filesystem=fs,
+            columns=["chunk_row", "chunk_col"]
+            + [ds.get_field_name() for ds in self.group_bys + self.aggregates],
+            filters=[
+                ("chunk_row", "in", chunks["chunk_row"].unique().tolist()),
+                ("chunk_col", "in", chunks["chunk_col"].unique().tolist()),
+            ],
+        )
+        return table.to_pandas().merge(chunks, on=["chunk_row", "chunk_col"])
+
+
+class ChunkSummaryRepository:
+    # Should match the summaries written by the pipelines, e.g.
+    # pipelines/tree_cover_loss/stages.py::CHUNK_SUMMARY_URI
+    SUMMARIES = [
+        ChunkSummary(
+            "s3://lcl-analytics/chunk-summaries/umd-tree-cover-loss/v1.13/year_canopy_driver_primary.parquet",  # noqa: E501
+            group_bys=[
+                Dataset.tree_cover_loss,
+                Dataset.canopy_cover,
+                Dataset.tree_cover_loss_drivers,
+                Dataset.primary_forest,
+            ],
+            aggregates=[Dataset.area_hectares, Dataset.carbon_emissions],
+        ),
+    ]
+
+    def __init__(self, summaries: Optional[List[ChunkSummary]] = None):
+        self.summaries = self.SUMMARIES if summaries is None else summaries
+
+    def find(self, query: DatasetQuery) -> Optional[ChunkSummary]:
+        return next((s for s in self.summaries if s.covers(query)), None)
+
+
+chunk_summary_repository = (
+    ChunkSummaryRepository() if OTF_CHUNK_SUMMARIES_ENABLED else None
+)
@@ -1,17 +1,202 @@
+import asyncio
+import importlib.util
 import logging
 import os
-from typing import Iterable, List
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 import httpx
 from shapely import wkb
 from shapely.geometry import shape
 
+from app.domain.repositories.aoi_geometry_catalog import (
+    AoiGeometryCatalog,
+    AoiRows,
+    aoi_geometry_catalog,
+)
+
+DATA_API_URL = "https://data-api.globalforestwatch.org"
+
+# How long fetched geometries are reused. We query the "latest" version of each
+# dataset, so this bounds how long a newly published version goes unseen.
+AOI_GEOMETRY_CACHE_TTL_SECONDS = float(
+    os.environ.get("AOI_GEOMETRY_CACHE_TTL_SECONDS", 6 * 3600)
+)
+AOI_GEOMETRY_CACHE_MAX_ENTRIES = int(
+    os.environ.get("AOI_GEOMETRY_CACHE_MAX_ENTRIES", 10_000)
+)
+# Ids the Data API returned nothing for are remembered only briefly, so a
+# mistyped id doesn't refetch on every request but a newly added one shows up.
+AOI_GEOMETRY_CACHE_NEGATIVE_TTL_SECONDS = float(
+    os.environ.get("AOI_GEOMETRY_CACHE_NEGATIVE_TTL_SECONDS", 60)
+)
+
+# aoi_type -> (dataset, version, id column)
+_AOI_DATASETS = {
+    "key_biodiversity_area": ("birdlife_key_biodiversity_areas", "latest", "sitrecid"),
+    "protected_area": ("wdpa_protected_areas", "latest", "wdpa_pid"),
+    "indigenous_land": ("landmark_ip_lc_and_indicative_poly", "latest", "landmark_id"),
+}
+
+AoiKey = Tuple[str, str, str]
+
+
+class AoiGeometryCache:
+    """A TTL cache of parsed AOI geometries and areas.
+
+    Keyed by (aoi_type, dataset version, id). Parsing WKB for large WDPA or
+    Landmark polygons is not free either, so the shapely objects are cached, not
+    the raw response. When full, the least recently used entries are evicted.
+    Ids with no rows expire after ``negative_ttl_seconds`` instead.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = AOI_GEOMETRY_CACHE_TTL_SECONDS,
+        max_size: int = AOI_GEOMETRY_CACHE_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+        negative_ttl_seconds: float = AOI_GEOMETRY_CACHE_NEGATIVE_TTL_SECONDS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_size = max_size
+        self.clock = clock
+        self.entries: OrderedDict[AoiKey, Tuple[float, AoiRows]] = OrderedDict()
+
+    def get(self, key: AoiKey) -> Optional[AoiRows]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, rows = entry
+        if self.clock() >= expires_at:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return rows
+
+    def set(self, key: AoiKey, rows: AoiRows) -> None:
+        ttl_seconds = self.ttl_seconds if rows else self.negative_ttl_seconds
+        self.entries[key] = (self.clock() + ttl_seconds, rows)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+class _PooledClient:
+    """One long-lived HTTP client per event loop.
+
+    httpx clients are bound to the loop they were first used on, so a new loop
+    (e.g. in tests) gets its own client rather than reusing a dead one.
+    """
+
+    def __init__(self):
+        self.client: Optional[httpx.AsyncClient] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self.client is None or self.loop is not loop or self.client.is_closed:
+            self.client = httpx.AsyncClient(
+                follow_redirects=True,
+                # HTTP/2 needs the optional h2 package
+                http2=importlib.util.find_spec("h2") is not None,
+                timeout=httpx.Timeout(30.0),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+            self.loop = loop
+        return self.client
+
+    async def close(self) -> None:
+        if self.client is not None and not self.client.is_closed:
+            await self.client.aclose()
+        self.client = None
+        self.loop = None
+
+
+_pooled_client = _PooledClient()
+aoi_geometry_cache = AoiGeometryCache()
+
+
+async def close_http_client() -> None:
+    """Close the shared Data API client. Call on application shutdown."""
+    await _pooled_client.close()
+
 
 class DataApiAoiGeometryRepository:
+    # Upstream fetches currently running, keyed like the cache, so concurrent
+    # requests for the same ids share one call.
+    _in_flight: Dict[AoiKey, "asyncio.Task[Dict[str, AoiRows]]"] = {}
+
+    def __init__(
+        self,
+        cache: Optional[AoiGeometryCache] = None,
+        catalog: Optional[AoiGeometryCatalog] = aoi_geometry_catalog,
+    ):
+        self.cache = cache if cache is not None else aoi_geometry_cache
+        self.catalog = catalog
+
     async def load(self, aoi_type: str, aoi_ids: List[str]):
         return await self._get_geojsons_from_data_api(aoi_type, aoi_ids)
 
     async def _get_geojsons_from_data_api(self, aoi_type, aoi_ids):
+        if aoi_type not in _AOI_DATASETS:
+            raise ValueError(f"Unable to retrieve AOI type {aoi_type} from Data API.")
+        version = self._version(aoi_type)
+
+        rows_per_id: Dict[str, AoiRows] = {}
+        waiting: Dict[str, "asyncio.Task[Dict[str, AoiRows]]"] = {}
+        to_fetch = []
+        for aoi_id in dict.fromkeys(str(i) for i in aoi_ids):
+            key = (aoi_type, version, aoi_id)
+            rows = self.cache.get(key)
+            if rows is not None:
+                rows_per_id[aoi_id] = rows
+            elif key in self._in_flight:
+                waiting[aoi_id] = self._in_flight[key]
+            else:
+                to_fetch.append(aoi_id)
+
+        if to_fetch and self.catalog is not None:
+            # the local catalog needs no round trip; only what it lacks goes upstream
+            for aoi_id, rows in self.catalog.lookup(aoi_type, to_fetch).items():
+                self.cache.set((aoi_type, version, aoi_id), rows)
+                rows_per_id[aoi_id] = rows
+            to_fetch = [aoi_id for aoi_id in to_fetch if aoi_id not in rows_per_id]
+
+        if to_fetch:
+            task = asyncio.ensure_future(self._fetch(aoi_type, to_fetch))
+            keys = [(aoi_type, version, aoi_id) for aoi_id in to_fetch]
+            for key in keys:
+                self._in_flight[key] = task
+            try:
+                fetched = await asyncio.shield(task)
+            finally:
+                for key in keys:
+                    if self._in_flight.get(key) is task:
+                        del self._in_flight[key]
+            for aoi_id in to_fetch:
+                rows = fetched.get(aoi_id, [])
+                self.cache.set((aoi_type, version, aoi_id), rows)
+                rows_per_id[aoi_id] = rows
+
+        for aoi_id, task in waiting.items():
+            rows_per_id[aoi_id] = (await asyncio.shield(task)).get(aoi_id, [])
+
+        rows = [row for aoi_id in aoi_ids for row in rows_per_id[str(aoi_id)]]
+        geometries = [geometry for geometry, _ in rows]
+        areas_ha = [area_ha for _, area_ha in rows]
+        return geometries, areas_ha
+
+    def _version(self, aoi_type: str) -> str:
+        if self.catalog is not None:
+            version = self.catalog.version(aoi_type)
+            if version is not None:
+                return version
+        _, version, _ = _AOI_DATASETS[aoi_type]
+        return version
+
+    async def _fetch(self, aoi_type, aoi_ids) -> Dict[str, AoiRows]:
         url, params = self._get_geojson_request_for_data_api(aoi_type, aoi_ids)
         response = await self._send_request(url, params)
 
@@ -21,31 +206,30 @@ class DataApiAoiGeometryRepository:
             )
             raise ValueError("Unable to get GeoJSON from Data API.")
 
-        geometries = [
-            shape(wkb.loads(bytes.fromhex(data["geom"]))) for data in response["data"]
-        ]
-        areas_ha = [data.get("gfw_area__ha", 0) for data in response["data"]]
-        return geometries, areas_ha
+        rows_per_id: Dict[str, AoiRows] = {}
+        for data in response["data"]:
+            geometry = shape(wkb.loads(bytes.fromhex(data["geom"])))
+            rows_per_id.setdefault(str(data["aoi_id"]), []).append(
+                (geometry, data.get("gfw_area__ha", 0))
+            )
+        return rows_per_id
 
     def _get_geojson_request_for_data_api(self, aoi_type, aoi_ids):
-        value_list = self._get_sql_in_list(aoi_ids)
-        if aoi_type == "key_biodiversity_area":
-            url = "https://data-api.globalforestwatch.org/dataset/birdlife_key_biodiversity_areas/latest/query"
-            sql = f"select geom, gfw_area__ha from data where sitrecid in {value_list} order by sitrecid"
-        elif aoi_type == "protected_area":
-            url = "https://data-api.globalforestwatch.org/dataset/wdpa_protected_areas/latest/query"
-            sql = f"select geom, gfw_area__ha from data where wdpa_pid in {value_list} order by wdpa_pid"
-        elif aoi_type == "indigenous_land":
-            url = "https://data-api.globalforestwatch.org/dataset/landmark_ip_lc_and_indicative_poly/latest/query"
-            sql = f"select geom, gfw_area__ha from data where landmark_id in {value_list} order by landmark_id"
-        else:
+        if aoi_type not in _AOI_DATASETS:
             raise ValueError(f"Unable to retrieve AOI type {aoi_type} from Data API.")
+        dataset, version, id_column = _AOI_DATASETS[aoi_type]
+
+        value_list = self._get_sql_in_list(aoi_ids)
+        url = f"{DATA_API_URL}/dataset/{dataset}/{version}/query"
+        sql = (
+            f"select {id_column} as aoi_id, geom, gfw_area__ha from data "
+            f"where {id_column} in {value_list} order by {id_column}"
+        )
         return url, {"sql": sql}
 
     async def _send_request(self, url, params):
         params["x-api-key"] = self._get_api_key()
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.get(url, params=params)
+        response = await _pooled_client.get().get(url, params=params)
         return response.json()
 
     @staticmethod
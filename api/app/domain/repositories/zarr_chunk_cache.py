@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import fsspec
+from zarr.storage import WrapperStore
+
+# Local directory for cached chunks. Unset disables the chunk cache.
+ZARR_CHUNK_CACHE_DIR = os.environ.get("ZARR_CHUNK_CACHE_DIR")
+# Disk budget for cached chunks, in bytes. Defaults to 10 GiB.
+ZARR_CHUNK_CACHE_MAX_BYTES = int(
+    os.environ.get("ZARR_CHUNK_CACHE_MAX_BYTES", 10 * 1024**3)
+)
+
+# Metadata is small and already held by the store registry, so only chunks are
+# worth caching.
+_METADATA_KEYS = ("zarr.json", ".zarray", ".zattrs", ".zgroup", ".zmetadata")
+# Log the hit/miss counters every this many lookups.
+_STATS_LOG_INTERVAL = 1000
+# Eviction rescans the directory at most this often to account for chunks
+# written by other processes; in between it trusts its own running total.
+_RESCAN_INTERVAL_SECONDS = 300
+# A path segment like /v1.13/ or /v20240126/ marks a versioned, immutable store.
+_VERSIONED_URI = re.compile(r"/v\d[\w.]*/")
+
+
+class DiskChunkCache:
+    """A content-addressed, size-bounded cache of Zarr chunks on local disk.
+
+    Chunks are stored under a hash of (namespace, chunk key), where the
+    namespace identifies one version of a store (see ``store_namespace``).
+    Chunks of a given version never change, so an entry never needs
+    revalidation; it only leaves the cache through LRU eviction. File mtimes
+    track recency, so several worker processes can share one directory.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = ZARR_CHUNK_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # path -> size, least recently used first
+        self._entries: OrderedDict[Path, int] = OrderedDict()
+        self._total_bytes = 0
+        self._rescan()
+
+    def __reduce__(self):
+        # Dask ships stores to workers by pickling them; each worker process
+        # should reattach to its own instance for the directory.
+        return get_disk_chunk_cache, (str(self.directory), self.max_bytes)
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        path = self._path_for(namespace, key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            self._record(hit=False)
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # evicted by another process in the meantime
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+        self._record(hit=True)
+        return data
+
+    def put(self, namespace: str, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+
+        path = self._path_for(namespace, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(
+                {
+                    "event": "zarr_chunk_cache_write_failure",
+                    "severity": "low",
+                    "path": str(path),
+                    "error_type": e.__class__.__name__,
+                    "error_details": str(e),
+                }
+            )
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        with self._lock:
+            self._total_bytes += len(data) - self._entries.pop(path, 0)
+            self._entries[path] = len(data)
+            over_budget = self._total_bytes > self.max_bytes
+        if over_budget:
+            self._evict()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def _path_for(self, namespace: str, key: str) -> Path:
+        digest = hashlib.sha256(f"{namespace}/{key}".encode("utf-8")).hexdigest()
+        return self.directory / digest[:2] / digest
+
+    def _record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            lookups = self.hits + self.misses
+        if lookups % _STATS_LOG_INTERVAL == 0:
+            logging.info(
+                {
+                    "event": "zarr_chunk_cache_stats",
+                    "directory": str(self.directory),
+                    **self.stats(),
+                }
+            )
+
+    def _rescan(self) -> None:
+        files = []
+        for path in self.directory.glob("*/*"):
+            if path.suffix == ".tmp":
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        with self._lock:
+            self._entries = OrderedDict((path, size) for _, size, path in sorted(files))
+            self._total_bytes = sum(self._entries.values())
+            self._scanned_at = time.monotonic()
+
+    def _evict(self) -> None:
+        """Delete least recently used chunks until 90% of the budget is free."""
+        if time.monotonic() - self._scanned_at > _RESCAN_INTERVAL_SECONDS:
+            self._rescan()
+
+        target = int(self.max_bytes * 0.9)
+        evicted = []
+        with self._lock:
+            while self._total_bytes > target and self._entries:
+                path, size = self._entries.popitem(last=False)
+                self._total_bytes -= size
+                evicted.append(path)
+        for path in evicted:
+            path.unlink(missing_ok=True)
+
+
+_caches: Dict[Tuple[str, int], DiskChunkCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_disk_chunk_cache(
+    directory: str, max_bytes: int = ZARR_CHUNK_CACHE_MAX_BYTES
+) -> DiskChunkCache:
+    """Return this process's cache for ``directory``, creating it on first use."""
+    with _caches_lock:
+        cache = _caches.get((directory, max_bytes))
+        if cache is None:
+            cache = DiskChunkCache(directory, max_bytes)
+            _caches[(directory, max_bytes)] = cache
+        return cache
+
+
+def store_namespace(uri: str) -> Optional[str]:
+    """A cache namespace naming the current version of the store at ``uri``.
+
+    Versioned URIs never change, so the URI is enough. Stores rewritten in
+    place get the ETag and modification time of their root metadata added,
+    which change whenever the store is rewritten. Returns None if neither is
+    available, in which case the store shouldn't be cached on disk.
+    """
+    uri = uri.rstrip("/")
+    if _VERSIONED_URI.search(uri + "/"):
+        return uri
+
+    storage_options = {"requester_pays": True} if uri.startswith("s3://") else {}
+    fs, path = fsspec.core.url_to_fs(uri, **storage_options)
+    for metadata_key in ("zarr.json", ".zmetadata", ".zgroup"):
+        try:
+            info = fs.info(f"{path}/{metadata_key}")
+        except FileNotFoundError:
+            continue
+        etag = str(info.get("ETag", "")).strip('"')
+        modified = info.get("LastModified") or info.get("mtime")
+        if not etag and modified is None:
+            return None
+        return f"{uri}@{etag}:{modified}"
+    return None
+
+
+class ChunkCachingStore(WrapperStore):
+    """Read-through Zarr store that keeps whole chunks in a ``DiskChunkCache``.
+
+    Only full-object reads of chunk keys are cached. Metadata documents and
+    byte-range reads go straight to the wrapped store.
+    """
+
+    def __init__(self, store, cache: DiskChunkCache, namespace: str):
+        super().__init__(store)
+        self.cache = cache
+        self.namespace = namespace.rstrip("/")
+
+    def _with_store(self, store):
+        return type(self)(store, cache=self.cache, namespace=self.namespace)
+
+    @staticmethod
+    def _is_cacheable(key: str, byte_range) -> bool:
+        return byte_range is None and not key.endswith(_METADATA_KEYS)
+
+    async def get(self, key, prototype, byte_range=None):
+        if not self._is_cacheable(key, byte_range):
+            return await super().get(key, prototype, byte_range)
+
+        data = await asyncio.to_thread(self.cache.get, self.namespace, key)
+        if data is not None:
+            return prototype.buffer.from_bytes(data)
+
+        buffer = await super().get(key, prototype, byte_range)
+        if buffer is not None:
+            await asyncio.to_thread(
+                self.cache.put, self.namespace, key, buffer.to_bytes()
+            )
+        return buffer
+
+    def get_sync(self, key, *, prototype=None, byte_range=None):
+        if prototype is None or not self._is_cacheable(key, byte_range):
+            return super().get_sync(key, prototype=prototype, byte_range=byte_range)
+
+        data = self.cache.get(self.namespace, key)
+        if data is not None:
+            return prototype.buffer.from_bytes(data)
+
+        buffer = super().get_sync(key, prototype=prototype, byte_range=byte_range)
+        if buffer is not None:
+            self.cache.put(self.namespace, key, buffer.to_bytes())
+        return buffer
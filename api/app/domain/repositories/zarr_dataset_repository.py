@@ -1,16 +1,34 @@
+import copy
+import os
+import threading
+from collections import OrderedDict
+from functools import partial
 from typing import Optional
 
 import dask.array as da
 import numpy as np
 import rioxarray  # noqa: F401 — needed for .rio accessor
+import shapely
 import xarray as xr
-from rasterio.features import geometry_mask
+from dask.base import tokenize
+from rasterio.features import geometry_mask, rasterize
 from rasterio.transform import Affine
-from shapely import Geometry
+from rioxarray.exceptions import NoDataInBounds
+from shapely import Geometry, STRtree
 from shapely.geometry import box, mapping
 
+from app.domain.compute_engines.dask_client_router import DatasetGrid
 from app.domain.models.dataset import Dataset
 from app.domain.models.environment import Environment
+from app.domain.repositories.zarr_store_registry import zarr_store_registry
+
+# Distinct (geometry, grid) masks kept per repository instance.
+CLIP_MASK_CACHE_MAX_ENTRIES = 8
+# Downsampling factor of the overviews read by approximate analyses. Must be
+# one of the factors written by pipelines/prefect_flows/common_stages.py.
+OTF_APPROXIMATE_OVERVIEW_FACTOR = int(
+    os.environ.get("OTF_APPROXIMATE_OVERVIEW_FACTOR", 16)
+)
 
 
 class ZarrDatasetRepository:
@@ -35,6 +53,18 @@ class ZarrDatasetRepository:
         },
     }
 
+    # Datasets whose zarrs also hold coarse overview groups, written by the
+    # pipelines with "overview" in their dataset config.
+    OVERVIEW_DATASETS = {
+        Dataset.area_hectares,
+        Dataset.canopy_cover,
+        Dataset.carbon_emissions,
+        Dataset.primary_forest,
+        Dataset.tree_cover_loss,
+        Dataset.tree_cover_loss_drivers,
+        Dataset.tree_cover_loss_from_fires,
+    }
+
     @staticmethod
     def resolve_zarr_uri(dataset: Dataset, environment: Environment) -> str:
         """Resolve the Zarr URI for a dataset in a given environment.
@@ -50,14 +80,33 @@ class ZarrDatasetRepository:
             raise KeyError(f"No Zarr URI configured for dataset {dataset!r}")
         return uri
 
-    def __init__(self, environment: Environment = Environment.production):
+    def __init__(
+        self, environment: Environment = Environment.production, group: str = "otf"
+    ):
         self.environment = environment
+        self.group = group
+        self._clip_masks: OrderedDict[str, xr.DataArray] = OrderedDict()
+        self._clip_masks_lock = threading.Lock()
+
+    def __getstate__(self):
+        # masks are lazy graphs tied to one analysis; don't ship them to workers
+        state = self.__dict__.copy()
+        state["_clip_masks"] = OrderedDict()
+        del state["_clip_masks_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._clip_masks_lock = threading.Lock()
 
     def load(
         self, dataset: Dataset, geometry: Optional[Geometry] = None
     ) -> xr.DataArray:
         xarr = self.open_source(dataset)
         xarr.rio.write_crs("EPSG:4326", inplace=True)
+        # keep the full grid's transform, so clipping a slice one pixel wide
+        # doesn't have to infer the resolution from a single coordinate
+        xarr.rio.write_transform(xarr.rio.transform(), inplace=True)
         xarr.name = dataset.get_field_name()
 
         if geometry is not None:
@@ -66,11 +115,42 @@ class ZarrDatasetRepository:
 
     def open_source(self, dataset):
         uri = self.resolve_zarr_uri(dataset, self.environment)
-        return xr.open_zarr(
-            uri,
-            group="otf",
-            storage_options={"requester_pays": True},
-        ).band_data
+        return zarr_store_registry.open(uri, group=self.group).band_data
+
+    def overview(
+        self, datasets, factor: int = OTF_APPROXIMATE_OVERVIEW_FACTOR
+    ) -> "ZarrDatasetRepository":
+        """A repository reading the ``factor``x coarser overviews of the zarrs.
+
+        Area and emissions overviews hold the sum of each block of pixels and
+        categorical overviews its most common value, so sums over an overview
+        approximate sums over the full resolution data. Returns this repository
+        unchanged if any of ``datasets`` has no overview.
+        """
+        if not set(datasets) <= self.OVERVIEW_DATASETS:
+            return self
+        overview = copy.copy(self)
+        overview.group = f"overview_{factor}"
+        overview._clip_masks = OrderedDict()
+        return overview
+
+    def grid(self, dataset: Dataset) -> DatasetGrid:
+        """The pixel grid and chunking of ``dataset``, from its coordinates."""
+        xarr = self.open_source(dataset)
+        x_coords = xarr.x.values
+        y_coords = xarr.y.values
+        resolution = abs(float(x_coords[1] - x_coords[0]))
+        chunk_height, chunk_width = (
+            xarr.data.chunksize[-2:] if xarr.chunks else xarr.shape[-2:]
+        )
+        return DatasetGrid(
+            resolution=resolution,
+            origin_x=float(x_coords[0]) - resolution / 2,
+            origin_y=float(y_coords[0]) + resolution / 2,
+            chunk_width=int(chunk_width),
+            chunk_height=int(chunk_height),
+            itemsize=xarr.dtype.itemsize,
+        )
 
     def translate(self, dataset, value):
         """
@@ -199,67 +279,221 @@ class ZarrDatasetRepository:
 
         if len(x_coords) < 1000 or len(y_coords) < 1000:
             # Small region — fall back to rio.clip that computes eagerly
-            clipped = sliced.rio.clip([geojson])
-            return clipped
+            try:
+                return sliced.rio.clip([geojson])
+            except NoDataInBounds:
+                # no pixel centre falls inside, e.g. a sliver of a split AOI
+                return sliced.isel(x=slice(0, 0), y=slice(0, 0))
 
-        res_x = float(abs(x_coords[1] - x_coords[0]))
-        res_y = float(abs(y_coords[1] - y_coords[0]))
+        clip_mask = self._clip_mask(sliced, geom)
 
-        def _build_mask_chunk(block, block_info=None):
-            """Build a boolean geometry mask for a single dask chunk."""
-            if block_info is None or block.size == 0:
-                return np.ones(block.shape, dtype=bool)
+        orig_dtype = sliced.dtype
+        cropped = sliced.where(clip_mask)
+        nodata = sliced.rio.nodata
+        if nodata is not None and not np.isnan(nodata):
+            cropped = cropped.fillna(nodata)
+        return cropped.astype(orig_dtype)
 
-            y_start, y_stop = block_info[0]["array-location"][-2]
-            x_start, x_stop = block_info[0]["array-location"][-1]
+    def label_geometries(self, like: xr.DataArray, geometries) -> xr.DataArray:
+        """Rasterize ``geometries`` onto ``like``'s grid as 1-based labels.
 
-            chunk_y = y_coords[y_start:y_stop]
-            chunk_x = x_coords[x_start:x_stop]
+        Pixels outside every geometry are 0. Geometries are assumed not to
+        overlap; where they do, the later one wins. The result is lazy and
+        chunked like ``like`` when ``like`` is dask-backed.
+        """
+        x_coords = like.x.values
+        y_coords = like.y.values
+        tree = STRtree(list(geometries))
+        dims = like.dims[-2:]
+        coords = {"y": like.y, "x": like.x}
+
+        if not isinstance(like.data, da.Array):
+            labels = _build_label_chunk(
+                tree,
+                x_coords,
+                y_coords,
+                block_info={
+                    None: {
+                        "chunk-shape": like.shape[-2:],
+                        "array-location": [(0, like.shape[-2]), (0, like.shape[-1])],
+                    }
+                },
+            )
+            return xr.DataArray(labels, dims=dims, coords=coords)
+
+        chunks = like.data.chunks[-2:]
+        token = tokenize([g.wkb for g in geometries], x_coords, y_coords, chunks)
+        labels = da.map_blocks(
+            partial(_build_label_chunk, tree, x_coords, y_coords),
+            chunks=chunks,
+            dtype=np.int32,
+            meta=np.array((), dtype=np.int32),
+            name=f"aoi-labels-{token}",
+        )
+        return xr.DataArray(labels, dims=dims, coords=coords)
 
-            if len(chunk_y) == 0 or len(chunk_x) == 0:
-                return np.ones(block.shape, dtype=bool)
+    def _clip_mask(self, sliced, geom) -> xr.DataArray:
+        """Return the lazy AOI mask for ``sliced``'s grid and chunking.
 
-            chunk_box = box(
-                float(chunk_x[0]) - res_x / 2,
-                float(chunk_y[-1]) - res_y / 2,
-                float(chunk_x[-1]) + res_x / 2,
-                float(chunk_y[0]) + res_y / 2,
-            )
-            if geom.contains(chunk_box):
-                return np.ones(block.shape[-2:], dtype=bool)
-            if not geom.intersects(chunk_box):
-                return np.zeros(block.shape[-2:], dtype=bool)
-
-            transform = Affine(
-                res_x,
-                0,
-                float(chunk_x[0]) - res_x / 2,
-                0,
-                -res_y,
-                float(chunk_y[0]) + res_y / 2,
-            )
+        Most 30 m layers share the same grid and chunks, so the mask is keyed by
+        (geometry, coordinates, chunks) and reused for every layer clipped by
+        this repository. The dask name is derived from the same key, so masks
+        built independently still collapse into one set of tasks in a graph.
+        """
+        x_coords = sliced.x.values
+        y_coords = sliced.y.values
+        chunks = sliced.data.chunks[-2:]
+        token = tokenize(geom.wkb, x_coords, y_coords, chunks)
 
-            return geometry_mask(
-                [geojson],
-                out_shape=block.shape[-2:],
-                transform=transform,
-                invert=True,
-            )
+        with self._clip_masks_lock:
+            clip_mask = self._clip_masks.get(token)
+            if clip_mask is not None:
+                self._clip_masks.move_to_end(token)
+                return clip_mask
 
         mask_data = da.map_blocks(
-            _build_mask_chunk,
-            sliced.data,
+            partial(
+                _build_mask_chunk,
+                geometry_index=_GeometryIndex(geom),
+                x_coords=x_coords,
+                y_coords=y_coords,
+            ),
+            chunks=chunks,
             dtype=bool,
+            meta=np.array((), dtype=bool),
+            name=f"aoi-mask-{token}",
         )
         clip_mask = xr.DataArray(
             mask_data,
-            dims=sliced.dims,
-            coords=sliced.coords,
+            dims=sliced.dims[-2:],
+            coords={"y": sliced.y, "x": sliced.x},
         )
 
-        orig_dtype = sliced.dtype
-        cropped = sliced.where(clip_mask)
-        nodata = sliced.rio.nodata
-        if nodata is not None and not np.isnan(nodata):
-            cropped = cropped.fillna(nodata)
-        return cropped.astype(orig_dtype)
+        with self._clip_masks_lock:
+            self._clip_masks[token] = clip_mask
+            while len(self._clip_masks) > CLIP_MASK_CACHE_MAX_ENTRIES:
+                self._clip_masks.popitem(last=False)
+        return clip_mask
+
+
+class _GeometryIndex:
+    """Classifies raster chunks against an AOI made of many polygon parts.
+
+    Chunks are tested against an STRtree of the AOI's parts rather than the
+    whole geometry, and every part is prepared, so a chunk only pays for the
+    handful of parts near it. The tree and prepared geometries can't be
+    pickled, so they're rebuilt lazily wherever the index ends up running.
+    """
+
+    def __init__(self, geometry: Geometry):
+        self.geometry = geometry
+        self._parts = None
+        self._tree = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"geometry": self.geometry}
+
+    def __setstate__(self, state):
+        self.__init__(state["geometry"])
+
+    def touching_parts(self, chunk_box) -> Optional[list]:
+        """Return the parts that touch ``chunk_box``, or None if it's inside one."""
+        parts, tree = self._index()
+        touching = [parts[i] for i in tree.query(chunk_box, predicate="intersects")]
+        if any(part.contains(chunk_box) for part in touching):
+            return None
+        return touching
+
+    def _index(self):
+        with self._lock:
+            if self._tree is None:
+                parts = list(shapely.get_parts(self.geometry))
+                shapely.prepare(parts)
+                self._parts = parts
+                self._tree = STRtree(parts)
+            return self._parts, self._tree
+
+
+def _build_mask_chunk(geometry_index, x_coords, y_coords, block_info=None):
+    """Build a boolean geometry mask for a single dask chunk."""
+    chunk_shape = block_info[None]["chunk-shape"]
+    y_start, y_stop = block_info[None]["array-location"][-2]
+    x_start, x_stop = block_info[None]["array-location"][-1]
+
+    chunk_y = y_coords[y_start:y_stop]
+    chunk_x = x_coords[x_start:x_stop]
+
+    if len(chunk_y) == 0 or len(chunk_x) == 0:
+        return np.ones(chunk_shape, dtype=bool)
+
+    res_x = float(abs(x_coords[1] - x_coords[0]))
+    res_y = float(abs(y_coords[1] - y_coords[0]))
+
+    chunk_box = box(
+        float(chunk_x[0]) - res_x / 2,
+        float(chunk_y[-1]) - res_y / 2,
+        float(chunk_x[-1]) + res_x / 2,
+        float(chunk_y[0]) + res_y / 2,
+    )
+    touching_parts = geometry_index.touching_parts(chunk_box)
+    if touching_parts is None:
+        return np.ones(chunk_shape, dtype=bool)
+    if not touching_parts:
+        return np.zeros(chunk_shape, dtype=bool)
+
+    transform = Affine(
+        res_x,
+        0,
+        float(chunk_x[0]) - res_x / 2,
+        0,
+        -res_y,
+        float(chunk_y[0]) + res_y / 2,
+    )
+
+    return geometry_mask(
+        [mapping(part) for part in touching_parts],
+        out_shape=chunk_shape,
+        transform=transform,
+        invert=True,
+    )
+
+
+def _build_label_chunk(tree, x_coords, y_coords, block_info=None):
+    """Burn the 1-based index of every geometry in ``tree`` into one chunk."""
+    chunk_shape = block_info[None]["chunk-shape"]
+    y_start, y_stop = block_info[None]["array-location"][-2]
+    x_start, x_stop = block_info[None]["array-location"][-1]
+
+    chunk_y = y_coords[y_start:y_stop]
+    chunk_x = x_coords[x_start:x_stop]
+    if len(chunk_y) == 0 or len(chunk_x) == 0:
+        return np.zeros(chunk_shape, dtype=np.int32)
+
+    res_x = float(abs(x_coords[1] - x_coords[0])) if len(x_coords) > 1 else 1.0
+    res_y = float(abs(y_coords[1] - y_coords[0])) if len(y_coords) > 1 else 1.0
+    chunk_box = box(
+        float(chunk_x[0]) - res_x / 2,
+        float(chunk_y[-1]) - res_y / 2,
+        float(chunk_x[-1]) + res_x / 2,
+        float(chunk_y[0]) + res_y / 2,
+    )
+    touching = sorted(tree.query(chunk_box, predicate="intersects"))
+    if not touching:
+        return np.zeros(chunk_shape, dtype=np.int32)
+
+    transform = Affine(
+        res_x,
+        0,
+        float(chunk_x[0]) - res_x / 2,
+        0,
+        -res_y,
+        float(chunk_y[0]) + res_y / 2,
+    )
+    return rasterize(
+        [(mapping(tree.geometries[i]), int(i) + 1) for i in touching],
+        out_shape=chunk_shape,
+        transform=transform,
+        fill=0,
+        dtype=np.int32,
+    )
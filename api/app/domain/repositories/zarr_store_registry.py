@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import xarray as xr
+from zarr.storage import FsspecStore
+
+from app.domain.repositories.zarr_chunk_cache import (
+    ZARR_CHUNK_CACHE_DIR,
+    ZARR_CHUNK_CACHE_MAX_BYTES,
+    ChunkCachingStore,
+    get_disk_chunk_cache,
+    store_namespace,
+)
+
+# Upper bound on datasets kept open per process.
+ZARR_STORE_REGISTRY_MAX_ENTRIES = int(
+    os.environ.get("ZARR_STORE_REGISTRY_MAX_ENTRIES", 64)
+)
+# Versioned URIs never change, but a few stores (e.g. the SBTN layers) are
+# rewritten in place, so every entry is re-opened after this long.
+ZARR_STORE_REGISTRY_TTL_SECONDS = float(
+    os.environ.get("ZARR_STORE_REGISTRY_TTL_SECONDS", 3600)
+)
+
+StoreKey = Tuple[str, Optional[str]]
+
+
+def _open_zarr(uri: str, group: Optional[str] = None) -> xr.Dataset:
+    namespace = store_namespace(uri) if ZARR_CHUNK_CACHE_DIR else None
+    if namespace is not None:
+        store = FsspecStore.from_url(
+            uri, storage_options={"requester_pays": True}, read_only=True
+        )
+        cache = get_disk_chunk_cache(ZARR_CHUNK_CACHE_DIR, ZARR_CHUNK_CACHE_MAX_BYTES)
+        return xr.open_zarr(
+            ChunkCachingStore(store, cache=cache, namespace=namespace), group=group
+        )
+
+    return xr.open_zarr(
+        uri,
+        group=group,
+        storage_options={"requester_pays": True},
+    )
+
+
+class ZarrStoreRegistry:
+    """Keeps opened Zarr datasets around for the life of the process.
+
+    Opening a store costs several metadata GETs against requester-pays S3 plus
+    rebuilding the x/y indexes. Both are the same for every AOI and every task,
+    so they are paid once per (uri, group) here and shared after that.
+
+    Entries are keyed by URI. Our URIs carry the dataset version, so a new
+    version is a new entry; the TTL only covers the stores written in place.
+    Callers get a shallow copy, so attaching a CRS or renaming a variable never
+    leaks into the shared dataset. The lazy arrays and indexes are still shared.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = ZARR_STORE_REGISTRY_MAX_ENTRIES,
+        ttl_seconds: float = ZARR_STORE_REGISTRY_TTL_SECONDS,
+        opener: Callable[[str, Optional[str]], xr.Dataset] = _open_zarr,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.opener = opener
+        self.clock = clock
+        self.entries: OrderedDict[StoreKey, Tuple[float, xr.Dataset]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._open_locks: Dict[StoreKey, threading.Lock] = {}
+
+    def open(self, uri: str, group: Optional[str] = None) -> xr.Dataset:
+        key = (uri, group)
+        dataset = self._get(key)
+        if dataset is not None:
+            return dataset.copy(deep=False)
+
+        # Only one thread opens a given store; the others wait and reuse it.
+        with self._lock:
+            open_lock = self._open_locks.setdefault(key, threading.Lock())
+        with open_lock:
+            dataset = self._get(key)
+            if dataset is None:
+                dataset = self.opener(uri, group)
+                self._put(key, dataset)
+
+        return dataset.copy(deep=False)
+
+    def invalidate(self, uri: Optional[str] = None) -> None:
+        """Drop every entry for ``uri``, or everything if no URI is given."""
+        with self._lock:
+            for key in list(self.entries):
+                if uri is None or key[0] == uri:
+                    del self.entries[key]
+
+    def _get(self, key: StoreKey) -> Optional[xr.Dataset]:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            opened_at, dataset = entry
+            if self.clock() - opened_at >= self.ttl_seconds:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return dataset
+
+    def _put(self, key: StoreKey, dataset: xr.Dataset) -> None:
+        with self._lock:
+            self.entries[key] = (self.clock(), dataset)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+# One registry per process, so each Dask worker keeps its own set of open stores.
+zarr_store_registry = ZarrStoreRegistry()
@@ -0,0 +1,190 @@
+import base64
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set, Tuple
+
+import boto3
+
+# Local directory for mirrored admin result tables. Unset disables the mirror.
+ADMIN_RESULTS_MIRROR_DIR = os.environ.get("ADMIN_RESULTS_MIRROR_DIR")
+# After a failed sync a table isn't synced again for this long, doubling with
+# every further failure up to the max; it's read from S3 in the meantime.
+ADMIN_RESULTS_MIRROR_RETRY_SECONDS = float(
+    os.environ.get("ADMIN_RESULTS_MIRROR_RETRY_SECONDS", 60)
+)
+ADMIN_RESULTS_MIRROR_MAX_RETRY_SECONDS = float(
+    os.environ.get("ADMIN_RESULTS_MIRROR_MAX_RETRY_SECONDS", 3600)
+)
+
+_S3_URI = re.compile(r"^s3://([^/]+)/(.+\.parquet)$")
+_MIB = 1024 * 1024
+
+
+def _file_digest(path: Path, algorithm: str) -> bytes:
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(8 * _MIB), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def sha256_checksum(path: Path) -> str:
+    """The base64 SHA-256 of a local file, as in S3's ``ChecksumSHA256``."""
+    return base64.b64encode(_file_digest(path, "sha256")).decode()
+
+
+def multipart_etag(path: Path, etag: str, part_size: Optional[int] = None) -> str:
+    """Compute the S3 ETag of a local file, in the same form as ``etag``.
+
+    Single-part uploads use the MD5 of the content. Multipart uploads use the
+    MD5 of the concatenated part MD5s plus ``-<parts>``, so they need the
+    ``part_size`` the object was uploaded with.
+    """
+    etag = etag.strip('"')
+    if "-" not in etag:
+        return _file_digest(path, "md5").hex()
+
+    if part_size is None:
+        raise ValueError(f"Part size is needed to compute multipart ETag {etag}")
+    digests = []
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(part_size), b""):
+            digests.append(hashlib.md5(block).digest())
+    return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+
+
+class AdminResultsMirror:
+    """Mirrors the immutable admin zonal-statistics parquets to local disk.
+
+    ``resolve`` returns the local path of a table once its copy has been checked
+    against the object's SHA-256 checksum, or its ETag when it has none, in
+    this process. Until then it returns the S3 URI
+    and syncs the copy in the background, so a cold or missing mirror only costs
+    S3 reads, never an error. Result URIs carry their version, so a new version
+    is a new file; copies that exist from a previous run are re-verified with a
+    HEAD rather than downloaded again. A failed sync isn't retried until a
+    backoff has passed.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        s3_client_factory: Callable[[], object] = lambda: boto3.client("s3"),
+    ):
+        self.directory = Path(directory)
+        self.s3_client_factory = s3_client_factory
+        self.verified: Dict[str, Path] = {}
+        self._syncing: Set[str] = set()
+        # uri -> (consecutive failed syncs, monotonic time to retry at)
+        self._failures: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, uri: str) -> str:
+        if _S3_URI.match(uri) is None:
+            return uri
+
+        with self._lock:
+            local_path = self.verified.get(uri)
+            if local_path is not None:
+                return str(local_path)
+            if uri in self._syncing:
+                return uri
+            failure = self._failures.get(uri)
+            if failure is not None and time.monotonic() < failure[1]:
+                return uri
+            self._syncing.add(uri)
+
+        threading.Thread(
+            target=self._sync_in_background, args=(uri,), daemon=True
+        ).start()
+        return uri
+
+    def sync(self, uri: str) -> Optional[Path]:
+        """Bring the local copy of ``uri`` up to date and return its path."""
+        bucket, key = _S3_URI.match(uri).groups()
+        s3 = self.s3_client_factory()
+        head = s3.head_object(
+            Bucket=bucket, Key=key, RequestPayer="requester", ChecksumMode="ENABLED"
+        )
+        etag = head["ETag"].strip('"')
+
+        local_path = self.directory / bucket / key
+        etag_path = local_path.with_name(local_path.name + ".etag")
+        if local_path.exists() and etag_path.exists():
+            if etag_path.read_text() == etag:
+                return local_path
+
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = local_path.with_name(f"{local_path.name}.{os.getpid()}.tmp")
+        try:
+            s3.download_file(
+                bucket, key, str(tmp_path), ExtraArgs={"RequestPayer": "requester"}
+            )
+            self._verify(s3, bucket, key, head, tmp_path)
+            os.replace(tmp_path, local_path)
+            etag_path.write_text(etag)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        return local_path
+
+    @staticmethod
+    def _verify(s3, bucket: str, key: str, head: dict, path: Path) -> None:
+        uri = f"s3://{bucket}/{key}"
+        checksum = head.get("ChecksumSHA256")
+        if checksum and "-" not in checksum:
+            if sha256_checksum(path) != checksum:
+                raise ValueError(
+                    f"Downloaded copy of {uri} does not match SHA-256 {checksum}"
+                )
+            return
+
+        # Without a full-object checksum, fall back to the ETag. Multipart
+        # ETags depend on the part size, which S3 reports for part 1.
+        etag = head["ETag"].strip('"')
+        part_size = None
+        if "-" in etag:
+            part_size = s3.head_object(
+                Bucket=bucket, Key=key, RequestPayer="requester", PartNumber=1
+            )["ContentLength"]
+        if multipart_etag(path, etag, part_size) != etag:
+            raise ValueError(f"Downloaded copy of {uri} does not match ETag {etag}")
+
+    def _sync_in_background(self, uri: str) -> None:
+        try:
+            local_path = self.sync(uri)
+            with self._lock:
+                self.verified[uri] = local_path
+                self._failures.pop(uri, None)
+            logging.info({"event": "admin_results_mirrored", "uri": uri})
+        except Exception as e:
+            with self._lock:
+                failures = self._failures.get(uri, (0, 0.0))[0] + 1
+                retry_seconds = min(
+                    ADMIN_RESULTS_MIRROR_RETRY_SECONDS * 2 ** min(failures - 1, 16),
+                    ADMIN_RESULTS_MIRROR_MAX_RETRY_SECONDS,
+                )
+                self._failures[uri] = (failures, time.monotonic() + retry_seconds)
+            logging.warning(
+                {
+                    "event": "admin_results_mirror_failure",
+                    "severity": "low",
+                    "uri": uri,
+                    "failures": failures,
+                    "retry_seconds": retry_seconds,
+                    "error_type": e.__class__.__name__,
+                    "error_details": str(e),
+                }
+            )
+        finally:
+            with self._lock:
+                self._syncing.discard(uri)
+
+
+admin_results_mirror = (
+    AdminResultsMirror(ADMIN_RESULTS_MIRROR_DIR) if ADMIN_RESULTS_MIRROR_DIR else None
+)
@@ -0,0 +1,219 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import fsspec
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from app.domain.compute_engines.handlers.precalc_implementations.precalc_sql_query_builder import (  # noqa: E501
+    PrecalcSqlQueryBuilder,
+)
+from app.domain.models.dataset import DatasetQuery
+
+# Memory allowed for admin results tables held in memory. 0 disables them.
+ADMIN_RESULTS_RESIDENT_MAX_BYTES = int(
+    os.environ.get("ADMIN_RESULTS_RESIDENT_MAX_BYTES", 0)
+)
+# Backoff before loading a table again after a failed load, doubling with each
+# consecutive failure up to the max.
+ADMIN_RESULTS_RESIDENT_RETRY_SECONDS = float(
+    os.environ.get("ADMIN_RESULTS_RESIDENT_RETRY_SECONDS", 60)
+)
+ADMIN_RESULTS_RESIDENT_MAX_RETRY_SECONDS = float(
+    os.environ.get("ADMIN_RESULTS_RESIDENT_MAX_RETRY_SECONDS", 3600)
+)
+
+_COMPARISONS = {
+    "=": pc.equal,
+    "!=": pc.not_equal,
+    "<": pc.less,
+    "<=": pc.less_equal,
+    ">": pc.greater,
+    ">=": pc.greater_equal,
+}
+
+
+def _read_table(uri: str) -> pa.Table:
+    storage_options = {"requester_pays": True} if uri.startswith("s3://") else {}
+    with fsspec.open(uri, "rb", **storage_options) as f:
+        return pq.read_table(f)
+
+
+class ResidentAdminTable:
+    """An admin results table held in memory, with a ``key`` -> rows index.
+
+    Rows are sorted by ``key``, so each key's rows are one contiguous slice and
+    selecting them is zero-copy. Tables are keyed by aoi_id, except DIST tables,
+    which have none: they're keyed by country and narrowed to regions and
+    subregions by the caller.
+    """
+
+    def __init__(self, table: pa.Table, key: str = "aoi_id"):
+        self.key = key
+        self.table = table.sort_by(key).combine_chunks()
+        ids = self.table.column(key).to_numpy(zero_copy_only=False)
+        unique_ids, starts, counts = np.unique(
+            ids, return_index=True, return_counts=True
+        )
+        self.index: Dict[str, Tuple[int, int]] = {
+            str(aoi_id): (int(start), int(count))
+            for aoi_id, start, count in zip(unique_ids, starts, counts)
+        }
+
+    @classmethod
+    def from_uri(cls, uri: str) -> "ResidentAdminTable":
+        table = _read_table(uri)
+        return cls(table, "aoi_id" if "aoi_id" in table.column_names else "country")
+
+    @property
+    def nbytes(self) -> int:
+        return self.table.nbytes
+
+    def rows(self, aoi_ids: Iterable[str]) -> pa.Table:
+        slices = [
+            self.table.slice(*self.index[aoi_id])
+            for aoi_id in dict.fromkeys(str(i) for i in aoi_ids)
+            if aoi_id in self.index
+        ]
+        if not slices:
+            return self.table.slice(0, 0)
+        return pa.concat_tables(slices)
+
+
+class ResidentAdminTables:
+    """The admin results tables kept in memory, within a byte budget.
+
+    ``get`` returns a table only once it's resident; the first request for a
+    table loads it in the background and is served from DuckDB meanwhile.
+    When the budget is exceeded the least recently used tables are dropped, and
+    a table bigger than the whole budget is never kept. A failed load isn't
+    retried until a backoff has passed; DuckDB serves the table until then.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = ADMIN_RESULTS_RESIDENT_MAX_BYTES,
+        loader: Callable[[str], ResidentAdminTable] = ResidentAdminTable.from_uri,
+    ):
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self.tables: "OrderedDict[str, ResidentAdminTable]" = OrderedDict()
+        self._loading: set = set()
+        self._too_large: set = set()
+        # uri -> (consecutive failed loads, monotonic time to retry at)
+        self._failures: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(table.nbytes for table in self.tables.values())
+
+    def get(self, uri: str) -> Optional[ResidentAdminTable]:
+        with self._lock:
+            table = self.tables.get(uri)
+            if table is not None:
+                self.tables.move_to_end(uri)
+                return table
+            if uri in self._loading or uri in self._too_large:
+                return None
+            failure = self._failures.get(uri)
+            if failure is not None and time.monotonic() < failure[1]:
+                return None
+            self._loading.add(uri)
+
+        threading.Thread(target=self._load, args=(uri,), daemon=True).start()
+        return None
+
+    def preload(self, uris: Iterable[str]) -> None:
+        """Start loading ``uris`` so they're resident before the first request."""
+        for uri in uris:
+            self.get(uri)
+
+    def _load(self, uri: str) -> None:
+        try:
+            table = self.loader(uri)
+        except Exception as e:
+            with self._lock:
+                failures = self._failures.get(uri, (0, 0.0))[0] + 1
+                retry_seconds = min(
+                    ADMIN_RESULTS_RESIDENT_RETRY_SECONDS * 2 ** min(failures - 1, 16),
+                    ADMIN_RESULTS_RESIDENT_MAX_RETRY_SECONDS,
+                )
+                self._failures[uri] = (failures, time.monotonic() + retry_seconds)
+            logging.warning(
+                {
+                    "event": "resident_admin_table_load_failure",
+                    "severity": "low",
+                    "uri": uri,
+                    "failures": failures,
+                    "retry_seconds": retry_seconds,
+                    "error_type": e.__class__.__name__,
+                    "error_details": str(e),
+                }
+            )
+            return
+        finally:
+            with self._lock:
+                self._loading.discard(uri)
+
+        with self._lock:
+            self._failures.pop(uri, None)
+            if table.nbytes > self.max_bytes:
+                self._too_large.add(uri)
+                logging.warning(
+                    {
+                        "event": "resident_admin_table_over_budget",
+                        "severity": "low",
+                        "uri": uri,
+                        "nbytes": table.nbytes,
+                        "max_bytes": self.max_bytes,
+                    }
+                )
+                return
+            self.tables[uri] = table
+            while self.nbytes > self.max_bytes:
+                evicted, _ = self.tables.popitem(last=False)
+                logging.info({"event": "resident_admin_table_evicted", "uri": evicted})
+        logging.info({"event": "resident_admin_table_loaded", "uri": uri})
+
+
+class ArrowPrecalcQueryService:
+    """Answers ``PrecalcSqlQueryBuilder`` queries from a resident table.
+
+    Same filters, grouping and aggregates as the SQL, evaluated with Arrow
+    compute over just the requested AOIs' rows.
+    """
+
+    FIELDS = PrecalcSqlQueryBuilder.FIELDS
+
+    def __init__(self, table: ResidentAdminTable):
+        self.table = table
+
+    def execute(self, aoi_ids, query: DatasetQuery) -> Dict:
+        rows = self.table.rows(aoi_ids)
+
+        for filt in query.filters:
+            column = rows.column(filt.dataset.get_field_name())
+            if filt.op == "in":
+                mask = pc.is_in(column, value_set=pa.array(list(filt.value)))
+            else:
+                mask = _COMPARISONS[filt.op](column, filt.value)
+            rows = rows.filter(mask)
+
+        keys = ["aoi_id", "aoi_type"] + [self.FIELDS[ds] for ds in query.group_bys]
+        fields = [self.FIELDS[ds] for ds in query.aggregate.datasets]
+        func = query.aggregate.func
+        result = rows.group_by(keys).aggregate([(field, func) for field in fields])
+        result = result.rename_columns(
+            [
+                name.removesuffix(f"_{func}") if name not in keys else name
+                for name in result.column_names
+            ]
+        )
+        return result.select(keys + fields).to_pydict()
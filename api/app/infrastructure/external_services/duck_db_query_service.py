@@ -1,40 +1,163 @@
 import asyncio
+import logging
+import os
+import time
 from concurrent.futures import ProcessPoolExecutor
-from typing import Dict
+from typing import Dict, Optional
 
 import duckdb
+import newrelic.agent as nr_agent
 
-process_pool = ProcessPoolExecutor(max_workers=2)
+from app.infrastructure.external_services.admin_results_mirror import (
+    AdminResultsMirror,
+    admin_results_mirror,
+)
+
+# Worker processes running admin queries, i.e. how many run concurrently.
+DUCKDB_QUERY_WORKERS = int(os.environ.get("DUCKDB_QUERY_WORKERS", 2))
+DUCKDB_THREADS_PER_WORKER = int(os.environ.get("DUCKDB_THREADS_PER_WORKER", 4))
+# The credential chain resolves to STS credentials that expire, and DuckDB does
+# not refresh them on its own (https://github.com/duckdb/duckdb-aws/issues/26).
+DUCKDB_CREDENTIAL_REFRESH_SECONDS = float(
+    os.environ.get("DUCKDB_CREDENTIAL_REFRESH_SECONDS", 15 * 60)
+)
+
+# Per worker process: a warm connection, and when its S3 secret was created.
+_connection: Optional[duckdb.DuckDBPyConnection] = None
+_secret_created_at: Optional[float] = None
+
+
+def _connect() -> duckdb.DuckDBPyConnection:
+    con = duckdb.connect(":memory:", config={"threads": str(DUCKDB_THREADS_PER_WORKER)})
+    # Keep parquet footers, HTTP metadata and file ranges between queries, so
+    # repeated queries against the same tables skip the footer fetches.
+    con.execute("SET enable_object_cache = true")
+    con.execute("SET enable_http_metadata_cache = true")
+    con.execute("SET enable_external_file_cache = true")
+    return con
+
+
+def _init_worker() -> None:
+    global _connection, _secret_created_at
+    _connection = _connect()
+    _secret_created_at = None
+
+
+def _refresh_credentials(con: duckdb.DuckDBPyConnection) -> None:
+    global _secret_created_at
+    now = time.monotonic()
+    if (
+        _secret_created_at is not None
+        and now - _secret_created_at < DUCKDB_CREDENTIAL_REFRESH_SECONDS
+    ):
+        return
+
+    con.execute(
+        """
+        CREATE OR REPLACE SECRET secret (
+            TYPE s3,
+            PROVIDER credential_chain,
+            CHAIN 'instance;env;config'
+        );
+    """
+    )
+    _secret_created_at = now
 
 
 def run_query_sync(sql: str, params=None):
-    con = duckdb.connect(":memory:", config={"threads": "4"})
+    global _connection
+    if _connection is None:
+        _init_worker()
+
     try:
-        con.execute(
-            """
-            CREATE OR REPLACE SECRET secret (
-                TYPE s3,
-                PROVIDER credential_chain,
-                CHAIN 'instance;env;config'
-            );
-        """
-        )
-        return con.execute(sql, params or []).fetchdf()
-    finally:
-        con.close()
+        _refresh_credentials(_connection)
+        return _connection.execute(sql, params or []).fetchdf()
+    except duckdb.ConnectionException:
+        # don't keep serving from a connection DuckDB has given up on
+        _connection.close()
+        _connection = None
+        raise
+
+
+class DuckDbQueryPool:
+    """Persistent worker processes, each holding one warm DuckDB connection.
+
+    Tracks how many queries are waiting for a free worker and reports it to
+    New Relic, so saturation shows up before the query timeouts do.
+    """
+
+    def __init__(self, max_workers: int = DUCKDB_QUERY_WORKERS):
+        self.max_workers = max_workers
+        self.in_flight = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.in_flight - self.max_workers)
+
+    async def run(self, sql: str, params=None):
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        self._record_queue_depth()
+        try:
+            return await loop.run_in_executor(
+                self._get_executor(), run_query_sync, sql, params
+            )
+        finally:
+            self.in_flight -= 1
+            self._record_queue_depth()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # created lazily so importing this module doesn't fork worker processes
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, initializer=_init_worker
+            )
+        return self._executor
+
+    def _record_queue_depth(self) -> None:
+        depth = self.queue_depth
+        nr_agent.record_custom_metric("Custom/DuckDb/InFlight", self.in_flight)
+        nr_agent.record_custom_metric("Custom/DuckDb/QueueDepth", depth)
+        if depth > 0:
+            logging.debug(
+                {
+                    "event": "duckdb_query_queued",
+                    "queue_depth": depth,
+                    "max_workers": self.max_workers,
+                }
+            )
+
+
+process_pool = DuckDbQueryPool()
 
 
 class DuckDbPrecalcQueryService:
-    def __init__(self, table_uri, timeout_seconds: float = 300):
+    def __init__(
+        self,
+        table_uri,
+        timeout_seconds: float = 300,
+        mirror: Optional[AdminResultsMirror] = admin_results_mirror,
+    ):
         self.table_uri = table_uri
         self.timeout_seconds = timeout_seconds
+        self.mirror = mirror
 
     async def execute(self, query: str) -> Dict:
+        # read the local copy of the table if it's mirrored, S3 otherwise
+        table_uri = self.table_uri
+        if self.mirror is not None:
+            table_uri = self.mirror.resolve(table_uri)
+
         # replace data_source in query FROM with actual table URI
-        query = query.replace("data_source", f"'{self.table_uri}'")
+        query = query.replace("data_source", f"'{table_uri}'")
         df = await asyncio.wait_for(self._run(query), timeout=self.timeout_seconds)
         return df.to_dict(orient="list")
 
     async def _run(self, query: str):
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(process_pool, run_query_sync, query)
+        return await process_pool.run(query)
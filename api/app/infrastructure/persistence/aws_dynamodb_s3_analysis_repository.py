@@ -1,10 +1,16 @@
 import asyncio
+import io
 import json
 import logging
 import os
+import time
 import traceback
 import uuid
+from collections import OrderedDict
+from typing import Optional
 
+import pyarrow as pa
+import pyarrow.parquet as pq
 from botocore.exceptions import ClientError
 
 from app.analysis.common.analysis import EnumEncoder
@@ -15,6 +21,70 @@ from app.models.common.areas_of_interest import CustomAreaOfInterest
 
 RESULTS_BUCKET_NAME = os.getenv("ANALYSIS_RESULTS_BUCKET_NAME", None)
 GEOMETRY_S3_PREFIX = "custom_areas/"
+# How long a claim to compute an analysis blocks other API tasks from it, in
+# case the claiming task dies before recording that the analysis is pending.
+ANALYSIS_LEASE_SECONDS = int(os.getenv("ANALYSIS_LEASE_SECONDS", 900))
+# Identifies this process as a lease holder.
+_LEASE_OWNER = str(uuid.uuid4())
+# Results bigger than this are uploaded in parts of RESULT_MULTIPART_PART_BYTES
+# (S3 needs at least 5 MiB for every part but the last).
+RESULT_MULTIPART_THRESHOLD_BYTES = int(
+    os.getenv("RESULT_MULTIPART_THRESHOLD_BYTES", 32 * 1024**2)
+)
+RESULT_MULTIPART_PART_BYTES = max(
+    int(os.getenv("RESULT_MULTIPART_PART_BYTES", 16 * 1024**2)), 5 * 1024**2
+)
+
+# Geometries known to be in S3 already, so storing an analysis for a custom
+# AOI doesn't check for its geometry every time. Bounded to the most recent.
+STORED_GEOMETRY_HASHES_MAX = int(os.getenv("STORED_GEOMETRY_HASHES_MAX", 10_000))
+_stored_geometry_hashes: "OrderedDict[str, None]" = OrderedDict()
+
+
+def _remember_stored_geometry(geometry_hash: str):
+    _stored_geometry_hashes[geometry_hash] = None
+    _stored_geometry_hashes.move_to_end(geometry_hash)
+    while len(_stored_geometry_hashes) > STORED_GEOMETRY_HASHES_MAX:
+        _stored_geometry_hashes.popitem(last=False)
+
+
+# Formats of result objects, recorded in the item's result_format. Items
+# written before it existed have no marker and hold plain JSON.
+RESULT_FORMAT_JSON = "json"
+RESULT_FORMAT_PARQUET = "parquet"
+RESULT_FORMAT_JSON_ZSTD = "json.zst"
+_RESULT_CONTENT_TYPES = {
+    RESULT_FORMAT_JSON: "application/json",
+    RESULT_FORMAT_PARQUET: "application/vnd.apache.parquet",
+    RESULT_FORMAT_JSON_ZSTD: "application/zstd",
+}
+
+
+def _serialize_result(result) -> tuple[str, bytes]:
+    """Columnar results as zstd Parquet, anything else as zstd JSON."""
+    if isinstance(result, dict):
+        try:
+            table = pa.Table.from_pydict(result)
+        except (pa.ArrowException, TypeError, ValueError):
+            pass
+        else:
+            sink = pa.BufferOutputStream()
+            pq.write_table(table, sink, compression="zstd")
+            return RESULT_FORMAT_PARQUET, sink.getvalue().to_pybytes()
+
+    sink = pa.BufferOutputStream()
+    with pa.CompressedOutputStream(sink, "zstd") as stream:
+        stream.write(json.dumps(result).encode("utf-8"))
+    return RESULT_FORMAT_JSON_ZSTD, sink.getvalue().to_pybytes()
+
+
+def _deserialize_result(result_format: str, content: bytes):
+    if result_format == RESULT_FORMAT_PARQUET:
+        return pq.read_table(pa.BufferReader(content)).to_pydict()
+    if result_format == RESULT_FORMAT_JSON_ZSTD:
+        with pa.CompressedInputStream(pa.BufferReader(content), "zstd") as stream:
+            content = stream.read()
+    return json.loads(content)
 
 
 # Helper function for retrying on throttling
@@ -49,17 +119,86 @@ class AwsDynamoDbS3AnalysisRepository(AnalysisRepository):
         self._s3 = s3
         self._aws_endpoint_url = aws_endpoint_url
         self._bucket_name = RESULTS_BUCKET_NAME
+        # The last feature collection hashed and its hash; one analysis stores
+        # the same metadata several times over its lifecycle.
+        self._hashed_geometry: Optional[tuple[dict, str]] = None
 
-    def _get_s3_key(self, resource_id: uuid.UUID) -> str:
+    def _get_s3_key(
+        self, resource_id: uuid.UUID, result_format: str = RESULT_FORMAT_JSON
+    ) -> str:
         """Generates the S3 key for storing the result of a given resource_id."""
-        return f"{self.analytics_category}/{resource_id}.json"
+        return f"{self.analytics_category}/{resource_id}.{result_format}"
+
+    async def _put_result(self, s3_key: str, result_format: str, body: bytes):
+        content_type = _RESULT_CONTENT_TYPES[result_format]
+        if len(body) <= RESULT_MULTIPART_THRESHOLD_BYTES:
+            await _retry_on_throttling(
+                self._s3.put_object,
+                Bucket=self._bucket_name,
+                Key=s3_key,
+                Body=body,
+                ContentType=content_type,
+            )
+            return
+
+        upload = await self._s3.create_multipart_upload(
+            Bucket=self._bucket_name, Key=s3_key, ContentType=content_type
+        )
+        upload_id = upload["UploadId"]
+        try:
+            stream = io.BytesIO(body)
+            chunks = iter(lambda: stream.read(RESULT_MULTIPART_PART_BYTES), b"")
+            parts = await asyncio.gather(
+                *(
+                    self._put_result_part(s3_key, upload_id, number, chunk)
+                    for number, chunk in enumerate(chunks, start=1)
+                )
+            )
+            await self._s3.complete_multipart_upload(
+                Bucket=self._bucket_name,
+                Key=s3_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": list(parts)},
+            )
+        except Exception:
+            await self._s3.abort_multipart_upload(
+                Bucket=self._bucket_name, Key=s3_key, UploadId=upload_id
+            )
+            raise
+
+    async def _put_result_part(
+        self, s3_key: str, upload_id: str, part_number: int, data: bytes
+    ) -> dict:
+        part = await _retry_on_throttling(
+            self._s3.upload_part,
+            Bucket=self._bucket_name,
+            Key=s3_key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+        return {"PartNumber": part_number, "ETag": part["ETag"]}
 
     @staticmethod
     def _get_geometry_s3_key(geometry_hash: str) -> str:
         return f"{GEOMETRY_S3_PREFIX}{geometry_hash}.geojson"
 
+    def _geometry_hash(self, aoi: dict) -> str:
+        feature_collection = aoi["feature_collection"]
+        if self._hashed_geometry is not None:
+            hashed, geometry_hash = self._hashed_geometry
+            if hashed is feature_collection:
+                return geometry_hash
+
+        geometry_hash = CustomAreaOfInterest(**aoi).compute_geometry_hash()
+        self._hashed_geometry = (feature_collection, geometry_hash)
+        return geometry_hash
+
     async def _store_geometry(self, geometry: dict, geometry_hash: str):
         """Upload feature_collection to S3, skipping if it already exists."""
+        if geometry_hash in _stored_geometry_hashes:
+            return
+
         s3_key = self._get_geometry_s3_key(geometry_hash)
         try:
             await _retry_on_throttling(
@@ -75,6 +214,7 @@ class AwsDynamoDbS3AnalysisRepository(AnalysisRepository):
                 Body=json.dumps(geometry).encode("utf-8"),
                 ContentType="application/geo+json",
             )
+        _remember_stored_geometry(geometry_hash)
 
     async def _load_geometry(self, geometry_hash: str) -> dict:
         """Retrieve a feature_collection from S3 by its hash."""
@@ -87,7 +227,8 @@ class AwsDynamoDbS3AnalysisRepository(AnalysisRepository):
             )
             async with response["Body"] as stream:
                 content = await stream.read()
-                return json.loads(content)
+            _remember_stored_geometry(geometry_hash)
+            return json.loads(content)
         except ClientError as e:
             logging.error(
                 {
@@ -131,6 +272,7 @@ class AwsDynamoDbS3AnalysisRepository(AnalysisRepository):
         status_value = item.get("status")
         status = AnalysisStatus(status_value) if status_value else None
         s3_key = item.get("s3_result_key")  # This is the pointer to the result in S3
+        result_format = item.get("result_format", RESULT_FORMAT_JSON)
 
         # Hydrate custom AOI geometry from S3 if stored as a reference
         if metadata and isinstance(metadata.get("aoi"), dict):
@@ -150,7 +292,9 @@ class AwsDynamoDbS3AnalysisRepository(AnalysisRepository):
                 )
                 async with response["Body"] as stream:
                     content = await stream.read()
-                    result_payload = json.loads(content)
+                result_payload = await asyncio.to_thread(
+                    _deserialize_result, result_format, content
+                )
             except ClientError as e:
                 error_code = e.response["Error"]["Code"]
                 if error_code != "NoSuchKey":
@@ -171,16 +315,21 @@ class AwsDynamoDbS3AnalysisRepository(AnalysisRepository):
         return Analysis(result=result_payload, metadata=metadata, status=status)
 
     async def store_analysis(self, resource_id: uuid.UUID, analytics: Analysis):
-        s3_key = self._get_s3_key(resource_id)
         resource_id_str = str(resource_id)
+        result_format, result_body = RESULT_FORMAT_JSON, None
+        if analytics.result is not None and analytics.status == AnalysisStatus.saved:
+            # serializing and compressing a large result would stall the loop
+            result_format, result_body = await asyncio.to_thread(
+                _serialize_result, analytics.result
+            )
+        s3_key = self._get_s3_key(resource_id, result_format)
 
         # Offload custom AOI feature_collection to S3 before storing metadata
         metadata = analytics.metadata
         if metadata and isinstance(metadata.get("aoi"), dict):
             aoi = metadata["aoi"]
             if aoi.get("type") == "feature_collection" and "feature_collection" in aoi:
-                custom_aoi = CustomAreaOfInterest(**aoi)
-                geometry_hash = custom_aoi.compute_geometry_hash()
+                geometry_hash = self._geometry_hash(aoi)
 
                 feature_collection = aoi.get("feature_collection")
                 await self._store_geometry(feature_collection, geometry_hash)
@@ -188,45 +337,115 @@ class AwsDynamoDbS3AnalysisRepository(AnalysisRepository):
                 new_aoi["feature_collection_hash"] = geometry_hash
                 metadata = {**metadata, "aoi": new_aoi}
 
-        # Prepare the item for DynamoDB
-        # DynamoDB does not allow floats like coordinates found in CustomAOIs.
-        # Therefore, 'metadata' is stored as a JSON string.
-        ddb_item = {
-            "resource_id": resource_id_str,
-            "metadata": json.dumps(metadata, cls=EnumEncoder),
-            "status": (
-                analytics.status.value if analytics.status else None
-            ),  # Store the enum's value (string)
-            "s3_result_key": s3_key,  # Always store the pointer, even if result is None
-        }
-
+        status = analytics.status.value if analytics.status else None
         logging.info(
             {
                 "event": "aws_dynamodb_s3_analysis_repository",
                 "message": "storing analysis resource",
-                "dynamodb_item": ddb_item,
+                "resource_id": resource_id_str,
+                "status": status,
+                "s3_result_key": s3_key,
             }
         )
 
-        # First, handle the S3 upload if there is a result and status is 'saved'
-        if analytics.result is not None and analytics.status == AnalysisStatus.saved:
+        # The result goes to S3 before the item points at it
+        if result_body is not None:
+            await self._put_result(s3_key, result_format, result_body)
+
+        # Each store moves the item to its new status with one conditional
+        # update. DynamoDB does not allow floats like coordinates found in
+        # CustomAOIs, so 'metadata' is stored as a JSON string.
+        update = {
+            "Key": {"resource_id": resource_id_str},
+            "ExpressionAttributeNames": {"#status": "status"},
+            "ExpressionAttributeValues": {
+                ":metadata": json.dumps(metadata, cls=EnumEncoder),
+                ":status": status,
+                ":s3_result_key": s3_key,  # always the pointer, even if result is None
+                ":result_format": result_format,
+            },
+            "ReturnValues": "UPDATED_OLD",
+        }
+        set_attributes = (
+            "SET metadata = :metadata, #status = :status,"
+            " s3_result_key = :s3_result_key, result_format = :result_format"
+        )
+        if analytics.status is None:
+            # A placeholder only creates an analysis or refreshes one that
+            # hasn't started. Resetting a started one to no status would let
+            # another task lease and compute it again, and resetting one
+            # another task has leased would drop its lease.
+            update["UpdateExpression"] = set_attributes
+            update["ConditionExpression"] = (
+                "(attribute_not_exists(#status) OR attribute_type(#status, :null))"
+                " AND (attribute_not_exists(lease_expires_at)"
+                " OR lease_expires_at < :now)"
+            )
+            update["ExpressionAttributeValues"][":now"] = int(time.time())
+            update["ExpressionAttributeValues"][":null"] = "NULL"
+        else:
+            # Once the analysis has started the lease has done its job.
+            update["UpdateExpression"] = (
+                f"{set_attributes} REMOVE lease_owner, lease_expires_at"
+            )
+
+        try:
+            response = await _retry_on_throttling(
+                self._dynamo_db_table.update_item, **update
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise e
+            return
+
+        # The item was replaced, so drop the result it pointed at before if it
+        # no longer does. Only saved analyses have one, so most stores delete
+        # nothing.
+        previous = response.get("Attributes", {})
+        if previous.get("status") == AnalysisStatus.saved.value:
+            previous_key = previous.get("s3_result_key")
+            if previous_key and (result_body is None or previous_key != s3_key):
+                await self._delete_result(previous_key)
+
+    async def _delete_result(self, s3_key: str):
+        try:
             await _retry_on_throttling(
-                self._s3.put_object,
-                Bucket=self._bucket_name,
-                Key=s3_key,
-                Body=json.dumps(analytics.result).encode("utf-8"),
+                self._s3.delete_object, Bucket=self._bucket_name, Key=s3_key
             )
-        elif analytics.status != AnalysisStatus.saved:
-            # If status is not 'saved', we should delete any existing result in S3
-            # to avoid orphaned data and ensure consistency.
-            try:
-                await _retry_on_throttling(
-                    self._s3.delete_object, Bucket=self._bucket_name, Key=s3_key
-                )
-            except ClientError as e:
-                # It's okay if the object didn't exist. Log other errors.
-                if e.response["Error"]["Code"] != "NoSuchKey":
-                    raise e
+        except ClientError as e:
+            # It's okay if the object didn't exist. Log other errors.
+            if e.response["Error"]["Code"] != "NoSuchKey":
+                raise e
 
-        # Second, store the metadata and pointer in DynamoDB
-        await _retry_on_throttling(self._dynamo_db_table.put_item, Item=ddb_item)
+    async def acquire_lease(self, resource_id: uuid.UUID) -> bool:
+        """Claim ``resource_id`` with a conditional write.
+
+        Succeeds only while the analysis hasn't started (no status yet) and no
+        other task holds an unexpired lease on it.
+        """
+        now = int(time.time())
+        try:
+            await _retry_on_throttling(
+                self._dynamo_db_table.update_item,
+                Key={"resource_id": str(resource_id)},
+                UpdateExpression=(
+                    "SET lease_owner = :owner, lease_expires_at = :expires_at"
+                ),
+                ConditionExpression=(
+                    "(attribute_not_exists(#status) OR attribute_type(#status, :null))"
+                    " AND (attribute_not_exists(lease_expires_at)"
+                    " OR lease_expires_at < :now OR lease_owner = :owner)"
+                ),
+                ExpressionAttributeNames={"#status": "status"},
+                ExpressionAttributeValues={
+                    ":owner": _LEASE_OWNER,
+                    ":expires_at": now + ANALYSIS_LEASE_SECONDS,
+                    ":now": now,
+                    ":null": "NULL",
+                },
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise e
+        return True
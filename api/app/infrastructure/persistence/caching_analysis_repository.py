@@ -0,0 +1,277 @@
+import asyncio
+import copy
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import orjson
+
+from app.domain.models.analysis import Analysis
+from app.domain.repositories.analysis_repository import AnalysisRepository
+from app.models.common.analysis import AnalysisStatus
+
+# Byte budget of analyses kept in memory, measured as (an estimate of) their
+# serialized JSON.
+ANALYSIS_CACHE_MAX_BYTES = int(
+    os.environ.get("ANALYSIS_CACHE_MAX_BYTES", 128 * 1024 * 1024)
+)
+# Saved analyses are also kept in this directory, if set.
+ANALYSIS_CACHE_DIR = os.environ.get("ANALYSIS_CACHE_DIR")
+# Analyses that can still change (not found, initializing, pending, failed)
+# are cached this long, so a client polling several API processes sees
+# progress made in another one within about this delay.
+ANALYSIS_CACHE_UNSAVED_TTL_SECONDS = float(
+    os.environ.get("ANALYSIS_CACHE_UNSAVED_TTL_SECONDS", 1)
+)
+# Rough JSON size of one value of a result column, e.g. an id or a float area.
+_RESULT_VALUE_BYTES = 16
+
+
+class AnalysisCache:
+    """A size-bounded LRU of loaded analyses, shared across requests.
+
+    Saved analyses never change, so they stay until evicted or overwritten by
+    a write through a ``CachingAnalysisRepository`` in this process. When
+    ``directory`` is set they're also written there, so they survive memory
+    eviction and restarts. Anything else expires after ``unsaved_ttl``.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = ANALYSIS_CACHE_MAX_BYTES,
+        directory: Optional[str] = ANALYSIS_CACHE_DIR,
+        unsaved_ttl: float = ANALYSIS_CACHE_UNSAVED_TTL_SECONDS,
+    ):
+        self.max_bytes = max_bytes
+        self.directory = Path(directory) if directory else None
+        self.unsaved_ttl = unsaved_ttl
+        # resource id -> (analysis, expiry as a monotonic time or None)
+        self.entries: OrderedDict[str, Tuple[Analysis, Optional[float]]] = OrderedDict()
+        self.sizes: Dict[str, int] = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # resource id -> (event set by the next write, number of waiters)
+        self._writes: Dict[str, Tuple[asyncio.Event, int]] = {}
+
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, resource_id: uuid.UUID) -> Optional[Analysis]:
+        key = str(resource_id)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                analysis, expires_at = entry
+                if expires_at is None or time.monotonic() < expires_at:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return _copy(analysis)
+                self._remove(key)
+            return None
+
+    def get_from_disk(self, resource_id: uuid.UUID) -> Optional[Analysis]:
+        """Read a saved analysis from the disk tier, keeping it in memory."""
+        if self.directory is None:
+            return None
+
+        path = self._path_for(resource_id)
+        try:
+            payload = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            stored = orjson.loads(payload)
+        except orjson.JSONDecodeError as e:
+            # A partial write or a corrupt file is just a miss.
+            logging.warning(
+                {
+                    "event": "analysis_cache_read_failure",
+                    "severity": "low",
+                    "path": str(path),
+                    "error_type": e.__class__.__name__,
+                    "error_details": str(e),
+                }
+            )
+            return None
+
+        analysis = Analysis(
+            result=stored["result"],
+            metadata=stored["metadata"],
+            status=AnalysisStatus.saved,
+        )
+        with self._lock:
+            self.hits += 1
+        self._put_in_memory(str(resource_id), analysis, len(payload))
+        return _copy(analysis)
+
+    def put(self, resource_id: uuid.UUID, analysis: Analysis) -> Optional[bytes]:
+        """Cache an analysis loaded from the repository, counting it as a miss.
+
+        Returns its payload if it belongs on disk. Only then is the result
+        serialized; its size in memory is estimated from its row count.
+        """
+        with self._lock:
+            self.misses += 1
+        self._put_in_memory(
+            str(resource_id), _copy(analysis), _estimated_size(analysis)
+        )
+        if analysis.status != AnalysisStatus.saved or self.directory is None:
+            return None
+        return orjson.dumps(
+            {"result": analysis.result, "metadata": analysis.metadata}, default=str
+        )
+
+    def write_to_disk(self, resource_id: uuid.UUID, payload: bytes) -> None:
+        path = self._path_for(resource_id)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            tmp_path.write_bytes(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(
+                {
+                    "event": "analysis_cache_write_failure",
+                    "severity": "low",
+                    "path": str(path),
+                    "error_type": e.__class__.__name__,
+                    "error_details": str(e),
+                }
+            )
+            tmp_path.unlink(missing_ok=True)
+
+    def invalidate(self, resource_id: uuid.UUID) -> None:
+        with self._lock:
+            self._remove(str(resource_id))
+        if self.directory is not None:
+            self._path_for(resource_id).unlink(missing_ok=True)
+
+    async def wait_for_write(self, resource_id: uuid.UUID, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for a write in this process."""
+        key = str(resource_id)
+        event, waiters = self._writes.get(key, (asyncio.Event(), 0))
+        self._writes[key] = (event, waiters + 1)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            current = self._writes.get(key)
+            if current is not None and current[0] is event:
+                if current[1] > 1:
+                    self._writes[key] = (event, current[1] - 1)
+                else:
+                    del self._writes[key]
+
+    def notify_write(self, resource_id: uuid.UUID) -> None:
+        """Wake everyone waiting on ``resource_id``. Call from the event loop."""
+        current = self._writes.pop(str(resource_id), None)
+        if current is not None:
+            current[0].set()
+
+    def _put_in_memory(self, key: str, analysis: Analysis, size: int) -> None:
+        if size > self.max_bytes:
+            return
+
+        expires_at = (
+            None
+            if analysis.status == AnalysisStatus.saved
+            else time.monotonic() + self.unsaved_ttl
+        )
+        with self._lock:
+            self._remove(key)
+            self.entries[key] = (analysis, expires_at)
+            self.sizes[key] = size
+            self.total_bytes += size
+
+            while self.total_bytes > self.max_bytes:
+                evicted_key, _ = self.entries.popitem(last=False)
+                self.total_bytes -= self.sizes.pop(evicted_key)
+
+    def _remove(self, key: str) -> None:
+        if key in self.entries:
+            del self.entries[key]
+            self.total_bytes -= self.sizes.pop(key)
+
+    def _path_for(self, resource_id: uuid.UUID) -> Path:
+        return self.directory / f"{resource_id}.json"
+
+
+def _estimated_size(analysis: Analysis) -> int:
+    """Approximate serialized size, without serializing the result.
+
+    Results are column-oriented (``{column: [values]}``), so the size is about
+    proportional to the number of values. Metadata is small apart from custom
+    AOI geometries, which are measured exactly.
+    """
+    result = analysis.result
+    if isinstance(result, dict):
+        values = sum(
+            len(column) if isinstance(column, (list, tuple)) else 1
+            for column in result.values()
+        )
+    elif isinstance(result, (list, tuple)):
+        values = sum(len(row) if isinstance(row, dict) else 1 for row in result)
+    else:
+        values = 0 if result is None else 1
+    metadata = orjson.dumps(analysis.metadata, default=str)
+    return values * _RESULT_VALUE_BYTES + len(metadata)
+
+
+def _copy(analysis: Analysis) -> Analysis:
+    # callers may edit metadata (e.g. hydrating an AOI); results are read-only
+    return Analysis(
+        result=analysis.result,
+        metadata=copy.deepcopy(analysis.metadata),
+        status=analysis.status,
+    )
+
+
+class CachingAnalysisRepository(AnalysisRepository):
+    """Reads analyses through an ``AnalysisCache`` before ``repository``.
+
+    Every write goes to ``repository`` and drops the cached copy, so the next
+    read in this process sees it, and wakes readers waiting for the write.
+    """
+
+    def __init__(self, repository: AnalysisRepository, cache: AnalysisCache):
+        self.repository = repository
+        self.cache = cache
+
+    async def load_analysis(self, resource_id: uuid.UUID) -> Analysis:
+        analysis = self.cache.get(resource_id)
+        if analysis is not None:
+            return analysis
+        if self.cache.directory is not None:
+            analysis = await asyncio.to_thread(self.cache.get_from_disk, resource_id)
+            if analysis is not None:
+                return analysis
+
+        analysis = await self.repository.load_analysis(resource_id)
+        payload = await asyncio.to_thread(self.cache.put, resource_id, analysis)
+        if payload is not None:
+            await asyncio.to_thread(self.cache.write_to_disk, resource_id, payload)
+        return analysis
+
+    async def store_analysis(self, resource_id: uuid.UUID, analytics: Analysis):
+        self.cache.invalidate(resource_id)
+        try:
+            await self.repository.store_analysis(resource_id, analytics)
+        finally:
+            # a read racing the write may have cached the old value
+            self.cache.invalidate(resource_id)
+            self.cache.notify_write(resource_id)
+
+    async def acquire_lease(self, resource_id: uuid.UUID) -> bool:
+        return await self.repository.acquire_lease(resource_id)
+
+    async def wait_for_write(self, resource_id: uuid.UUID, timeout: float) -> bool:
+        # writes from other processes go unseen; callers re-read on timeout
+        return await self.cache.wait_for_write(resource_id, timeout)
@@ -13,8 +13,21 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
 from pyinstrument import Profiler
 
+from .domain.analyzers.tree_cover_loss_analyzer import INPUT_URIS as TCL_INPUT_URIS
 from .domain.compute_engines.dask_client_router import DaskClientRouter
+from .domain.compute_engines.handlers.otf_implementations.otf_result_cache import (
+    OTFResultCache,
+)
+from .domain.models.environment import Environment
+from .domain.repositories.data_api_aoi_geometry_repository import close_http_client
+from .infrastructure.external_services.arrow_precalc_query_service import (
+    ADMIN_RESULTS_RESIDENT_MAX_BYTES,
+    ResidentAdminTables,
+)
+from .infrastructure.external_services.duck_db_query_service import process_pool
+from .infrastructure.persistence.caching_analysis_repository import AnalysisCache
 from .routers import land_change
+from .use_cases.analysis.analysis_scheduler import AnalysisScheduler
 
 ANALYSES_TABLE_NAME = os.environ.get("ANALYSES_TABLE_NAME")
 
@@ -93,6 +106,24 @@ async def lifespan(app: FastAPI):
     # Expose a single client for routers that don't use the router yet.
     app.state.dask_client = remote_client or local_client
 
+    # Per-AOI on-the-fly results, shared across requests in this process.
+    app.state.otf_result_cache = OTFResultCache()
+
+    # Loaded analyses, so polling a result doesn't hit DynamoDB and S3 each time.
+    app.state.analysis_cache = AnalysisCache()
+
+    # Analyses run from a bounded queue rather than all at once.
+    app.state.analysis_scheduler = AnalysisScheduler()
+
+    # Admin results tables served from memory, within a byte budget. Versioned
+    # tables (e.g. integrated alerts) load on their first request.
+    app.state.resident_admin_tables = None
+    if ADMIN_RESULTS_RESIDENT_MAX_BYTES > 0:
+        app.state.resident_admin_tables = ResidentAdminTables()
+        app.state.resident_admin_tables.preload(
+            [TCL_INPUT_URIS[Environment.production]["admin_results_uri"]]
+        )
+
     # Create an AWS Session and connections to DyamoDb and S3
     session = aioboto3.Session()
     async with session.client("s3", region_name="us-east-1") as s3_client:
@@ -101,6 +132,9 @@ async def lifespan(app: FastAPI):
             app.state.s3_client = s3_client
             yield
 
+    await close_http_client()
+    process_pool.shutdown()
+
 
 app = FastAPI(lifespan=lifespan)
 
@@ -3,7 +3,7 @@ import uuid
 from enum import Enum
 from typing import Optional
 
-from pydantic import PrivateAttr
+from pydantic import Field, PrivateAttr, model_serializer, model_validator
 
 from app.models.common.areas_of_interest import AreaOfInterest
 from app.models.common.base import StrictBaseModel
@@ -65,6 +65,33 @@ class AnalyticsIn(StrictBaseModel):
         return uuid.uuid5(uuid.NAMESPACE_DNS, payload_json)
 
 
+class ApproximableAnalyticsIn(AnalyticsIn):
+    """Analytics that can be computed from coarse overviews for a quick preview."""
+
+    approximate: bool = Field(
+        default=False,
+        title="Approximate",
+        description="Compute a quick approximate result from coarse overviews of "
+        "the datasets instead of every pixel. Only available for on-the-fly AOIs.",
+    )
+
+    @model_serializer(mode="wrap")
+    def _omit_exact(self, handler):
+        # left out when False, so exact analyses keep their existing thumbprints
+        data = handler(self)
+        if not self.approximate:
+            data.pop("approximate", None)
+        return data
+
+    @model_validator(mode="after")
+    def validate_approximate_aoi(self):
+        if self.approximate and self.aoi.type == "admin":
+            raise ValueError(
+                "approximate is not available for admin AOIs, which are precomputed."
+            )
+        return self
+
+
 class AnalyticsOut(StrictBaseModel):
     result: Optional[dict] = None
     metadata: Optional[dict] = None
@@ -2,7 +2,7 @@ from typing import Annotated, List, Literal, Optional, Union
 
 from pydantic import Field, PrivateAttr
 
-from app.models.common.analysis import AnalysisStatus, AnalyticsIn
+from app.models.common.analysis import AnalysisStatus, ApproximableAnalyticsIn
 from app.models.common.areas_of_interest import (
     AdminAreaOfInterest,
     IndigenousAreaOfInterest,
@@ -28,7 +28,7 @@ AoiUnion = Union[
 ValidCanopyCover = Literal[10, 15, 20, 25, 30, 50, 75]
 
 
-class TreeCoverAnalyticsIn(AnalyticsIn):
+class TreeCoverAnalyticsIn(ApproximableAnalyticsIn):
     _analytics_name: str = PrivateAttr(default=ANALYTICS_NAME)
     _version: str = PrivateAttr(default="v20250909")
     aoi: Annotated[AoiUnion, Field(discriminator="type")] = Field(
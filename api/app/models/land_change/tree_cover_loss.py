@@ -7,7 +7,7 @@ from pydantic import (
     model_validator,
 )
 
-from app.models.common.analysis import AnalysisStatus, AnalyticsIn
+from app.models.common.analysis import AnalysisStatus, ApproximableAnalyticsIn
 from app.models.common.areas_of_interest import (
     AdminAreaOfInterest,
     CustomAreaOfInterest,
@@ -33,7 +33,7 @@ AllowedForestFilter = Literal["primary_forest", "natural_forest", "intact_forest
 AllowedIntersections = List[Literal["driver", "fire"]]
 
 
-class TreeCoverLossAnalyticsIn(AnalyticsIn):
+class TreeCoverLossAnalyticsIn(ApproximableAnalyticsIn):
     _analytics_name: str = PrivateAttr(default=ANALYTICS_NAME)
     _version: str = PrivateAttr(default="20250912")
     aoi: Annotated[AoiUnion, Field(discriminator="type")] = Field(
@@ -108,6 +108,19 @@ class TreeCoverLossAnalyticsIn(AnalyticsIn):
                 )
         return self
 
+    @model_validator(mode="after")
+    def validate_approximate_forest_filter(self):
+        if self.approximate and self.forest_filter in (
+            "natural_forest",
+            "intact_forest",
+        ):
+            raise ValueError(
+                f"approximate is not available with the {self.forest_filter} filter, "
+                "which has no overviews."
+            )
+        return self
+
+
 class TreeCoverLossAnalytics(StrictBaseModel):
     result: Optional[dict] = None
     metadata: Optional[dict] = None
@@ -1,17 +1,54 @@
+import io
+import json
 import logging
+import os
+import time
 import traceback
-from typing import Callable
+from typing import AsyncIterator, Callable, Iterator, Optional
 from uuid import UUID
 
-from fastapi import BackgroundTasks, HTTPException, Request
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import BackgroundTasks, HTTPException, Query, Request
 from fastapi import Response as FastAPIResponse
+from fastapi.responses import StreamingResponse
 
 from app.domain.models.analysis import Analysis
 from app.domain.repositories.analysis_repository import AnalysisRepository
 from app.models.common.analysis import AnalysisStatus, AnalyticsIn, AnalyticsOut
 from app.models.common.base import DataMartResourceLink, DataMartResourceLinkResponse
+from app.use_cases.analysis.analysis_scheduler import SchedulerSaturatedError
 from app.use_cases.analysis.analysis_service import AnalysisService
 
+JSON_MEDIA_TYPE = "application/json"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+EVENT_STREAM_MEDIA_TYPE = "text/event-stream"
+
+FINISHED_STATUSES = (AnalysisStatus.saved, AnalysisStatus.failed)
+# Longest a GET may wait for a pending analysis, through its ``wait`` parameter.
+ANALYSIS_MAX_WAIT_SECONDS = float(os.environ.get("ANALYSIS_MAX_WAIT_SECONDS", 30))
+# Waiters wake on writes made in this process; writes made by other API
+# processes are picked up by re-reading the analysis this often.
+ANALYSIS_WAIT_RECHECK_SECONDS = float(
+    os.environ.get("ANALYSIS_WAIT_RECHECK_SECONDS", 5)
+)
+# Event streams are closed after this long, and clients reconnect.
+ANALYSIS_EVENTS_MAX_SECONDS = float(os.environ.get("ANALYSIS_EVENTS_MAX_SECONDS", 600))
+
+# Rows per Arrow record batch / Parquet row group of a streamed result.
+COLUMNAR_BATCH_ROWS = int(os.environ.get("COLUMNAR_BATCH_ROWS", 65_536))
+
+# Documents the columnar formats on GET endpoints that support them.
+COLUMNAR_RESPONSES = {
+    200: {
+        "description": "Analysis result. Saved results are also available as an "
+        f"Arrow IPC stream ({ARROW_STREAM_MEDIA_TYPE}) or Parquet "
+        f"({PARQUET_MEDIA_TYPE}) through the Accept header.",
+        "content": {ARROW_STREAM_MEDIA_TYPE: {}, PARQUET_MEDIA_TYPE: {}},
+    }
+}
+
 
 async def create_analysis(
     data: AnalyticsIn,
@@ -30,11 +67,21 @@ async def create_analysis(
                 "resource_id": service.resource_thumbprint(),
             }
         )
-        background_tasks.add_task(service.do)
+        scheduler = getattr(request.app.state, "analysis_scheduler", None)
+        if scheduler is not None and service.analytics_resource.status is None:
+            scheduler.submit(service)
+        else:
+            background_tasks.add_task(service.do)
         link_url = resource_link_callback(request=request, service=service)
         link = DataMartResourceLink(link=link_url)
         return DataMartResourceLinkResponse(data=link, status=service.get_status())
 
+    except SchedulerSaturatedError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many analyses in progress, follow Retry-After header.",
+            headers={"Retry-After": str(e.retry_after_seconds)},
+        ) from e
     except Exception as e:
         logging.error(
             {
@@ -52,34 +99,33 @@ async def get_analysis(
     resource_id: UUID,
     analysis_repository: AnalysisRepository,
     response: FastAPIResponse,
+    wait: float = 0,
 ) -> AnalyticsOut:
-    analysis: Analysis = Analysis(result=None, metadata=None, status=None)
-
-    try:
-        analysis = await analysis_repository.load_analysis(resource_id)
-    except Exception as e:
-        logging.error(
-            {
-                "event": "common_analytics_resource_request_failure",
-                "severity": "high",
-                "resource_id": resource_id,
-                "resource_metadata": analysis.metadata,
-                "error_type": e.__class__.__name__,
-                "error_details": str(e),
-                "traceback": traceback.format_exc(),
-            }
-        )
-        raise HTTPException(status_code=500, detail="Internal server error")
-
+    analysis = await _load_analysis(resource_id, analysis_repository)
     if analysis.metadata is None:
         raise HTTPException(status_code=404, detail="Analysis not found")
 
+    deadline = time.monotonic() + min(wait, ANALYSIS_MAX_WAIT_SECONDS)
+    while analysis.status not in FINISHED_STATUSES:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        await analysis_repository.wait_for_write(
+            resource_id, min(remaining, ANALYSIS_WAIT_RECHECK_SECONDS)
+        )
+        analysis = await _load_analysis(resource_id, analysis_repository)
+
     match analysis.status:
         case AnalysisStatus.pending:
             response.headers["Retry-After"] = "1"
             message = "Resource is still processing, follow Retry-After header."
         case AnalysisStatus.saved:
             message = "Analysis completed successfully."
+            if analysis.metadata.get("approximate"):
+                message += (
+                    " Results are approximate, computed from coarse overviews"
+                    " of the datasets."
+                )
         case AnalysisStatus.failed:
             if analysis.result and "error" in analysis.result:
                 message = analysis.result["error"]
@@ -95,3 +141,173 @@ async def get_analysis(
         result=analysis.result,
         metadata={k: v for k, v in analysis.metadata.items() if not k.startswith("_")},
     )
+
+
+def wait_seconds(
+    wait: float = Query(
+        0,
+        ge=0,
+        le=ANALYSIS_MAX_WAIT_SECONDS,
+        description="Seconds to wait for a pending analysis to finish before "
+        "responding.",
+    )
+) -> float:
+    return wait
+
+
+async def analysis_events(
+    resource_id: UUID, analysis_repository: AnalysisRepository
+) -> StreamingResponse:
+    """Stream an analysis' status changes as server-sent events.
+
+    Sends a ``status`` event with the current status, then one per change
+    until the analysis is saved or failed.
+    """
+    analysis = await _load_analysis(resource_id, analysis_repository)
+    if analysis.metadata is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+
+    return StreamingResponse(
+        _status_events(resource_id, analysis_repository, analysis),
+        media_type=EVENT_STREAM_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _status_events(
+    resource_id: UUID, analysis_repository: AnalysisRepository, analysis: Analysis
+) -> AsyncIterator[bytes]:
+    deadline = time.monotonic() + ANALYSIS_EVENTS_MAX_SECONDS
+    sent_status: Optional[AnalysisStatus] = None
+    while True:
+        # a missing status means initializing, which clients see as pending
+        status = analysis.status or AnalysisStatus.pending
+        if status != sent_status:
+            data = json.dumps({"status": status.value})
+            yield f"event: status\ndata: {data}\n\n".encode()
+            sent_status = status
+        if status in FINISHED_STATUSES:
+            return
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            # clients reconnect and get the current status first
+            return
+        written = await analysis_repository.wait_for_write(
+            resource_id, min(remaining, ANALYSIS_WAIT_RECHECK_SECONDS)
+        )
+        if not written:
+            yield b": keep-alive\n\n"
+        try:
+            analysis = await _load_analysis(resource_id, analysis_repository)
+        except HTTPException:
+            return
+
+
+async def _load_analysis(
+    resource_id: UUID, analysis_repository: AnalysisRepository
+) -> Analysis:
+    analysis: Analysis = Analysis(result=None, metadata=None, status=None)
+
+    try:
+        analysis = await analysis_repository.load_analysis(resource_id)
+    except Exception as e:
+        logging.error(
+            {
+                "event": "common_analytics_resource_request_failure",
+                "severity": "high",
+                "resource_id": resource_id,
+                "resource_metadata": analysis.metadata,
+                "error_type": e.__class__.__name__,
+                "error_details": str(e),
+                "traceback": traceback.format_exc(),
+            }
+        )
+        raise HTTPException(status_code=500, detail="Internal server error")
+    return analysis
+
+
+def negotiate_result_media_type(accept: Optional[str]) -> str:
+    """Pick JSON, Arrow or Parquet from an ``Accept`` header.
+
+    The highest quality supported type wins, with ties going to the one listed
+    first. Wildcards, a missing header and anything unsupported mean JSON.
+    """
+    supported = {JSON_MEDIA_TYPE, ARROW_STREAM_MEDIA_TYPE, PARQUET_MEDIA_TYPE}
+    best, best_quality = JSON_MEDIA_TYPE, 0.0
+    for media_range in (accept or "").split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        if media_type.lower() not in supported:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > best_quality:
+            best, best_quality = media_type.lower(), quality
+    return best
+
+
+def columnar_result_response(
+    request: Request, analytics_out: AnalyticsOut
+) -> Optional[StreamingResponse]:
+    """Stream a saved result as Arrow or Parquet if the client asked for it.
+
+    Returns None when JSON was negotiated or the analysis has no result yet,
+    so the caller falls back to its JSON response. Status, message and
+    metadata travel in the schema metadata of the table.
+    """
+    media_type = negotiate_result_media_type(request.headers.get("accept"))
+    if media_type == JSON_MEDIA_TYPE:
+        return None
+    if analytics_out.status != AnalysisStatus.saved or not analytics_out.result:
+        return None
+
+    try:
+        table = pa.Table.from_pydict(analytics_out.result)
+    except (pa.ArrowException, TypeError, ValueError) as e:
+        raise HTTPException(
+            status_code=406,
+            detail="Result is not tabular, request it as application/json.",
+        ) from e
+    table = table.replace_schema_metadata(
+        {
+            "status": analytics_out.status.value,
+            "message": analytics_out.message or "",
+            "metadata": json.dumps(analytics_out.metadata, default=str),
+        }
+    )
+    if media_type == ARROW_STREAM_MEDIA_TYPE:
+        body = _arrow_stream(table, COLUMNAR_BATCH_ROWS)
+    else:
+        body = _parquet_stream(table, COLUMNAR_BATCH_ROWS)
+    return StreamingResponse(body, media_type=media_type, headers={"Vary": "Accept"})
+
+
+def _arrow_stream(table: pa.Table, batch_rows: int) -> Iterator[bytes]:
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=batch_rows):
+            writer.write_batch(batch)
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+def _parquet_stream(table: pa.Table, batch_rows: int) -> Iterator[bytes]:
+    sink = io.BytesIO()
+    with pq.ParquetWriter(sink, table.schema, compression="zstd") as writer:
+        for batch in table.to_batches(max_chunksize=batch_rows):
+            writer.write_batch(batch, row_group_size=batch_rows)
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, BackgroundTasks, Depends, Request
 from fastapi import Response as FastAPIResponse
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import UUID5
 
 from app.dependencies import get_environment
@@ -16,6 +16,9 @@ from app.infrastructure.external_services.duck_db_query_service import (
 from app.infrastructure.persistence.aws_dynamodb_s3_analysis_repository import (
     AwsDynamoDbS3AnalysisRepository,
 )
+from app.infrastructure.persistence.caching_analysis_repository import (
+    CachingAnalysisRepository,
+)
 from app.models.common.analysis import AnalyticsOut
 from app.models.common.base import DataMartResourceLinkResponse
 from app.models.land_change.deforestation_luc_emissions_factor import (
@@ -24,15 +27,27 @@ from app.models.land_change.deforestation_luc_emissions_factor import (
     DeforestationLUCEmissionsFactorAnalyticsIn,
     DeforestationLUCEmissionsFactorAnalyticsResponse,
 )
-from app.routers.common_analytics import create_analysis, get_analysis
+from app.routers.common_analytics import (
+    COLUMNAR_RESPONSES,
+    analysis_events,
+    columnar_result_response,
+    create_analysis,
+    get_analysis,
+    wait_seconds,
+)
 from app.use_cases.analysis.analysis_service import AnalysisService
 
 router = APIRouter(prefix=f"/{ANALYTICS_NAME}")
 
 
 def get_analysis_repository(request: Request) -> AnalysisRepository:
-    return AwsDynamoDbS3AnalysisRepository(
-        ANALYTICS_NAME, request.app.state.dynamodb_table, request.app.state.s3_client
+    return CachingAnalysisRepository(
+        AwsDynamoDbS3AnalysisRepository(
+            ANALYTICS_NAME,
+            request.app.state.dynamodb_table,
+            request.app.state.s3_client,
+        ),
+        request.app.state.analysis_cache,
     )
 
 
@@ -93,19 +108,38 @@ def _datamart_resource_link_response(request, service) -> str:
     response_class=ORJSONResponse,
     response_model=DeforestationLUCEmissionsFactorAnalyticsResponse,
     status_code=200,
+    responses=COLUMNAR_RESPONSES,
 )
 async def get_deforestation_luc_emissions_factor_analytics_result(
     resource_id: UUID5,
+    request: Request,
     response: FastAPIResponse,
     analysis_repository: AnalysisRepository = Depends(get_analysis_repository),
+    wait: float = Depends(wait_seconds),
 ):
     analytics_out: AnalyticsOut = await get_analysis(
         resource_id=resource_id,
         analysis_repository=analysis_repository,
         response=response,
+        wait=wait,
     )
+    columnar = columnar_result_response(request, analytics_out)
+    if columnar is not None:
+        return columnar
 
     return DeforestationLUCEmissionsFactorAnalyticsResponse(
         data=DeforestationLUCEmissionsFactorAnalytics(**analytics_out.model_dump()),
         status="success",
     )
+
+
+@router.get(
+    "/analytics/{resource_id}/events",
+    response_class=StreamingResponse,
+    status_code=200,
+)
+async def get_deforestation_luc_emissions_factor_analytics_events(
+    resource_id: UUID5,
+    analysis_repository: AnalysisRepository = Depends(get_analysis_repository),
+):
+    return await analysis_events(resource_id, analysis_repository)
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, BackgroundTasks, Depends, Request
 from fastapi import Response as FastAPIResponse
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import UUID5
 
 from app.dependencies import get_environment
@@ -10,6 +10,9 @@ from app.domain.repositories.analysis_repository import AnalysisRepository
 from app.infrastructure.persistence.aws_dynamodb_s3_analysis_repository import (
     AwsDynamoDbS3AnalysisRepository,
 )
+from app.infrastructure.persistence.caching_analysis_repository import (
+    CachingAnalysisRepository,
+)
 from app.models.common.analysis import AnalyticsOut
 from app.models.common.base import (
     DataMartResourceLinkResponse,
@@ -20,15 +23,27 @@ from app.models.land_change.dist_alerts import (
     DistAlertsAnalyticsIn,
     DistAlertsAnalyticsResponse,
 )
-from app.routers.common_analytics import create_analysis, get_analysis
+from app.routers.common_analytics import (
+    COLUMNAR_RESPONSES,
+    analysis_events,
+    columnar_result_response,
+    create_analysis,
+    get_analysis,
+    wait_seconds,
+)
 from app.use_cases.analysis.analysis_service import AnalysisService
 
 router = APIRouter(prefix=f"/{ANALYTICS_NAME}")
 
 
 def get_analysis_repository(request: Request) -> AnalysisRepository:
-    return AwsDynamoDbS3AnalysisRepository(
-        ANALYTICS_NAME, request.app.state.dynamodb_table, request.app.state.s3_client
+    return CachingAnalysisRepository(
+        AwsDynamoDbS3AnalysisRepository(
+            ANALYTICS_NAME,
+            request.app.state.dynamodb_table,
+            request.app.state.s3_client,
+        ),
+        request.app.state.analysis_cache,
     )
 
 
@@ -42,6 +57,7 @@ def create_analysis_service(
         analyzer=DistAlertsAnalyzer(
             compute_engine=getattr(request.app.state, "dask_client", None),
             input_uris=resolve_uris(INPUT_URIS, environment),
+            resident_tables=getattr(request.app.state, "resident_admin_tables", None),
         ),
         event=ANALYTICS_NAME,
     )
@@ -99,18 +115,37 @@ async def create(
     response_class=ORJSONResponse,
     response_model=DistAlertsAnalyticsResponse,
     status_code=200,
+    responses=COLUMNAR_RESPONSES,
 )
 async def get_dist_alerts_analytics_result(
     resource_id: UUID5,
+    request: Request,
     response: FastAPIResponse,
     analysis_repository: AnalysisRepository = Depends(get_analysis_repository),
+    wait: float = Depends(wait_seconds),
 ):
     analytics_out: AnalyticsOut = await get_analysis(
         resource_id=resource_id,
         analysis_repository=analysis_repository,
         response=response,
+        wait=wait,
     )
+    columnar = columnar_result_response(request, analytics_out)
+    if columnar is not None:
+        return columnar
 
     return DistAlertsAnalyticsResponse(
         data=DistAlertsAnalytics(**analytics_out.model_dump()), status="success"
     )
+
+
+@router.get(
+    "/analytics/{resource_id}/events",
+    response_class=StreamingResponse,
+    status_code=200,
+)
+async def get_dist_alerts_analytics_events(
+    resource_id: UUID5,
+    analysis_repository: AnalysisRepository = Depends(get_analysis_repository),
+):
+    return await analysis_events(resource_id, analysis_repository)
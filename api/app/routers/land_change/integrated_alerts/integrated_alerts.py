@@ -4,7 +4,7 @@ import boto3
 from cachetools.func import ttl_cache
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 from fastapi import Response as FastAPIResponse
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import UUID5
 
 from app.dependencies import get_environment
@@ -20,6 +20,9 @@ from app.infrastructure.external_services.duck_db_query_service import (
 from app.infrastructure.persistence.aws_dynamodb_s3_analysis_repository import (
     AwsDynamoDbS3AnalysisRepository,
 )
+from app.infrastructure.persistence.caching_analysis_repository import (
+    CachingAnalysisRepository,
+)
 from app.models.common.analysis import AnalyticsOut
 from app.models.common.base import DataMartResourceLinkResponse
 from app.models.land_change.integrated_alerts import (
@@ -28,15 +31,27 @@ from app.models.land_change.integrated_alerts import (
     IntegratedAlertsAnalyticsIn,
     IntegratedAlertsAnalyticsResponse,
 )
-from app.routers.common_analytics import create_analysis, get_analysis
+from app.routers.common_analytics import (
+    COLUMNAR_RESPONSES,
+    analysis_events,
+    columnar_result_response,
+    create_analysis,
+    get_analysis,
+    wait_seconds,
+)
 from app.use_cases.analysis.analysis_service import AnalysisService
 
 router = APIRouter(prefix=f"/{ANALYTICS_NAME}")
 
 
 def get_analysis_repository(request: Request) -> AnalysisRepository:
-    return AwsDynamoDbS3AnalysisRepository(
-        ANALYTICS_NAME, request.app.state.dynamodb_table, request.app.state.s3_client
+    return CachingAnalysisRepository(
+        AwsDynamoDbS3AnalysisRepository(
+            ANALYTICS_NAME,
+            request.app.state.dynamodb_table,
+            request.app.state.s3_client,
+        ),
+        request.app.state.analysis_cache,
     )
 
 
@@ -71,6 +86,7 @@ def create_analysis_service(
             ),
             input_uris=input_uris,
             otf_timeout_seconds=float(os.environ.get("OTF_TIMEOUT_SECONDS", 600)),
+            resident_tables=getattr(request.app.state, "resident_admin_tables", None),
         ),
         event=ANALYTICS_NAME,
     )
@@ -115,18 +131,37 @@ def _datamart_resource_link_response(request, service) -> str:
     response_class=ORJSONResponse,
     response_model=IntegratedAlertsAnalyticsResponse,
     status_code=200,
+    responses=COLUMNAR_RESPONSES,
 )
 async def get_integrated_alerts_analytics_result(
     resource_id: UUID5,
+    request: Request,
     response: FastAPIResponse,
     analysis_repository: AnalysisRepository = Depends(get_analysis_repository),
+    wait: float = Depends(wait_seconds),
 ):
     analytics_out: AnalyticsOut = await get_analysis(
         resource_id=resource_id,
         analysis_repository=analysis_repository,
         response=response,
+        wait=wait,
     )
+    columnar = columnar_result_response(request, analytics_out)
+    if columnar is not None:
+        return columnar
 
     return IntegratedAlertsAnalyticsResponse(
         data=IntegratedAlertsAnalytics(**analytics_out.model_dump()), status="success"
     )
+
+
+@router.get(
+    "/analytics/{resource_id}/events",
+    response_class=StreamingResponse,
+    status_code=200,
+)
+async def get_integrated_alerts_analytics_events(
+    resource_id: UUID5,
+    analysis_repository: AnalysisRepository = Depends(get_analysis_repository),
+):
+    return await analysis_events(resource_id, analysis_repository)
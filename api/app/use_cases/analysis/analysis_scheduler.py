@@ -0,0 +1,176 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Set
+
+import newrelic.agent as nr_agent
+
+from app.use_cases.analysis.analysis_service import AnalysisService
+
+ANALYSIS_QUEUE_MAX_SIZE = int(os.environ.get("ANALYSIS_QUEUE_MAX_SIZE", 200))
+ANALYSIS_MAX_CONCURRENCY = int(os.environ.get("ANALYSIS_MAX_CONCURRENCY", 16))
+ANALYSIS_MAX_CONCURRENCY_PER_ANALYTIC = int(
+    os.environ.get("ANALYSIS_MAX_CONCURRENCY_PER_ANALYTIC", 8)
+)
+# Applies to on-the-fly AOI types. Admin analyses read precomputed tables, so
+# they're only bounded by the overall limit.
+ANALYSIS_MAX_CONCURRENCY_PER_AOI_TYPE = int(
+    os.environ.get("ANALYSIS_MAX_CONCURRENCY_PER_AOI_TYPE", 6)
+)
+
+# Bounds on the Retry-After we hand out, in seconds.
+MIN_RETRY_AFTER_SECONDS = 1
+MAX_RETRY_AFTER_SECONDS = 300
+
+
+class SchedulerSaturatedError(Exception):
+    def __init__(self, retry_after_seconds: int):
+        super().__init__(f"Analysis queue is full, retry after {retry_after_seconds}s")
+        self.retry_after_seconds = retry_after_seconds
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    analytic: str = field(compare=False)
+    aoi_type: str = field(compare=False)
+    run: Callable = field(compare=False)
+    queued_at: float = field(compare=False)
+
+
+def job_priority(metadata: Dict) -> int:
+    """Lower runs first: admin jobs, then by number of AOIs."""
+    aoi = metadata.get("aoi", {})
+    if aoi.get("type") == "admin":
+        return 0
+    if aoi.get("type") == "feature_collection":
+        return len(aoi.get("feature_collection", {}).get("features", []))
+    return len(aoi.get("ids", []))
+
+
+class AnalysisScheduler:
+    """Runs analyses from a bounded priority queue instead of all at once.
+
+    Limits how many run at a time overall, per analytic and per on-the-fly AOI
+    type, and prefers admin and small jobs when a slot frees up. When the queue
+    is full, ``submit`` raises ``SchedulerSaturatedError`` with a Retry-After
+    estimated from the queue length and recent run times.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int = ANALYSIS_QUEUE_MAX_SIZE,
+        max_concurrency: int = ANALYSIS_MAX_CONCURRENCY,
+        max_per_analytic: int = ANALYSIS_MAX_CONCURRENCY_PER_ANALYTIC,
+        max_per_aoi_type: int = ANALYSIS_MAX_CONCURRENCY_PER_AOI_TYPE,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_queue_size = max_queue_size
+        self.max_concurrency = max_concurrency
+        self.max_per_analytic = max_per_analytic
+        self.max_per_aoi_type = max_per_aoi_type
+        self.clock = clock
+
+        self.queue: List[_Job] = []
+        self.running_count = 0
+        self.running_by_analytic: Counter = Counter()
+        self.running_by_aoi_type: Counter = Counter()
+        # moving average of how long an analysis takes, seeded with a guess
+        self.average_run_seconds = 10.0
+        self._tasks: Set[asyncio.Task] = set()
+        self._seq = itertools.count()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.queue)
+
+    def retry_after_seconds(self) -> int:
+        waves = (self.queue_depth + 1) / self.max_concurrency
+        estimate = math.ceil(waves * self.average_run_seconds)
+        return max(MIN_RETRY_AFTER_SECONDS, min(MAX_RETRY_AFTER_SECONDS, estimate))
+
+    def submit(self, service: AnalysisService) -> None:
+        if self.queue_depth >= self.max_queue_size:
+            retry_after = self.retry_after_seconds()
+            logging.warning(
+                {
+                    "event": "analysis_queue_saturated",
+                    "severity": "medium",
+                    "analytic": service.event_name(),
+                    "queue_depth": self.queue_depth,
+                    "retry_after_seconds": retry_after,
+                }
+            )
+            raise SchedulerSaturatedError(retry_after)
+
+        metadata = service.analytics_resource.metadata or {}
+        heapq.heappush(
+            self.queue,
+            _Job(
+                priority=job_priority(metadata),
+                seq=next(self._seq),
+                analytic=service.event_name(),
+                aoi_type=metadata.get("aoi", {}).get("type", ""),
+                run=service.do,
+                queued_at=self.clock(),
+            ),
+        )
+        self._dispatch()
+
+    def _can_start(self, job: _Job) -> bool:
+        if self.running_count >= self.max_concurrency:
+            return False
+        if self.running_by_analytic[job.analytic] >= self.max_per_analytic:
+            return False
+        return (
+            job.aoi_type == "admin"
+            or self.running_by_aoi_type[job.aoi_type] < self.max_per_aoi_type
+        )
+
+    def _dispatch(self) -> None:
+        waiting = []
+        while self.queue and self.running_count < self.max_concurrency:
+            job = heapq.heappop(self.queue)
+            if self._can_start(job):
+                self._start(job)
+            else:
+                waiting.append(job)
+        for job in waiting:
+            heapq.heappush(self.queue, job)
+        self._record_metrics()
+
+    def _start(self, job: _Job) -> None:
+        wait_seconds = self.clock() - job.queued_at
+        nr_agent.record_custom_metric("Custom/AnalysisQueue/WaitSeconds", wait_seconds)
+
+        self.running_count += 1
+        self.running_by_analytic[job.analytic] += 1
+        self.running_by_aoi_type[job.aoi_type] += 1
+        task = asyncio.ensure_future(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job: _Job) -> None:
+        started_at = self.clock()
+        try:
+            await job.run()
+        finally:
+            elapsed = self.clock() - started_at
+            self.average_run_seconds = 0.8 * self.average_run_seconds + 0.2 * elapsed
+            self.running_count -= 1
+            self.running_by_analytic[job.analytic] -= 1
+            self.running_by_aoi_type[job.aoi_type] -= 1
+            self._dispatch()
+
+    def _record_metrics(self) -> None:
+        nr_agent.record_custom_metric("Custom/AnalysisQueue/Depth", self.queue_depth)
+        nr_agent.record_custom_metric(
+            "Custom/AnalysisQueue/Running", self.running_count
+        )
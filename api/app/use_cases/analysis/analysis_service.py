@@ -1,6 +1,8 @@
+import asyncio
 import logging
 import traceback
 import uuid
+from typing import Dict
 
 import newrelic.agent as nr_agent
 
@@ -19,6 +21,10 @@ def resource_thumbprint(analytics_in: AnalyticsIn, analyzer: Analyzer) -> uuid.U
 
 
 class AnalysisService:
+    # Analyses running in this process, by resource id, so identical requests
+    # arriving together wait on one computation instead of each starting one.
+    _in_flight: Dict[uuid.UUID, "asyncio.Task[None]"] = {}
+
     def __init__(
         self, analysis_repository: AnalysisRepository, analyzer: Analyzer, event: str
     ):
@@ -35,6 +41,22 @@ class AnalysisService:
     async def do(self) -> None:
         if self.analytics_resource_id is None:
             raise Exception("Set analytics_resource before calling this method")
+
+        resource_id = self.analytics_resource_id
+        running = self._in_flight.get(resource_id)
+        if running is not None:
+            await asyncio.shield(running)
+            return
+
+        task = asyncio.ensure_future(self._run())
+        self._in_flight[resource_id] = task
+        try:
+            await asyncio.shield(task)
+        finally:
+            if self._in_flight.get(resource_id) is task:
+                del self._in_flight[resource_id]
+
+    async def _run(self) -> None:
         try:
             if self.analytics_resource.metadata is None:
                 raise Exception("Set analytics_resource before calling this method")
@@ -42,6 +64,11 @@ class AnalysisService:
             if self.analytics_resource.status is not None:
                 return  # analysis is in progress, complete, or failed
 
+            if not await self.analysis_repository.acquire_lease(
+                self.analytics_resource_id
+            ):
+                return  # another API task is computing it
+
             metadata = self.analytics_resource.metadata.copy()
             aoi = metadata.pop("aoi")
 
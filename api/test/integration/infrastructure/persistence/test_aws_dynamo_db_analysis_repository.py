@@ -1,19 +1,27 @@
 import json
 import os
 import uuid
+from collections import Counter, OrderedDict
+from unittest.mock import AsyncMock, MagicMock
 
 import aioboto3
 import pytest
 import pytest_asyncio
 from moto.server import ThreadedMotoServer
 
+from app.domain.analyzers.analyzer import Analyzer
 from app.domain.models.analysis import Analysis
+from app.infrastructure.persistence import aws_dynamodb_s3_analysis_repository
 from app.infrastructure.persistence.aws_dynamodb_s3_analysis_repository import (
     GEOMETRY_S3_PREFIX,
     AwsDynamoDbS3AnalysisRepository,
 )
-from app.models.common.analysis import AnalysisStatus
-from app.models.common.areas_of_interest import CustomAreaOfInterest
+from app.models.common.analysis import AnalysisStatus, AnalyticsIn
+from app.models.common.areas_of_interest import (
+    AdminAreaOfInterest,
+    CustomAreaOfInterest,
+)
+from app.use_cases.analysis.analysis_service import AnalysisService
 
 TEST_CATEGORY = "integration_tests"
 DUMMY_UUID = uuid.UUID("c9787f41-b194-4589-ae53-f45ef290ce6f")
@@ -206,13 +214,14 @@ class TestLoadingAnalysis:
     @pytest.mark.asyncio
     async def test_store_initial_analysis_and_load_successfully(self, dynamodb_and_s3):
         dynamodb_table, s3_client, moto_server = dynamodb_and_s3
+        resource_id = uuid.uuid4()
 
         analysis_repository = AwsDynamoDbS3AnalysisRepository(
             TEST_CATEGORY, dynamodb_table, s3_client, moto_server
         )
 
         await analysis_repository.store_analysis(
-            DUMMY_UUID,
+            resource_id,
             Analysis(
                 result=None,
                 metadata={"val1": 12, "val2": "test", "val3": {"key": "value"}},
@@ -220,7 +229,7 @@ class TestLoadingAnalysis:
             ),
         )
 
-        analysis_result = await analysis_repository.load_analysis(DUMMY_UUID)
+        analysis_result = await analysis_repository.load_analysis(resource_id)
 
         assert analysis_result == Analysis(
             result=None,
@@ -233,13 +242,14 @@ class TestLoadingAnalysis:
         self, dynamodb_and_s3
     ):
         dynamodb_table, s3_client, moto_server = dynamodb_and_s3
+        resource_id = uuid.uuid4()
 
         analysis_repository = AwsDynamoDbS3AnalysisRepository(
             TEST_CATEGORY, dynamodb_table, s3_client, moto_server
         )
 
         await analysis_repository.store_analysis(
-            DUMMY_UUID,
+            resource_id,
             Analysis(
                 result=None,
                 metadata={"val1": 12.23, "val2": "test", "val3": {"key": "value"}},
@@ -247,7 +257,7 @@ class TestLoadingAnalysis:
             ),
         )
 
-        analysis_result = await analysis_repository.load_analysis(DUMMY_UUID)
+        analysis_result = await analysis_repository.load_analysis(resource_id)
 
         assert analysis_result == Analysis(
             result=None,
@@ -371,6 +381,181 @@ class TestLoadingAnalysis:
             status=AnalysisStatus.failed,
         )
 
+    # --- Result storage format tests ---
+
+    TABULAR_RESULT = {
+        "aoi_id": ["BRA.12.3", "BRA.12.3"],
+        "year": [2023, 2024],
+        "area_ha": [1.5, None],
+    }
+
+    async def _stored_item(self, dynamodb_table, resource_id):
+        response = await dynamodb_table.get_item(Key={"resource_id": str(resource_id)})
+        return response["Item"]
+
+    @pytest.mark.asyncio
+    async def test_tabular_result_is_stored_as_parquet(self, dynamodb_and_s3):
+        dynamodb_table, s3_client, moto_server = dynamodb_and_s3
+        repo = AwsDynamoDbS3AnalysisRepository(
+            TEST_CATEGORY, dynamodb_table, s3_client, moto_server
+        )
+        resource_id = uuid.uuid4()
+
+        await repo.store_analysis(
+            resource_id,
+            Analysis(
+                result=self.TABULAR_RESULT,
+                metadata={"val": 1},
+                status=AnalysisStatus.saved,
+            ),
+        )
+
+        item = await self._stored_item(dynamodb_table, resource_id)
+        assert item["result_format"] == "parquet"
+        assert item["s3_result_key"] == f"{TEST_CATEGORY}/{resource_id}.parquet"
+        loaded = await repo.load_analysis(resource_id)
+        assert loaded.result == self.TABULAR_RESULT
+
+    @pytest.mark.asyncio
+    async def test_non_tabular_result_is_stored_as_zstd_json(self, dynamodb_and_s3):
+        dynamodb_table, s3_client, moto_server = dynamodb_and_s3
+        repo = AwsDynamoDbS3AnalysisRepository(
+            TEST_CATEGORY, dynamodb_table, s3_client, moto_server
+        )
+        resource_id = uuid.uuid4()
+        result = {"aoi_id": ["a", "b"], "summary": {"area_ha": 1.5}}
+
+        await repo.store_analysis(
+            resource_id,
+            Analysis(result=result, metadata={"val": 1}, status=AnalysisStatus.saved),
+        )
+
+        item = await self._stored_item(dynamodb_table, resource_id)
+        assert item["result_format"] == "json.zst"
+        loaded = await repo.load_analysis(resource_id)
+        assert loaded.result == result
+
+    @pytest.mark.asyncio
+    async def test_loads_legacy_json_result_without_format_marker(
+        self, dynamodb_and_s3
+    ):
+        dynamodb_table, s3_client, moto_server = dynamodb_and_s3
+        repo = AwsDynamoDbS3AnalysisRepository(
+            TEST_CATEGORY, dynamodb_table, s3_client, moto_server
+        )
+        resource_id = uuid.uuid4()
+        s3_key = f"{TEST_CATEGORY}/{resource_id}.json"
+        await s3_client.put_object(
+            Bucket=self.TEST_ANALYSIS_RESULTS_BUCKET_NAME,
+            Key=s3_key,
+            Body=json.dumps(self.TABULAR_RESULT).encode("utf-8"),
+        )
+        await dynamodb_table.put_item(
+            Item={
+                "resource_id": str(resource_id),
+                "metadata": json.dumps({"val": 1}),
+                "status": "saved",
+                "s3_result_key": s3_key,
+            }
+        )
+
+        loaded = await repo.load_analysis(resource_id)
+
+        assert loaded.result == self.TABULAR_RESULT
+
+    @pytest.mark.asyncio
+    async def test_large_result_is_uploaded_in_parts(
+        self, dynamodb_and_s3, monkeypatch
+    ):
+        dynamodb_table, s3_client, moto_server = dynamodb_and_s3
+        monkeypatch.setattr(
+            aws_dynamodb_s3_analysis_repository, "RESULT_MULTIPART_THRESHOLD_BYTES", 0
+        )
+        monkeypatch.setattr(
+            aws_dynamodb_s3_analysis_repository,
+            "RESULT_MULTIPART_PART_BYTES",
+            5 * 1024**2,
+        )
+        repo = AwsDynamoDbS3AnalysisRepository(
+            TEST_CATEGORY, dynamodb_table, s3_client, moto_server
+        )
+        resource_id = uuid.uuid4()
+        # hex of random bytes only compresses by half, so this still spans two parts
+        result = [os.urandom(8 * 1024**2).hex()]
+
+        await repo.store_analysis(
+            resource_id,
+            Analysis(result=result, metadata={"val": 1}, status=AnalysisStatus.saved),
+        )
+
+        item = await self._stored_item(dynamodb_table, resource_id)
+        head = await s3_client.head_object(
+            Bucket=self.TEST_ANALYSIS_RESULTS_BUCKET_NAME,
+            Key=item["s3_result_key"],
+            PartNumber=1,
+        )
+        assert head["PartsCount"] > 1
+        loaded = await repo.load_analysis(resource_id)
+        assert loaded.result == result
+
+    @pytest.mark.asyncio
+    async def test_unsaved_stores_delete_nothing(self, dynamodb_and_s3, monkeypatch):
+        dynamodb_table, s3_client, moto_server = dynamodb_and_s3
+        repo = AwsDynamoDbS3AnalysisRepository(
+            TEST_CATEGORY, dynamodb_table, s3_client, moto_server
+        )
+        deleted = []
+        delete_object = s3_client.delete_object
+
+        async def recording_delete_object(**kwargs):
+            deleted.append(kwargs["Key"])
+            return await delete_object(**kwargs)
+
+        monkeypatch.setattr(s3_client, "delete_object", recording_delete_object)
+        resource_id = uuid.uuid4()
+
+        for status in (None, AnalysisStatus.pending, AnalysisStatus.failed):
+            await repo.store_analysis(
+                resource_id, Analysis(result=None, metadata={"val": 1}, status=status)
+            )
+        assert deleted == []
+
+        await repo.store_analysis(
+            resource_id,
+            Analysis(
+                result=self.TABULAR_RESULT,
+                metadata={"val": 1},
+                status=AnalysisStatus.saved,
+            ),
+        )
+        saved_key = (await self._stored_item(dynamodb_table, resource_id))[
+            "s3_result_key"
+        ]
+        await repo.store_analysis(
+            resource_id,
+            Analysis(result=None, metadata={"val": 1}, status=AnalysisStatus.failed),
+        )
+        assert deleted == [saved_key]
+
+    @pytest.mark.asyncio
+    async def test_stores_clear_the_lease(self, dynamodb_and_s3):
+        dynamodb_table, s3_client, moto_server = dynamodb_and_s3
+        repo = AwsDynamoDbS3AnalysisRepository(
+            TEST_CATEGORY, dynamodb_table, s3_client, moto_server
+        )
+        resource_id = uuid.uuid4()
+        assert await repo.acquire_lease(resource_id)
+
+        await repo.store_analysis(
+            resource_id,
+            Analysis(result=None, metadata={"val": 1}, status=AnalysisStatus.pending),
+        )
+
+        item = await self._stored_item(dynamodb_table, resource_id)
+        assert item["status"] == "pending"
+        assert "lease_owner" not in item
+        assert "lease_expires_at" not in item
+
     # --- Custom AOI geometry offloading tests ---
 
     def _make_custom_aoi_metadata(self):
@@ -473,6 +658,7 @@ class TestLoadingAnalysis:
         """Storing the same geometry twice should not fail
         (head_object finds existing object)."""
         dynamodb_table, s3_client, moto_server = dynamodb_and_s3
+        resource_id = uuid.uuid4()
         repo = AwsDynamoDbS3AnalysisRepository(
             TEST_CATEGORY, dynamodb_table, s3_client, moto_server
         )
@@ -480,7 +666,7 @@ class TestLoadingAnalysis:
         second_uuid = uuid.UUID("b2c3d4e5-f6a7-8901-bcde-f12345678901")
 
         await repo.store_analysis(
-            DUMMY_UUID,
+            resource_id,
             Analysis(result=None, metadata=metadata, status=None),
         )
         await repo.store_analysis(
@@ -488,7 +674,7 @@ class TestLoadingAnalysis:
             Analysis(result=None, metadata=metadata, status=None),
         )
 
-        loaded1 = await repo.load_analysis(DUMMY_UUID)
+        loaded1 = await repo.load_analysis(resource_id)
         loaded2 = await repo.load_analysis(second_uuid)
         assert (
             loaded1.metadata["aoi"]["feature_collection"] == SAMPLE_FEATURE_COLLECTION
@@ -497,6 +683,50 @@ class TestLoadingAnalysis:
             loaded2.metadata["aoi"]["feature_collection"] == SAMPLE_FEATURE_COLLECTION
         )
 
+    @pytest.mark.asyncio
+    async def test_geometry_is_hashed_and_checked_once(
+        self, dynamodb_and_s3, monkeypatch
+    ):
+        dynamodb_table, s3_client, moto_server = dynamodb_and_s3
+        monkeypatch.setattr(
+            aws_dynamodb_s3_analysis_repository,
+            "_stored_geometry_hashes",
+            OrderedDict(),
+        )
+        calls = Counter()
+        head_object = s3_client.head_object
+        compute_geometry_hash = CustomAreaOfInterest.compute_geometry_hash
+
+        async def counting_head_object(**kwargs):
+            calls["head_object"] += 1
+            return await head_object(**kwargs)
+
+        def counting_compute_geometry_hash(aoi):
+            calls["compute_geometry_hash"] += 1
+            return compute_geometry_hash(aoi)
+
+        monkeypatch.setattr(s3_client, "head_object", counting_head_object)
+        monkeypatch.setattr(
+            CustomAreaOfInterest,
+            "compute_geometry_hash",
+            counting_compute_geometry_hash,
+        )
+        repo = AwsDynamoDbS3AnalysisRepository(
+            TEST_CATEGORY, dynamodb_table, s3_client, moto_server
+        )
+        metadata = self._make_custom_aoi_metadata()
+
+        for status in (None, AnalysisStatus.pending, AnalysisStatus.saved):
+            await repo.store_analysis(
+                CUSTOM_AOI_UUID, Analysis(result=[1], metadata=metadata, status=status)
+            )
+
+        assert calls == {"head_object": 1, "compute_geometry_hash": 1}
+        loaded = await repo.load_analysis(CUSTOM_AOI_UUID)
+        assert loaded.metadata["aoi"]["feature_collection"] == (
+            SAMPLE_FEATURE_COLLECTION
+        )
+
     @pytest.mark.asyncio
     async def test_non_custom_aoi_metadata_unchanged(self, dynamodb_and_s3):
         """Admin AOI metadata passes through without modification."""
@@ -526,3 +756,123 @@ class TestLoadingAnalysis:
 
         loaded = await repo.load_analysis(DUMMY_UUID)
         assert loaded.metadata == admin_metadata
+
+    @pytest.mark.asyncio
+    async def test_only_one_task_acquires_lease(self, dynamodb_and_s3, monkeypatch):
+        dynamodb_table, s3_client, moto_server = dynamodb_and_s3
+        repo = AwsDynamoDbS3AnalysisRepository(
+            TEST_CATEGORY, dynamodb_table, s3_client, moto_server
+        )
+        resource_id = uuid.uuid4()
+        metadata = {"aoi": {"type": "admin", "ids": ["BRA.12.3"]}}
+
+        await repo.store_analysis(
+            resource_id, Analysis(result=None, metadata=metadata, status=None)
+        )
+        assert await repo.acquire_lease(resource_id)
+
+        # another API task
+        monkeypatch.setattr(
+            "app.infrastructure.persistence.aws_dynamodb_s3_analysis_repository"
+            "._LEASE_OWNER",
+            "other-task",
+        )
+        assert not await repo.acquire_lease(resource_id)
+
+        # its placeholder write doesn't clear the lease
+        await repo.store_analysis(
+            resource_id, Analysis(result=None, metadata=metadata, status=None)
+        )
+        assert not await repo.acquire_lease(resource_id)
+
+    @pytest.mark.asyncio
+    async def test_placeholder_does_not_reset_a_saved_analysis(self, dynamodb_and_s3):
+        dynamodb_table, s3_client, moto_server = dynamodb_and_s3
+        repo = AwsDynamoDbS3AnalysisRepository(
+            TEST_CATEGORY, dynamodb_table, s3_client, moto_server
+        )
+        resource_id = uuid.uuid4()
+        metadata = {"aoi": {"type": "admin", "ids": ["BRA.12.3"]}}
+        await repo.store_analysis(
+            resource_id,
+            Analysis(
+                result=self.TABULAR_RESULT,
+                metadata=metadata,
+                status=AnalysisStatus.saved,
+            ),
+        )
+
+        # a duplicate request that loaded the analysis before it was saved
+        await repo.store_analysis(
+            resource_id, Analysis(result=None, metadata=metadata, status=None)
+        )
+
+        loaded = await repo.load_analysis(resource_id)
+        assert loaded.status == AnalysisStatus.saved
+        assert loaded.result == self.TABULAR_RESULT
+        assert not await repo.acquire_lease(resource_id)
+
+    @pytest.mark.asyncio
+    async def test_racing_requests_in_two_processes_run_one_analysis(
+        self, dynamodb_and_s3
+    ):
+        dynamodb_table, s3_client, moto_server = dynamodb_and_s3
+        analytics_in = AnalyticsIn(aoi=AdminAreaOfInterest(type="admin", ids=["BRA"]))
+        analyzer = MagicMock(spec=Analyzer)
+        analyzer.thumbprint.return_value = uuid.uuid4()
+        services = [
+            AnalysisService(
+                AwsDynamoDbS3AnalysisRepository(
+                    TEST_CATEGORY, dynamodb_table, s3_client, moto_server
+                ),
+                analyzer,
+                "test_endpoint_name",
+            )
+            for _ in range(2)
+        ]
+        first, second = services
+        second._in_flight = {}  # another API process
+        for service in services:
+            await service.set_resource_from(analytics_in)
+
+        async def analyze(analysis):
+            analysis.result = {"area_ha": [1.0]}
+            if analyzer.analyze.await_count > 1:
+                return
+            # the second request's placeholder lands after the pending write,
+            # and it starts its own run while this one computes
+            await second.analysis_repository.store_analysis(
+                second.analytics_resource_id,
+                Analysis(
+                    result=None,
+                    metadata=second.analytics_resource.metadata,
+                    status=None,
+                ),
+            )
+            await second.do()
+
+        analyzer.analyze = AsyncMock(side_effect=analyze)
+
+        await first.do()
+
+        assert analyzer.analyze.await_count == 1
+        loaded = await first.analysis_repository.load_analysis(
+            first.analytics_resource_id
+        )
+        assert loaded.status == AnalysisStatus.saved
+        assert loaded.result == {"area_ha": [1.0]}
+
+    @pytest.mark.asyncio
+    async def test_lease_is_refused_once_analysis_has_started(self, dynamodb_and_s3):
+        dynamodb_table, s3_client, moto_server = dynamodb_and_s3
+        repo = AwsDynamoDbS3AnalysisRepository(
+            TEST_CATEGORY, dynamodb_table, s3_client, moto_server
+        )
+        resource_id = uuid.uuid4()
+
+        await repo.store_analysis(
+            resource_id,
+            Analysis(result=None, metadata={"val": 1}, status=AnalysisStatus.pending),
+        )
+
+        assert not await repo.acquire_lease(resource_id)
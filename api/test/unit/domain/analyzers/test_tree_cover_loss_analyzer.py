@@ -12,6 +12,7 @@ from shapely.geometry import box, mapping
 from app.domain.analyzers.tree_cover_loss_analyzer import (
     INPUT_URIS,
     TreeCoverLossAnalyzer,
+    _build_query,
 )
 from app.domain.compute_engines.dask_client_router import DaskClientRouter
 from app.domain.models.analysis import Analysis
@@ -437,3 +438,29 @@ async def test_flox_handler_tree_cover_loss_from_fires():
         atol=1e-8,  # Absolute tolerance
         rtol=1e-4,  # Relative tolerance
     )
+
+
+@pytest.mark.parametrize("intersections", [[], ["driver"], ["fire"]])
+@pytest.mark.parametrize("forest_filter", [None, "primary_forest"])
+def test_approximate_queries_only_read_overviews(intersections, forest_filter):
+    # anything else silently falls back to full resolution, so the request
+    # model must reject it
+    analytics_in = TreeCoverLossAnalyticsIn(
+        aoi=ProtectedAreaOfInterest(type="protected_area", ids=["9823"]),
+        start_year="2021",
+        end_year="2024",
+        canopy_cover=30,
+        forest_filter=forest_filter,
+        intersections=intersections,
+        approximate=True,
+    )
+    query = _build_query(analytics_in)
+
+    assert (
+        set(
+            query.aggregate.datasets
+            + query.group_bys
+            + [filt.dataset for filt in query.filters]
+        )
+        <= ZarrDatasetRepository.OVERVIEW_DATASETS
+    )
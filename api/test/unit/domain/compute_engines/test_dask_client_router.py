@@ -0,0 +1,95 @@
+import pytest
+from dask.distributed import Client, LocalCluster
+from shapely.geometry import box
+
+from app.domain.compute_engines.dask_client_router import (
+    ClusterLoad,
+    DaskClientRouter,
+    DatasetGrid,
+    ReadEstimate,
+    estimate_read,
+)
+
+# 0.25 degree pixels in 2x2 pixel chunks, i.e. a chunk every half degree
+GRID = DatasetGrid(
+    resolution=0.25,
+    origin_x=-180,
+    origin_y=90,
+    chunk_width=2,
+    chunk_height=2,
+    itemsize=1,
+)
+IDLE = ClusterLoad(tasks=0, threads=4, memory=0, memory_limit=100)
+BUSY = ClusterLoad(tasks=40, threads=4, memory=0, memory_limit=100)
+
+
+class TestEstimateRead:
+    def test_counts_chunks_intersecting_each_bbox(self):
+        # inside a single chunk
+        assert estimate_read([box(0.1, 0.1, 0.4, 0.4)], [GRID]) == ReadEstimate(
+            chunks=1, bytes=4
+        )
+        # crosses one chunk boundary in x and one in y
+        assert estimate_read([box(0.4, 0.4, 0.6, 0.6)], [GRID]).chunks == 4
+
+    def test_sums_over_geometries_and_grids(self):
+        fine = DatasetGrid(0.125, -180, 90, 2, 2, 4)
+        estimate = estimate_read(
+            [box(0.1, 0.1, 0.4, 0.4), box(10.1, 10.1, 10.2, 10.2)], [GRID, fine]
+        )
+        # fine chunks are a quarter degree, so the first box spans 2x2 of them
+        assert estimate == ReadEstimate(chunks=2 + 4 + 1, bytes=2 * 4 + 5 * 16)
+
+
+class TestDaskClientRouter:
+    def test_uses_area_threshold_without_an_estimate(self):
+        router = DaskClientRouter("local", "remote", threshold_ha=100)
+        assert router.get_client(100) == "local"
+        assert router.get_client(101) == "remote"
+
+    def test_estimate_overrides_area(self):
+        router = DaskClientRouter(
+            "local", "remote", threshold_ha=100, max_chunks=10, max_bytes=1000
+        )
+        assert router.get_client(10**9, ReadEstimate(chunks=10, bytes=1000)) == "local"
+        assert router.get_client(1, ReadEstimate(chunks=11, bytes=1000)) == "remote"
+        assert router.get_client(1, ReadEstimate(chunks=10, bytes=1001)) == "remote"
+
+    def test_small_query_leaves_a_busy_local_cluster(self):
+        router = DaskClientRouter("local", "remote", threshold_ha=100)
+        assert router.get_client(1, local_load=BUSY, remote_load=IDLE) == "remote"
+        assert router.get_client(1, local_load=BUSY, remote_load=BUSY) == "local"
+        assert router.get_client(1, local_load=IDLE, remote_load=IDLE) == "local"
+
+    def test_memory_pressure_counts_as_busy(self):
+        router = DaskClientRouter("local", "remote", threshold_ha=100)
+        full = ClusterLoad(tasks=0, threads=4, memory=90, memory_limit=100)
+        assert router.get_client(1, local_load=full, remote_load=IDLE) == "remote"
+
+    def test_without_a_remote_client_everything_runs_locally(self):
+        router = DaskClientRouter("local", None, threshold_ha=100)
+        assert router.get_client(10**9, local_load=BUSY) == "local"
+
+    @pytest.mark.asyncio
+    async def test_route_samples_scheduler_load(self):
+        async with LocalCluster(
+            n_workers=1,
+            threads_per_worker=2,
+            processes=False,
+            asynchronous=True,
+            dashboard_address=None,
+        ) as cluster:
+            async with Client(cluster, asynchronous=True) as client:
+                load = await DaskClientRouter.sample_load(client)
+                router = DaskClientRouter(client, "remote", threshold_ha=100)
+                assert await router.route(1) is client
+
+        assert load.threads == 2
+        assert load.tasks == 0
+        assert load.memory_limit > 0
+
+    @pytest.mark.asyncio
+    async def test_route_without_load_reporting_falls_back_to_size(self):
+        router = DaskClientRouter(object(), object(), threshold_ha=100)
+        assert await DaskClientRouter.sample_load(router.local_client) is None
+        assert await router.route(101) is router.remote_client
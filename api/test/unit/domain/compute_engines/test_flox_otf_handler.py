@@ -0,0 +1,347 @@
+import json
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+import xarray as xr
+from shapely.geometry import Polygon, box, mapping
+
+from app.domain.compute_engines.handlers.otf_implementations import flox_otf_handler
+from app.domain.compute_engines.handlers.otf_implementations.flox_otf_handler import (
+    FloxOTFHandler,
+)
+from app.domain.models.dataset import (
+    Dataset,
+    DatasetAggregate,
+    DatasetFilter,
+    DatasetQuery,
+)
+from app.domain.repositories.chunk_summary_repository import (
+    GRID_METADATA_KEY,
+    ChunkSummary,
+    ChunkSummaryRepository,
+)
+from app.domain.repositories.zarr_dataset_repository import ZarrDatasetRepository
+from app.models.common.areas_of_interest import (
+    CustomAreaOfInterest,
+    ProtectedAreaOfInterest,
+)
+
+
+class CountingDatasetRepository(ZarrDatasetRepository):
+    def __init__(self):
+        super().__init__()
+        self.loads = Counter()
+
+    def load(self, dataset, geometry=None):
+        self.loads[dataset] += 1
+        return super().load(dataset, geometry)
+
+    def open_source(self, dataset):
+        coords = {"y": np.arange(9.5, 0, -1), "x": np.arange(0.5, 10)}
+        if dataset == Dataset.area_hectares:
+            data = np.full((10, 10), 2.0)
+        elif dataset == Dataset.tree_cover_loss:
+            # one row per loss year 2001-2010
+            data = np.repeat(np.arange(1, 11)[:, None], 10, axis=1)
+        else:
+            raise ValueError(f"Not a valid dataset for this test: {dataset}")
+        return xr.DataArray(data, coords=coords, dims=("y", "x"))
+
+
+def test_handle_loads_each_dataset_once_and_fuses_range_filters():
+    repository = CountingDatasetRepository()
+    query = DatasetQuery(
+        aggregate=DatasetAggregate(datasets=[Dataset.area_hectares], func="sum"),
+        group_bys=[Dataset.tree_cover_loss],
+        filters=[
+            DatasetFilter(dataset=Dataset.tree_cover_loss, op=">=", value=2003),
+            DatasetFilter(dataset=Dataset.tree_cover_loss, op="<=", value=2005),
+        ],
+    )
+
+    results = FloxOTFHandler._handle(
+        ("1", box(0, 0, 10, 10)),
+        query=query,
+        dataset_repository=repository,
+        expected_groups_per_dataset=FloxOTFHandler.EXPECTED_GROUPS,
+    )
+
+    assert repository.loads == {Dataset.area_hectares: 1, Dataset.tree_cover_loss: 1}
+    assert results["tree_cover_loss_year"].tolist() == [3, 4, 5]
+    assert results["area_ha"].tolist() == [20.0, 20.0, 20.0]
+    # the class-level expected groups are not narrowed by the query
+    assert len(FloxOTFHandler.EXPECTED_GROUPS[Dataset.tree_cover_loss]) == 31
+
+
+class InlineDaskClient:
+    """Runs mapped tasks inline and counts them."""
+
+    def __init__(self):
+        self.tasks = 0
+
+    def map(self, func, items):
+        self.tasks += len(items)
+        return [func(item) for item in items]
+
+    async def gather(self, futures):
+        return futures
+
+
+class FakeAoiGeometryRepository:
+    GEOMETRIES = {
+        "1": box(0, 0, 5, 5),
+        "2": box(5, 0, 10, 5),
+        "3": box(0, 5, 10, 10),
+        "4": box(2, 2, 8, 8),
+    }
+
+    async def load(self, aoi_type, aoi_ids):
+        return [self.GEOMETRIES[i] for i in aoi_ids], [1000.0] * len(aoi_ids)
+
+
+async def _handle_with_label_raster(enabled, aoi_ids, monkeypatch):
+    monkeypatch.setattr(flox_otf_handler, "OTF_LABEL_RASTER_ENABLED", enabled)
+    dask_client = InlineDaskClient()
+    handler = FloxOTFHandler(
+        dataset_repository=CountingDatasetRepository(),
+        aoi_geometry_repository=FakeAoiGeometryRepository(),
+        dask_client=dask_client,
+    )
+    query = DatasetQuery(
+        aggregate=DatasetAggregate(datasets=[Dataset.area_hectares], func="sum"),
+        group_bys=[Dataset.tree_cover_loss],
+        filters=[DatasetFilter(dataset=Dataset.tree_cover_loss, op=">=", value=2003)],
+    )
+    results = await handler.handle(ProtectedAreaOfInterest(ids=aoi_ids), query)
+    return dask_client.tasks, pd.DataFrame(results)
+
+
+@pytest.mark.asyncio
+async def test_label_raster_matches_per_aoi_results(monkeypatch):
+    tasks, labelled = await _handle_with_label_raster(
+        True, ["1", "2", "3"], monkeypatch
+    )
+    _, per_aoi = await _handle_with_label_raster(False, ["1", "2", "3"], monkeypatch)
+
+    assert tasks == 1
+    pd.testing.assert_frame_equal(labelled, per_aoi, check_dtype=False)
+
+
+@pytest.mark.asyncio
+async def test_label_raster_falls_back_for_overlapping_aois(monkeypatch):
+    tasks, _ = await _handle_with_label_raster(True, ["1", "4"], monkeypatch)
+
+    assert tasks == 2
+
+
+def test_label_raster_skips_scattered_aois(monkeypatch):
+    monkeypatch.setattr(flox_otf_handler, "OTF_LABEL_RASTER_ENABLED", True)
+
+    assert FloxOTFHandler._can_label([("1", box(0, 0, 1, 1)), ("2", box(1, 0, 2, 1))])
+    assert not FloxOTFHandler._can_label(
+        [("1", box(0, 0, 1, 1)), ("2", box(50, 50, 51, 51))]
+    )
+
+
+class ChunkedDatasetRepository(CountingDatasetRepository):
+    def open_source(self, dataset):
+        return super().open_source(dataset).chunk(2)
+
+
+async def _handle_with_splitting(min_chunks, monkeypatch):
+    monkeypatch.setattr(flox_otf_handler, "OTF_SPLIT_MIN_CHUNKS", min_chunks)
+    monkeypatch.setattr(flox_otf_handler, "OTF_SPLIT_TILE_CHUNKS", 1)
+    dask_client = InlineDaskClient()
+    handler = FloxOTFHandler(
+        dataset_repository=ChunkedDatasetRepository(),
+        aoi_geometry_repository=FakeAoiGeometryRepository(),
+        dask_client=dask_client,
+    )
+    query = DatasetQuery(
+        aggregate=DatasetAggregate(datasets=[Dataset.area_hectares], func="sum"),
+        group_bys=[Dataset.tree_cover_loss],
+        filters=[],
+    )
+    aoi = CustomAreaOfInterest(
+        feature_collection={
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "properties": {"id": "triangle"},
+                    "geometry": mapping(Polygon([(0, 0), (9.2, 0), (0, 9.2)])),
+                }
+            ],
+        }
+    )
+    results = await handler.handle(aoi, query)
+    return dask_client.tasks, pd.DataFrame(results)
+
+
+@pytest.mark.asyncio
+async def test_split_aoi_matches_unsplit_results(monkeypatch):
+    tasks, split = await _handle_with_splitting(1, monkeypatch)
+    _, whole = await _handle_with_splitting(0, monkeypatch)
+
+    # the triangle's bbox covers 5x5 chunks, 15 of which it reaches into
+    assert tasks == 15
+    pd.testing.assert_frame_equal(split, whole, check_dtype=False)
+    assert split["area_ha"].sum() == 2.0 * 45
+
+
+class RecordingChunkSummary(ChunkSummary):
+    def rows(self, chunks):
+        self.requested = set(chunks)
+        return super().rows(chunks)
+
+
+def _write_chunk_summary(path):
+    """Per-chunk sums of the ChunkedDatasetRepository layers."""
+    repository = ChunkedDatasetRepository()
+    years = repository.open_source(Dataset.tree_cover_loss).values
+    area = repository.open_source(Dataset.area_hectares).values
+    pixels = pd.DataFrame(
+        {
+            "chunk_row": np.repeat(np.arange(10) // 2, 10),
+            "chunk_col": np.tile(np.arange(10) // 2, 10),
+            "tree_cover_loss_year": years.ravel(),
+            "area_ha": area.ravel(),
+        }
+    )
+    summary = (
+        pixels.groupby(["chunk_row", "chunk_col", "tree_cover_loss_year"])
+        .sum()
+        .reset_index()
+    )
+    grid = {
+        "resolution": 1.0,
+        "origin_x": 0.0,
+        "origin_y": 10.0,
+        "chunk_width": 2,
+        "chunk_height": 2,
+        "itemsize": 8,
+    }
+    table = pa.Table.from_pandas(summary, preserve_index=False)
+    table = table.replace_schema_metadata({GRID_METADATA_KEY: json.dumps(grid)})
+    pq.write_table(table, path)
+
+
+class BoundsRecordingDatasetRepository(ChunkedDatasetRepository):
+    def __init__(self):
+        super().__init__()
+        self.geometries = []
+
+    def load(self, dataset, geometry=None):
+        self.geometries.append(geometry)
+        return super().load(dataset, geometry)
+
+
+@pytest.mark.asyncio
+async def test_chunk_summary_answers_interior_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(flox_otf_handler, "OTF_SPLIT_MIN_CHUNKS", 0)
+    uri = str(tmp_path / "summary.parquet")
+    _write_chunk_summary(uri)
+    summary = RecordingChunkSummary(
+        uri, group_bys=[Dataset.tree_cover_loss], aggregates=[Dataset.area_hectares]
+    )
+    query = DatasetQuery(
+        aggregate=DatasetAggregate(datasets=[Dataset.area_hectares], func="sum"),
+        group_bys=[Dataset.tree_cover_loss],
+        filters=[DatasetFilter(dataset=Dataset.tree_cover_loss, op=">=", value=2003)],
+    )
+    aoi = CustomAreaOfInterest(
+        feature_collection={
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "properties": {"id": "triangle"},
+                    "geometry": mapping(Polygon([(0, 0), (9.2, 0), (0, 9.2)])),
+                }
+            ],
+        }
+    )
+
+    results, repositories = {}, {}
+    for summaries in (ChunkSummaryRepository([summary]), None):
+        repository = BoundsRecordingDatasetRepository()
+        repositories[summaries is None] = repository
+        handler = FloxOTFHandler(
+            dataset_repository=repository,
+            aoi_geometry_repository=FakeAoiGeometryRepository(),
+            dask_client=InlineDaskClient(),
+            chunk_summaries=summaries,
+        )
+        results[summaries is None] = pd.DataFrame(await handler.handle(aoi, query))
+
+    # chunks are indexed from the top left; these six lie inside the triangle
+    assert summary.requested == {(4, 0), (4, 1), (4, 2), (3, 0), (3, 1), (2, 0)}
+    pd.testing.assert_frame_equal(results[False], results[True], check_dtype=False)
+
+    # loads slice by bounds, so none may reach into an interior chunk
+    interior_boxes = [summary.chunk_box(chunk) for chunk in summary.requested]
+    loaded_boxes = [
+        box(*geometry.bounds) for geometry in repositories[False].geometries
+    ]
+    assert loaded_boxes
+    assert all(
+        loaded.intersection(interior).area == 0
+        for loaded in loaded_boxes
+        for interior in interior_boxes
+    )
+
+
+class OverviewDatasetRepository(CountingDatasetRepository):
+    """Serves 2x2 block sums (area) and minimums (loss year) as overviews."""
+
+    def overview(self, datasets, factor=2):
+        return super().overview(datasets, factor=factor)
+
+    def open_source(self, dataset):
+        self.loads[self.group] += 1
+        data = super().open_source(dataset)
+        if self.group == "otf":
+            return data
+        coarse = data.coarsen(y=2, x=2)
+        return coarse.sum() if dataset == Dataset.area_hectares else coarse.min()
+
+
+@pytest.mark.asyncio
+async def test_approximate_query_reads_overviews():
+    repository = OverviewDatasetRepository()
+    handler = FloxOTFHandler(
+        dataset_repository=repository,
+        aoi_geometry_repository=FakeAoiGeometryRepository(),
+        dask_client=InlineDaskClient(),
+    )
+    query = DatasetQuery(
+        aggregate=DatasetAggregate(datasets=[Dataset.area_hectares], func="sum"),
+        group_bys=[Dataset.tree_cover_loss],
+        filters=[],
+        approximate=True,
+    )
+
+    aoi = CustomAreaOfInterest(
+        feature_collection={
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "properties": {"id": "square"},
+                    "geometry": mapping(box(0, 0, 10, 10)),
+                }
+            ],
+        }
+    )
+
+    results = pd.DataFrame(await handler.handle(aoi, query))
+
+    assert "otf" not in repository.loads
+    assert repository.loads["overview_2"] > 0
+    # each coarse row takes the earlier of its two loss years, with both rows' area
+    assert results["tree_cover_loss_year"].tolist() == [2001, 2003, 2005, 2007, 2009]
+    assert results["area_ha"].tolist() == [40.0] * 5
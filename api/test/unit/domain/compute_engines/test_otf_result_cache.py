@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+from shapely.geometry import Polygon, box
+
+from app.domain.compute_engines.handlers.otf_implementations.flox_otf_handler import (
+    FloxOTFHandler,
+)
+from app.domain.compute_engines.handlers.otf_implementations.otf_result_cache import (
+    OTFResultCache,
+    geometry_hash,
+    result_cache_key,
+)
+from app.domain.models.dataset import (
+    Dataset,
+    DatasetAggregate,
+    DatasetFilter,
+    DatasetQuery,
+)
+from app.domain.repositories.zarr_dataset_repository import ZarrDatasetRepository
+from app.models.common.areas_of_interest import ProtectedAreaOfInterest
+
+
+def _query(*filters):
+    return DatasetQuery(
+        aggregate=DatasetAggregate(datasets=[Dataset.area_hectares], func="sum"),
+        group_bys=[Dataset.tree_cover_loss],
+        filters=list(filters),
+    )
+
+
+def _df(n_rows):
+    return pd.DataFrame({"aoi_id": ["1"] * n_rows, "area_ha": np.arange(n_rows)})
+
+
+class TestResultCacheKey:
+    def test_geometry_hash_ignores_vertex_order(self):
+        ring = [(0, 0), (1, 0), (1, 1), (0, 1)]
+        assert geometry_hash(Polygon(ring)) == geometry_hash(Polygon(ring[::-1]))
+
+    def test_filter_order_does_not_change_key(self):
+        gte = DatasetFilter(dataset=Dataset.tree_cover_loss, op=">=", value=2010)
+        lte = DatasetFilter(dataset=Dataset.tree_cover_loss, op="<=", value=2020)
+        geom = box(0, 0, 1, 1)
+
+        assert result_cache_key(geom, _query(gte, lte), ["s3://a"]) == (
+            result_cache_key(geom, _query(lte, gte), ["s3://a"])
+        )
+
+    def test_dataset_version_changes_key(self):
+        geom = box(0, 0, 1, 1)
+        assert result_cache_key(geom, _query(), ["s3://tcl/v1.12"]) != (
+            result_cache_key(geom, _query(), ["s3://tcl/v1.13"])
+        )
+
+
+class TestOTFResultCache:
+    def test_miss_then_hit(self):
+        cache = OTFResultCache(max_bytes=1024 * 1024, directory=None)
+
+        assert cache.get("k") is None
+        cache.set("k", _df(3))
+
+        pd.testing.assert_frame_equal(cache.get("k"), _df(3))
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_evicts_least_recently_used_when_over_budget(self):
+        entry_size = int(_df(10).memory_usage(deep=True).sum())
+        cache = OTFResultCache(max_bytes=entry_size * 2, directory=None)
+
+        cache.set("a", _df(10))
+        cache.set("b", _df(10))
+        cache.get("a")
+        cache.set("c", _df(10))
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+
+    def test_returned_frames_are_copies(self):
+        cache = OTFResultCache(max_bytes=1024 * 1024, directory=None)
+        cache.set("k", _df(3))
+
+        cache.get("k")["area_ha"] = -1
+
+        assert (cache.get("k")["area_ha"] >= 0).all()
+
+    def test_disk_tier_survives_a_new_cache_instance(self, tmp_path):
+        OTFResultCache(max_bytes=1024 * 1024, directory=str(tmp_path)).set("k", _df(3))
+
+        fresh = OTFResultCache(max_bytes=1024 * 1024, directory=str(tmp_path))
+
+        pd.testing.assert_frame_equal(fresh.get("k"), _df(3))
+
+
+class InlineDaskClient:
+    """Runs mapped tasks inline and counts them."""
+
+    def __init__(self):
+        self.tasks = 0
+
+    def map(self, func, items):
+        self.tasks += len(items)
+        return [func(item) for item in items]
+
+    async def gather(self, futures):
+        return futures
+
+
+class FakeAoiGeometryRepository:
+    GEOMETRIES = {
+        "1": box(0, 0, 10, 10),
+        "2": box(0, 5, 10, 10),
+        "3": box(0, 0, 10, 10),
+    }
+
+    async def load(self, aoi_type, aoi_ids):
+        return [self.GEOMETRIES[i] for i in aoi_ids], [1000.0] * len(aoi_ids)
+
+
+class FakeDatasetRepository(ZarrDatasetRepository):
+    def open_source(self, dataset):
+        coords = {"y": np.arange(9.5, 0, -1), "x": np.arange(0.5, 10)}
+        if dataset == Dataset.area_hectares:
+            data = np.full((10, 10), 2.0)
+        elif dataset == Dataset.tree_cover_loss:
+            data = np.vstack([np.full((5, 10), 21), np.full((5, 10), 5)])
+        else:
+            raise ValueError(f"Not a valid dataset for this test: {dataset}")
+        return xr.DataArray(data, coords=coords, dims=("y", "x"))
+
+
+@pytest.mark.asyncio
+async def test_flox_handler_serves_repeated_aois_from_cache():
+    dask_client = InlineDaskClient()
+    handler = FloxOTFHandler(
+        dataset_repository=FakeDatasetRepository(),
+        aoi_geometry_repository=FakeAoiGeometryRepository(),
+        dask_client=dask_client,
+        result_cache=OTFResultCache(max_bytes=1024 * 1024, directory=None),
+    )
+    query = _query(DatasetFilter(dataset=Dataset.tree_cover_loss, op=">=", value=2010))
+
+    first = await handler.handle(ProtectedAreaOfInterest(ids=["1"]), query)
+    second = await handler.handle(ProtectedAreaOfInterest(ids=["1", "2"]), query)
+    # "3" has the same geometry as "1", so it is served from the cache too
+    third = await handler.handle(ProtectedAreaOfInterest(ids=["3"]), query)
+
+    assert dask_client.tasks == 2
+    assert first["area_ha"] == [100.0]
+    assert second["aoi_id"] == ["1", "2"]
+    assert second["area_ha"] == [100.0, 100.0]
+    assert third["aoi_id"] == ["3"]
@@ -0,0 +1,130 @@
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from shapely.geometry import box, shape
+
+from app.analysis.common.analysis import get_geojsons_from_data_api
+from app.domain.repositories.aoi_geometry_catalog import AoiGeometryCatalog
+from app.domain.repositories.data_api_aoi_geometry_repository import (
+    AoiGeometryCache,
+    DataApiAoiGeometryRepository,
+)
+
+PROTECTED_AREAS = {
+    "10": (box(0, 0, 1, 1), 100.0),
+    "20": (box(1, 0, 2, 1), 200.0),
+    "30": (box(2, 0, 3, 1), 300.0),
+    "40": (box(3, 0, 4, 1), 400.0),
+}
+
+
+@pytest.fixture
+def fake_catalog(tmp_path):
+    """A catalog with one protected_area layer split over several row groups."""
+    ids = sorted(PROTECTED_AREAS)
+    table = pa.table(
+        {
+            "aoi_id": ids,
+            "geometry": [PROTECTED_AREAS[i][0].wkb for i in ids],
+            "gfw_area__ha": [PROTECTED_AREAS[i][1] for i in ids],
+        }
+    )
+    (tmp_path / "protected_area").mkdir()
+    pq.write_table(table, tmp_path / "protected_area" / "v2.parquet", row_group_size=2)
+    (tmp_path / "manifest.json").write_text(
+        json.dumps(
+            {"protected_area": {"version": "v2", "path": "protected_area/v2.parquet"}}
+        )
+    )
+    return AoiGeometryCatalog(str(tmp_path))
+
+
+async def _no_network(*args, **kwargs):
+    raise AssertionError("Data API should not be called")
+
+
+class OfflineRepository(DataApiAoiGeometryRepository):
+    _send_request = staticmethod(_no_network)
+
+
+def test_lookup_reads_requested_ids(fake_catalog):
+    rows = fake_catalog.lookup("protected_area", ["40", "10"])
+
+    assert rows == {
+        "40": [(box(3, 0, 4, 1), 400.0)],
+        "10": [(box(0, 0, 1, 1), 100.0)],
+    }
+
+
+def test_lookup_skips_unknown_ids_and_types(fake_catalog):
+    assert fake_catalog.lookup("protected_area", ["99"]) == {}
+    assert fake_catalog.lookup("indigenous_land", ["10"]) == {}
+    assert fake_catalog.version("protected_area") == "v2"
+    assert fake_catalog.version("indigenous_land") is None
+
+
+def test_missing_manifest_disables_catalog(tmp_path):
+    assert AoiGeometryCatalog(str(tmp_path)).lookup("protected_area", ["10"]) == {}
+
+
+def test_manifest_changes_are_picked_up(fake_catalog, tmp_path):
+    assert fake_catalog.lookup("protected_area", ["10"])["10"][0][1] == 100.0
+
+    table = pa.table(
+        {"aoi_id": ["10"], "geometry": [box(0, 0, 1, 1).wkb], "gfw_area__ha": [150.0]}
+    )
+    pq.write_table(table, tmp_path / "protected_area" / "v3.parquet")
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(
+        json.dumps(
+            {"protected_area": {"version": "v3", "path": "protected_area/v3.parquet"}}
+        )
+    )
+    mtime = manifest.stat().st_mtime_ns + 1_000_000_000
+    os.utime(manifest, ns=(mtime, mtime))
+
+    assert fake_catalog.version("protected_area") == "v3"
+    assert fake_catalog.lookup("protected_area", ["10", "20"]) == {
+        "10": [(box(0, 0, 1, 1), 150.0)]
+    }
+
+
+@pytest.mark.asyncio
+async def test_repository_reads_catalog_without_network(fake_catalog):
+    repository = OfflineRepository(cache=AoiGeometryCache(), catalog=fake_catalog)
+
+    geometries, areas = await repository.load("protected_area", ["30", "20"])
+
+    assert geometries == [box(2, 0, 3, 1), box(1, 0, 2, 1)]
+    assert areas == [300.0, 200.0]
+    assert ("protected_area", "v2", "30") in repository.cache.entries
+
+
+@pytest.mark.asyncio
+async def test_geojsons_read_catalog_without_network(fake_catalog):
+    geojsons = await get_geojsons_from_data_api(
+        {"type": "protected_area", "ids": ["30", "10"]},
+        send_request=_no_network,
+        catalog=fake_catalog,
+    )
+
+    assert [shape(g) for g in geojsons] == [box(0, 0, 1, 1), box(2, 0, 3, 1)]
+
+
+@pytest.mark.asyncio
+async def test_geojsons_fall_back_to_data_api_for_unknown_ids(fake_catalog):
+    async def send_request(url, params):
+        return {
+            "data": [{"gfw_geojson": json.dumps(box(5, 5, 6, 6).__geo_interface__)}]
+        }
+
+    geojsons = await get_geojsons_from_data_api(
+        {"type": "protected_area", "ids": ["10", "99"]},
+        send_request=send_request,
+        catalog=fake_catalog,
+    )
+
+    assert [shape(g) for g in geojsons] == [box(5, 5, 6, 6)]
@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+from shapely.geometry import box
+
+from app.domain.repositories.data_api_aoi_geometry_repository import (
+    AoiGeometryCache,
+    DataApiAoiGeometryRepository,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeDataApiRepository(DataApiAoiGeometryRepository):
+    """Answers queries from a fixed table and records every upstream call."""
+
+    ROWS = {
+        "1": (box(0, 0, 1, 1), 10.0),
+        "2": (box(1, 0, 2, 1), 20.0),
+        "3": (box(2, 0, 3, 1), 30.0),
+    }
+
+    def __init__(self, cache):
+        super().__init__(cache=cache)
+        self.calls = []
+
+    async def _send_request(self, url, params):
+        requested = [
+            i.strip(" '") for i in params["sql"].split("(")[1].split(")")[0].split(",")
+        ]
+        self.calls.append(requested)
+        await asyncio.sleep(0)  # let concurrent callers pile up
+        return {
+            "data": [
+                {
+                    "aoi_id": i,
+                    "geom": self.ROWS[i][0].wkb_hex,
+                    "gfw_area__ha": self.ROWS[i][1],
+                }
+                for i in sorted(requested)
+                if i in self.ROWS
+            ]
+        }
+
+
+@pytest.mark.asyncio
+async def test_cached_ids_are_not_fetched_again():
+    repository = FakeDataApiRepository(AoiGeometryCache())
+
+    await repository.load("protected_area", ["1", "2"])
+    geometries, areas = await repository.load("protected_area", ["2", "3"])
+
+    assert repository.calls == [["1", "2"], ["3"]]
+    assert geometries == [box(1, 0, 2, 1), box(2, 0, 3, 1)]
+    assert areas == [20.0, 30.0]
+
+
+@pytest.mark.asyncio
+async def test_results_follow_requested_order():
+    repository = FakeDataApiRepository(AoiGeometryCache())
+
+    _, areas = await repository.load("protected_area", ["3", "1"])
+
+    assert areas == [30.0, 10.0]
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    repository = FakeDataApiRepository(AoiGeometryCache(ttl_seconds=60, clock=clock))
+
+    await repository.load("protected_area", ["1"])
+    clock.now = 61
+    await repository.load("protected_area", ["1"])
+
+    assert repository.calls == [["1"], ["1"]]
+
+
+@pytest.mark.asyncio
+async def test_ids_without_rows_expire_sooner():
+    clock = FakeClock()
+    repository = FakeDataApiRepository(
+        AoiGeometryCache(ttl_seconds=3600, negative_ttl_seconds=60, clock=clock)
+    )
+
+    await repository.load("protected_area", ["1", "9"])
+    await repository.load("protected_area", ["1", "9"])
+    clock.now = 61
+    await repository.load("protected_area", ["1", "9"])
+
+    assert repository.calls == [["1", "9"], ["9"]]
+
+
+def test_full_cache_evicts_least_recently_used():
+    cache = AoiGeometryCache(max_size=2)
+    rows = [(box(0, 0, 1, 1), 10.0)]
+
+    cache.set(("protected_area", "latest", "1"), rows)
+    cache.set(("protected_area", "latest", "2"), rows)
+    cache.get(("protected_area", "latest", "1"))
+    cache.set(("protected_area", "latest", "3"), rows)
+
+    assert cache.get(("protected_area", "latest", "1")) == rows
+    assert cache.get(("protected_area", "latest", "2")) is None
+    assert cache.get(("protected_area", "latest", "3")) == rows
+
+
+@pytest.mark.asyncio
+async def test_aoi_types_are_cached_separately():
+    repository = FakeDataApiRepository(AoiGeometryCache())
+
+    await repository.load("protected_area", ["1"])
+    await repository.load("key_biodiversity_area", ["1"])
+
+    assert len(repository.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_for_the_same_ids_share_one_call():
+    repository = FakeDataApiRepository(AoiGeometryCache())
+
+    results = await asyncio.gather(
+        repository.load("protected_area", ["1", "2"]),
+        repository.load("protected_area", ["1", "2"]),
+        repository.load("protected_area", ["2"]),
+    )
+
+    assert repository.calls == [["1", "2"]]
+    assert results[2] == ([box(1, 0, 2, 1)], [20.0])
+
+
+def test_query_selects_the_id_column():
+    url, params = DataApiAoiGeometryRepository()._get_geojson_request_for_data_api(
+        "indigenous_land", ["a", "b"]
+    )
+
+    assert url.endswith("/dataset/landmark_ip_lc_and_indicative_poly/latest/query")
+    assert params["sql"] == (
+        "select landmark_id as aoi_id, geom, gfw_area__ha from data "
+        "where landmark_id in ('a', 'b') order by landmark_id"
+    )
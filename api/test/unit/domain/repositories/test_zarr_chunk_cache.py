@@ -0,0 +1,123 @@
+import os
+import pickle
+
+import numpy as np
+import xarray as xr
+from zarr.storage import LocalStore
+
+from app.domain.repositories.zarr_chunk_cache import (
+    ChunkCachingStore,
+    DiskChunkCache,
+    get_disk_chunk_cache,
+    store_namespace,
+)
+
+
+class CountingStore(LocalStore):
+    """A LocalStore that counts reads, standing in for S3 GETs."""
+
+    keys_read = []
+
+    async def get(self, key, prototype, byte_range=None):
+        type(self).keys_read.append(key)
+        return await super().get(key, prototype, byte_range)
+
+    def get_sync(self, key, *, prototype=None, byte_range=None):
+        type(self).keys_read.append(key)
+        return super().get_sync(key, prototype=prototype, byte_range=byte_range)
+
+
+def _write_dataset(path):
+    ds = xr.Dataset(
+        {"band_data": (("y", "x"), np.arange(100, dtype="float32").reshape(10, 10))},
+        coords={"y": np.arange(10), "x": np.arange(10)},
+    )
+    ds.chunk({"y": 5, "x": 5}).to_zarr(path, mode="w", consolidated=False)
+    return ds
+
+
+def _open(path, cache):
+    store = ChunkCachingStore(
+        CountingStore(str(path), read_only=True), cache=cache, namespace=str(path)
+    )
+    return xr.open_zarr(store, consolidated=False)
+
+
+class TestDiskChunkCache:
+    def test_miss_then_hit(self, tmp_path):
+        cache = DiskChunkCache(str(tmp_path), max_bytes=1024)
+
+        assert cache.get("s3://a.zarr", "band_data/c/0/0") is None
+        cache.put("s3://a.zarr", "band_data/c/0/0", b"chunk")
+
+        assert cache.get("s3://a.zarr", "band_data/c/0/0") == b"chunk"
+        assert cache.get("s3://b.zarr", "band_data/c/0/0") is None
+        assert cache.stats() == {"hits": 1, "misses": 2}
+
+    def test_evicts_least_recently_used_when_over_budget(self, tmp_path):
+        cache = DiskChunkCache(str(tmp_path), max_bytes=250)
+
+        cache.put("ns", "a", b"x" * 100)
+        cache.put("ns", "b", b"x" * 100)
+        cache.get("ns", "a")
+        cache.put("ns", "c", b"x" * 100)
+
+        assert cache.get("ns", "b") is None
+        assert cache.get("ns", "a") is not None
+        assert cache.get("ns", "c") is not None
+        assert cache._total_bytes == 200
+
+    def test_restarted_cache_evicts_by_file_age(self, tmp_path):
+        cache = DiskChunkCache(str(tmp_path), max_bytes=250)
+        cache.put("ns", "a", b"x" * 100)
+        cache.put("ns", "b", b"x" * 100)
+        # mtimes can tie on fast disks, so age "b" explicitly
+        os.utime(cache._path_for("ns", "b"), (0, 0))
+
+        restarted = DiskChunkCache(str(tmp_path), max_bytes=250)
+        restarted.put("ns", "c", b"x" * 100)
+
+        assert restarted.get("ns", "b") is None
+        assert restarted.get("ns", "a") is not None
+
+    def test_pickles_to_the_process_instance(self, tmp_path):
+        cache = get_disk_chunk_cache(str(tmp_path), 1024)
+
+        assert pickle.loads(pickle.dumps(cache)) is cache
+
+
+class TestStoreNamespace:
+    def test_versioned_uri_is_its_own_namespace(self):
+        uri = "s3://lcl-analytics/zarr/umd-tree-cover-loss/v1.13/year.zarr/"
+
+        assert store_namespace(uri) == uri.rstrip("/")
+
+    def test_unversioned_store_changes_namespace_when_rewritten(self, tmp_path):
+        path = tmp_path / "natural_lands.zarr"
+        _write_dataset(path)
+        before = store_namespace(str(path))
+        os.utime(path / "zarr.json", (0, 0))
+
+        assert before is not None and before.startswith(str(path))
+        assert store_namespace(str(path)) != before
+
+    def test_unversioned_store_without_metadata_is_not_cached(self, tmp_path):
+        assert store_namespace(str(tmp_path / "missing.zarr")) is None
+
+
+def test_reopened_store_reads_chunks_from_local_disk(tmp_path):
+    expected = _write_dataset(tmp_path / "data.zarr")
+    cache = DiskChunkCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+
+    CountingStore.keys_read = []
+    first = _open(tmp_path / "data.zarr", cache).band_data.load()
+    assert "band_data/c/0/0" in CountingStore.keys_read
+
+    CountingStore.keys_read = []
+    second = _open(tmp_path / "data.zarr", cache).band_data.load()
+
+    xr.testing.assert_equal(first, expected.band_data)
+    xr.testing.assert_equal(second, expected.band_data)
+    # Only metadata goes back to the store; every chunk comes from the cache
+    assert not [k for k in CountingStore.keys_read if "/c/" in k]
+    assert cache.hits >= 4
@@ -1,13 +1,19 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
 import dask.array as da
 import numpy as np
 import pytest
 import rioxarray  # noqa: F401 — needed for .rio accessor
 import xarray as xr
-from shapely.geometry import Polygon, box
+from shapely.geometry import MultiPolygon, Polygon, box, mapping
 
 from app.domain.models.dataset import Dataset
 from app.domain.models.environment import Environment
-from app.domain.repositories.zarr_dataset_repository import ZarrDatasetRepository
+from app.domain.repositories.zarr_dataset_repository import (
+    ZarrDatasetRepository,
+    _GeometryIndex,
+)
 
 
 def _make_large_dask_dataarray(
@@ -137,6 +143,53 @@ class TestClipXarrToGeometryLazyPath:
             result.data, da.Array
         ), "Expected dask array but got an eagerly computed result"
 
+    # --- shared masks -----------------------------------------------------
+
+    def test_lazy_clip_reuses_mask_for_layers_on_the_same_grid(self):
+        """Layers on the same grid and chunking share one mask graph."""
+        repo = ZarrDatasetRepository()
+        clip_geom = Polygon([(600, 0), (1200, 600), (600, 1200), (0, 600)])
+
+        first = repo._clip_xarr_to_geometry(
+            _make_large_dask_dataarray(fill_value=1), clip_geom
+        )
+        second = repo._clip_xarr_to_geometry(
+            _make_large_dask_dataarray(fill_value=2, nodata=255), clip_geom
+        )
+        other_chunks = repo._clip_xarr_to_geometry(
+            _make_large_dask_dataarray(fill_value=1, chunk_size=300), clip_geom
+        )
+
+        mask_layers = [
+            {name for name in arr.data.dask.layers if name.startswith("aoi-mask-")}
+            for arr in (first, second, other_chunks)
+        ]
+        assert mask_layers[0] == mask_layers[1]
+        assert len(mask_layers[0]) == 1
+        assert mask_layers[0] != mask_layers[2]
+        assert ((first.values == 1) == (second.values == 2)).all()
+
+    def test_clip_masks_survive_concurrent_eviction(self, monkeypatch):
+        """Threads sharing a repository can hit and evict masks at once."""
+        monkeypatch.setattr(
+            "app.domain.repositories.zarr_dataset_repository."
+            "CLIP_MASK_CACHE_MAX_ENTRIES",
+            1,
+        )
+        repo = ZarrDatasetRepository()
+        sliced = _make_large_dask_dataarray()
+        geoms = [box(0, 0, 600 + i, 600 + i) for i in range(4)]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            masks = list(
+                pool.map(lambda i: repo._clip_mask(sliced, geoms[i % 4]), range(400))
+            )
+
+        assert len(masks) == 400
+        assert len(repo._clip_masks) == 1
+        restored = pickle.loads(pickle.dumps(repo))
+        assert restored._clip_mask(sliced, geoms[0]) is not None
+
     # --- small-region fallback (rio.clip) ---------------------------------
 
     def test_small_region_falls_back_to_rio_clip(self):
@@ -228,3 +281,60 @@ class TestResolveZarrUri:
             assert uri_staging == uri_prod
         finally:
             ZarrDatasetRepository._ZARR_URIS[Environment.staging] = original
+
+
+class TestOverview:
+    def test_reads_overview_group_when_every_dataset_has_one(self):
+        repo = ZarrDatasetRepository(environment=Environment.staging)
+
+        overview = repo.overview(
+            [Dataset.area_hectares, Dataset.tree_cover_loss], factor=16
+        )
+
+        assert overview.group == "overview_16"
+        assert overview.environment == Environment.staging
+        assert repo.group == "otf"
+
+    def test_falls_back_to_full_resolution_without_an_overview(self):
+        repo = ZarrDatasetRepository()
+
+        assert repo.overview([Dataset.area_hectares, Dataset.tree_cover_gain]) is repo
+
+
+class TestGeometryIndex:
+    def test_chunk_inside_one_part_needs_no_rasterization(self):
+        index = _GeometryIndex(MultiPolygon([box(0, 0, 10, 10), box(20, 0, 30, 10)]))
+
+        assert index.touching_parts(box(1, 1, 2, 2)) is None
+
+    def test_chunk_away_from_every_part_touches_nothing(self):
+        index = _GeometryIndex(MultiPolygon([box(0, 0, 10, 10), box(20, 0, 30, 10)]))
+
+        assert index.touching_parts(box(12, 1, 18, 2)) == []
+
+    def test_boundary_chunk_only_sees_nearby_parts(self):
+        parts = [box(i * 10, 0, i * 10 + 5, 5) for i in range(100)]
+        index = _GeometryIndex(MultiPolygon(parts))
+
+        touching = index.touching_parts(box(8, 1, 12, 2))
+
+        assert touching == [parts[1]]
+
+    def test_survives_pickling(self):
+        index = _GeometryIndex(MultiPolygon([box(0, 0, 10, 10)]))
+        index.touching_parts(box(1, 1, 2, 2))
+
+        restored = pickle.loads(pickle.dumps(index))
+
+        assert restored.touching_parts(box(1, 1, 2, 2)) is None
+
+    def test_lazy_clip_of_multipolygon_matches_rio_clip(self):
+        arr = _make_large_dask_dataarray(nx=1200, ny=1200, fill_value=1, nodata=0)
+        geom = MultiPolygon(
+            [Polygon([(600, 0), (1200, 600), (600, 1200), (0, 600)]), box(0, 0, 50, 50)]
+        )
+
+        lazy = ZarrDatasetRepository()._clip_xarr_to_geometry(arr, geom).values
+        eager = arr.rio.clip([mapping(geom)], drop=False).values
+
+        assert (lazy == eager).all()
@@ -0,0 +1,96 @@
+import numpy as np
+import rioxarray  # noqa: F401 — needed for .rio accessor
+import xarray as xr
+
+from app.domain.repositories.zarr_store_registry import ZarrStoreRegistry
+
+
+class CountingOpener:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, uri, group=None):
+        self.calls.append((uri, group))
+        return xr.Dataset(
+            {"band_data": (("y", "x"), np.zeros((2, 2)))},
+            coords={"y": [1.5, 0.5], "x": [0.5, 1.5]},
+        )
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestZarrStoreRegistry:
+    def test_opens_each_store_once(self):
+        opener = CountingOpener()
+        registry = ZarrStoreRegistry(opener=opener)
+
+        registry.open("s3://bucket/a.zarr", group="otf")
+        registry.open("s3://bucket/a.zarr", group="otf")
+
+        assert opener.calls == [("s3://bucket/a.zarr", "otf")]
+
+    def test_groups_are_separate_entries(self):
+        opener = CountingOpener()
+        registry = ZarrStoreRegistry(opener=opener)
+
+        registry.open("s3://bucket/a.zarr", group="otf")
+        registry.open("s3://bucket/a.zarr", group="pipeline")
+
+        assert len(opener.calls) == 2
+
+    def test_callers_cannot_mutate_the_shared_dataset(self):
+        registry = ZarrStoreRegistry(opener=CountingOpener())
+
+        band = registry.open("s3://bucket/a.zarr").band_data
+        band.rio.write_crs("EPSG:4326", inplace=True)
+        band.name = "renamed"
+
+        fresh = registry.open("s3://bucket/a.zarr").band_data
+        assert "spatial_ref" not in fresh.coords
+        assert fresh.name == "band_data"
+
+    def test_reopens_after_ttl(self):
+        opener = CountingOpener()
+        clock = FakeClock()
+        registry = ZarrStoreRegistry(opener=opener, ttl_seconds=60, clock=clock)
+
+        registry.open("s3://bucket/a.zarr")
+        clock.now = 61
+        registry.open("s3://bucket/a.zarr")
+
+        assert len(opener.calls) == 2
+
+    def test_evicts_least_recently_used(self):
+        opener = CountingOpener()
+        registry = ZarrStoreRegistry(opener=opener, max_entries=2)
+
+        registry.open("s3://bucket/a.zarr")
+        registry.open("s3://bucket/b.zarr")
+        registry.open("s3://bucket/a.zarr")
+        registry.open("s3://bucket/c.zarr")
+        registry.open("s3://bucket/b.zarr")
+
+        assert [uri for uri, _ in opener.calls] == [
+            "s3://bucket/a.zarr",
+            "s3://bucket/b.zarr",
+            "s3://bucket/c.zarr",
+            "s3://bucket/b.zarr",
+        ]
+
+    def test_invalidate_drops_only_that_uri(self):
+        opener = CountingOpener()
+        registry = ZarrStoreRegistry(opener=opener)
+        registry.open("s3://bucket/a.zarr")
+        registry.open("s3://bucket/b.zarr")
+
+        registry.invalidate("s3://bucket/a.zarr")
+        registry.open("s3://bucket/a.zarr")
+        registry.open("s3://bucket/b.zarr")
+
+        assert len(opener.calls) == 3
@@ -0,0 +1,150 @@
+import base64
+import hashlib
+import io
+import shutil
+
+import pytest
+
+from app.infrastructure.external_services.admin_results_mirror import (
+    AdminResultsMirror,
+    multipart_etag,
+)
+from app.infrastructure.external_services.duck_db_query_service import (
+    DuckDbPrecalcQueryService,
+)
+
+URI = "s3://bucket/admin/v1/results.parquet"
+CONTENT = b"PAR1 admin results PAR1"
+
+
+class FakeS3:
+    def __init__(self, source, etag=None, part_size=None, checksum=None):
+        self.source = source
+        self.etag = etag or hashlib.md5(source.read_bytes()).hexdigest()
+        self.part_size = part_size
+        self.checksum = checksum
+        self.downloads = 0
+
+    def head_object(
+        self, Bucket, Key, RequestPayer, ChecksumMode=None, PartNumber=None
+    ):
+        if PartNumber is not None:
+            return {"ETag": f'"{self.etag}"', "ContentLength": self.part_size}
+        head = {"ETag": f'"{self.etag}"'}
+        if self.checksum is not None and ChecksumMode == "ENABLED":
+            head["ChecksumSHA256"] = self.checksum
+        return head
+
+    def download_file(self, bucket, key, filename, ExtraArgs):
+        self.downloads += 1
+        shutil.copy(self.source, filename)
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.parquet"
+    path.write_bytes(CONTENT)
+    return path
+
+
+def test_sync_downloads_once_and_reuses_verified_copy(tmp_path, source):
+    s3 = FakeS3(source)
+    mirror = AdminResultsMirror(str(tmp_path / "mirror"), lambda: s3)
+
+    local_path = mirror.sync(URI)
+    assert local_path.read_bytes() == CONTENT
+    assert local_path == tmp_path / "mirror" / "bucket" / "admin/v1/results.parquet"
+
+    assert AdminResultsMirror(str(tmp_path / "mirror"), lambda: s3).sync(URI)
+    assert s3.downloads == 1
+
+
+def test_sync_rejects_copy_that_does_not_match_etag(tmp_path, source):
+    s3 = FakeS3(source, etag="0" * 32)
+    mirror = AdminResultsMirror(str(tmp_path / "mirror"), lambda: s3)
+
+    with pytest.raises(ValueError):
+        mirror.sync(URI)
+    assert not list((tmp_path / "mirror").rglob("*.parquet*"))
+
+
+def test_multipart_etag_matches_s3_form(tmp_path):
+    path = tmp_path / "big.parquet"
+    parts = [b"a" * (1024 * 1024), b"b" * 10]
+    path.write_bytes(b"".join(parts))
+    expected = hashlib.md5(b"".join(hashlib.md5(p).digest() for p in parts))
+
+    assert multipart_etag(path, f"{expected.hexdigest()}-2", 1024 * 1024) == (
+        f"{expected.hexdigest()}-2"
+    )
+
+
+def test_sync_verifies_multipart_etag_with_uploaded_part_size(tmp_path, source):
+    # e.g. s3fs uploads in 50 MiB blocks, not the smallest whole MiB
+    part_size = 5
+    stream = io.BytesIO(CONTENT)
+    parts = list(iter(lambda: stream.read(part_size), b""))
+    digest = hashlib.md5(b"".join(hashlib.md5(p).digest() for p in parts))
+    s3 = FakeS3(source, etag=f"{digest.hexdigest()}-{len(parts)}", part_size=5)
+    mirror = AdminResultsMirror(str(tmp_path / "mirror"), lambda: s3)
+
+    assert mirror.sync(URI).read_bytes() == CONTENT
+
+
+def test_sync_prefers_sha256_checksum(tmp_path, source):
+    checksum = base64.b64encode(hashlib.sha256(b"other").digest()).decode()
+    s3 = FakeS3(source, checksum=checksum)
+    mirror = AdminResultsMirror(str(tmp_path / "mirror"), lambda: s3)
+
+    with pytest.raises(ValueError, match="SHA-256"):
+        mirror.sync(URI)
+
+    s3.checksum = base64.b64encode(hashlib.sha256(CONTENT).digest()).decode()
+    assert mirror.sync(URI).read_bytes() == CONTENT
+
+
+def test_failed_sync_backs_off(tmp_path, source):
+    s3 = FakeS3(source, etag="0" * 32)
+    mirror = AdminResultsMirror(str(tmp_path / "mirror"), lambda: s3)
+
+    mirror._sync_in_background(URI)
+    assert mirror.resolve(URI) == URI
+    assert URI not in mirror._syncing  # no new sync started
+    assert s3.downloads == 1
+
+    mirror._sync_in_background(URI)
+    assert mirror._failures[URI][0] == 2
+
+
+def test_resolve_falls_back_to_s3_until_mirrored(tmp_path, source):
+    mirror = AdminResultsMirror(str(tmp_path / "mirror"), lambda: FakeS3(source))
+    mirror._syncing.add(URI)  # a background sync is already running
+    assert mirror.resolve(URI) == URI
+
+    mirror._sync_in_background(URI)
+
+    assert mirror.resolve(URI) == str(mirror.verified[URI])
+    assert mirror.resolve("s3://bucket/other/*.parquet") == (
+        "s3://bucket/other/*.parquet"
+    )
+
+
+class FakeDataFrame(dict):
+    def to_dict(self, orient):
+        return {}
+
+
+@pytest.mark.asyncio
+async def test_query_service_reads_mirrored_table(tmp_path, source):
+    mirror = AdminResultsMirror(str(tmp_path / "mirror"), lambda: FakeS3(source))
+    mirror._sync_in_background(URI)
+
+    class Service(DuckDbPrecalcQueryService):
+        async def _run(self, query):
+            self.query = query
+            return FakeDataFrame()
+
+    service = Service(URI, mirror=mirror)
+    await service.execute("SELECT * FROM data_source")
+
+    assert service.query == f"SELECT * FROM '{mirror.verified[URI]}'"
@@ -1,10 +1,15 @@
 import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 import pytest
 
+from app.infrastructure.external_services import duck_db_query_service
 from app.infrastructure.external_services.duck_db_query_service import (
     DuckDbPrecalcQueryService,
+    DuckDbQueryPool,
+    run_query_sync,
 )
 
 
@@ -30,3 +35,70 @@ class TestDuckDbPrecalcQueryServiceTimeout:
         service = FastQueryService(table_uri="x", timeout_seconds=5)
         result = await service.execute("SELECT 1 FROM data_source")
         assert result["aoi_id"] == ["BRA.1"]
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+        return self
+
+    def fetchdf(self):
+        return pd.DataFrame({"n": [1]})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+class TestWarmConnection:
+    def test_reuses_connection_and_refreshes_secret_on_schedule(self, monkeypatch):
+        con, clock = FakeConnection(), FakeClock()
+        monkeypatch.setattr(duck_db_query_service, "time", clock)
+        monkeypatch.setattr(duck_db_query_service, "_connection", con)
+        monkeypatch.setattr(duck_db_query_service, "_secret_created_at", None)
+        monkeypatch.setattr(
+            duck_db_query_service, "DUCKDB_CREDENTIAL_REFRESH_SECONDS", 60
+        )
+
+        run_query_sync("SELECT 1")
+        run_query_sync("SELECT 2")
+        clock.now = 61
+        run_query_sync("SELECT 3")
+
+        secrets = [s for s in con.statements if "CREATE OR REPLACE SECRET" in s]
+        assert len(secrets) == 2
+        assert [s for s in con.statements if s.startswith("SELECT")] == [
+            "SELECT 1",
+            "SELECT 2",
+            "SELECT 3",
+        ]
+
+
+class TestDuckDbQueryPool:
+    @pytest.mark.asyncio
+    async def test_reports_queries_waiting_for_a_worker(self, monkeypatch):
+        release = threading.Event()
+
+        def blocking_query(sql, params=None):
+            release.wait(5)
+            return sql
+
+        monkeypatch.setattr(duck_db_query_service, "run_query_sync", blocking_query)
+        pool = DuckDbQueryPool(max_workers=1)
+        pool._executor = ThreadPoolExecutor(max_workers=1)
+
+        queries = [asyncio.create_task(pool.run(f"q{i}")) for i in range(3)]
+        await asyncio.sleep(0.05)
+        assert (pool.in_flight, pool.queue_depth) == (3, 2)
+
+        release.set()
+        assert await asyncio.gather(*queries) == ["q0", "q1", "q2"]
+        assert (pool.in_flight, pool.queue_depth) == (0, 0)
+        pool.shutdown()
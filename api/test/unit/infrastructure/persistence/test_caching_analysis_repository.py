@@ -0,0 +1,177 @@
+import asyncio
+import uuid
+from collections import Counter
+
+import pytest
+
+from app.domain.models.analysis import Analysis
+from app.domain.repositories.analysis_repository import AnalysisRepository
+from app.infrastructure.persistence import caching_analysis_repository
+from app.infrastructure.persistence.caching_analysis_repository import (
+    AnalysisCache,
+    CachingAnalysisRepository,
+)
+from app.models.common.analysis import AnalysisStatus
+
+RESOURCE_ID = uuid.UUID("c9787f41-b194-4589-ae53-f45ef290ce6f")
+
+
+def _analysis(status, result=None):
+    return Analysis(
+        result=result,
+        metadata={"aoi": {"type": "admin", "ids": ["BRA"]}},
+        status=status,
+    )
+
+
+class InMemoryAnalysisRepository(AnalysisRepository):
+    def __init__(self):
+        self.analyses = {}
+        self.loads = Counter()
+
+    async def load_analysis(self, resource_id):
+        self.loads[resource_id] += 1
+        return self.analyses.get(
+            resource_id, Analysis(result=None, metadata=None, status=None)
+        )
+
+    async def store_analysis(self, resource_id, analytics):
+        self.analyses[resource_id] = analytics
+
+
+def _repository(**cache_kwargs):
+    backing = InMemoryAnalysisRepository()
+    cache = AnalysisCache(
+        **{"max_bytes": 1024 * 1024, "directory": None, **cache_kwargs}
+    )
+    return backing, CachingAnalysisRepository(backing, cache)
+
+
+class TestCachingAnalysisRepository:
+    @pytest.mark.asyncio
+    async def test_saved_analysis_is_loaded_once(self):
+        backing, repo = _repository()
+        backing.analyses[RESOURCE_ID] = _analysis(AnalysisStatus.saved, {"a": [1]})
+
+        first = await repo.load_analysis(RESOURCE_ID)
+        second = await repo.load_analysis(RESOURCE_ID)
+
+        assert first == second == backing.analyses[RESOURCE_ID]
+        assert backing.loads[RESOURCE_ID] == 1
+        assert (repo.cache.hits, repo.cache.misses) == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_cached_metadata_is_not_shared_with_callers(self):
+        backing, repo = _repository()
+        backing.analyses[RESOURCE_ID] = _analysis(AnalysisStatus.saved, {"a": [1]})
+
+        (await repo.load_analysis(RESOURCE_ID)).metadata["aoi"]["ids"] = ["IDN"]
+
+        loaded = await repo.load_analysis(RESOURCE_ID)
+        assert loaded.metadata["aoi"]["ids"] == ["BRA"]
+
+    @pytest.mark.asyncio
+    async def test_unsaved_analysis_expires(self):
+        backing, repo = _repository(unsaved_ttl=0)
+        backing.analyses[RESOURCE_ID] = _analysis(AnalysisStatus.pending)
+
+        await repo.load_analysis(RESOURCE_ID)
+        await repo.load_analysis(RESOURCE_ID)
+
+        assert backing.loads[RESOURCE_ID] == 2
+
+    @pytest.mark.asyncio
+    async def test_write_invalidates(self):
+        backing, repo = _repository(unsaved_ttl=60)
+        await repo.store_analysis(RESOURCE_ID, _analysis(AnalysisStatus.pending))
+        assert (await repo.load_analysis(RESOURCE_ID)).status == AnalysisStatus.pending
+
+        await repo.store_analysis(
+            RESOURCE_ID, _analysis(AnalysisStatus.saved, {"a": [1]})
+        )
+
+        loaded = await repo.load_analysis(RESOURCE_ID)
+        assert loaded.status == AnalysisStatus.saved
+        assert loaded.result == {"a": [1]}
+
+    @pytest.mark.asyncio
+    async def test_evicts_least_recently_used_beyond_byte_budget(self):
+        backing, repo = _repository(max_bytes=200)
+        ids = [uuid.uuid4() for _ in range(3)]
+        for resource_id in ids:
+            backing.analyses[resource_id] = _analysis(
+                AnalysisStatus.saved, {"a": list(range(10))}
+            )
+            await repo.load_analysis(resource_id)
+
+        assert repo.cache.total_bytes <= 200
+        await repo.load_analysis(ids[0])
+        assert backing.loads[ids[0]] == 2
+        assert backing.loads[ids[-1]] == 1
+
+    @pytest.mark.asyncio
+    async def test_disk_tier_survives_a_new_cache(self, tmp_path):
+        backing, repo = _repository(directory=str(tmp_path))
+        backing.analyses[RESOURCE_ID] = _analysis(AnalysisStatus.saved, {"a": [1]})
+        await repo.load_analysis(RESOURCE_ID)
+
+        restarted = CachingAnalysisRepository(
+            backing, AnalysisCache(max_bytes=1024 * 1024, directory=str(tmp_path))
+        )
+        loaded = await restarted.load_analysis(RESOURCE_ID)
+
+        assert loaded == backing.analyses[RESOURCE_ID]
+        assert backing.loads[RESOURCE_ID] == 1
+
+    @pytest.mark.asyncio
+    async def test_disk_tier_skips_unsaved_analyses(self, tmp_path):
+        backing, repo = _repository(directory=str(tmp_path))
+        backing.analyses[RESOURCE_ID] = _analysis(AnalysisStatus.pending)
+
+        await repo.load_analysis(RESOURCE_ID)
+
+        assert list(tmp_path.iterdir()) == []
+
+    @pytest.mark.asyncio
+    async def test_results_are_only_serialized_for_the_disk_tier(self, monkeypatch):
+        serialized = []
+        dumps = caching_analysis_repository.orjson.dumps
+        monkeypatch.setattr(
+            caching_analysis_repository.orjson,
+            "dumps",
+            lambda obj, **kwargs: serialized.append(obj) or dumps(obj, **kwargs),
+        )
+        small, large = uuid.uuid4(), uuid.uuid4()
+        backing, repo = _repository()
+        backing.analyses[small] = _analysis(AnalysisStatus.saved, {"a": [1]})
+        backing.analyses[large] = _analysis(
+            AnalysisStatus.saved, {"a": list(range(1000)), "b": list(range(1000))}
+        )
+
+        await repo.load_analysis(small)
+        await repo.load_analysis(large)
+
+        assert not any("result" in obj for obj in serialized)
+        # the estimate still grows with the number of result values
+        sizes = repo.cache.sizes
+        assert sizes[str(large)] - sizes[str(small)] >= len(dumps(list(range(2000))))
+
+    @pytest.mark.asyncio
+    async def test_store_wakes_waiters(self):
+        backing, repo = _repository()
+        waiters = [
+            asyncio.create_task(repo.wait_for_write(RESOURCE_ID, 5)) for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+
+        await repo.store_analysis(RESOURCE_ID, _analysis(AnalysisStatus.saved))
+
+        assert await asyncio.gather(*waiters) == [True, True]
+        assert repo.cache._writes == {}
+
+    @pytest.mark.asyncio
+    async def test_wait_times_out_without_a_write(self):
+        _, repo = _repository()
+
+        assert await repo.wait_for_write(RESOURCE_ID, 0.01) is False
+        assert repo.cache._writes == {}
@@ -107,3 +107,46 @@ class TestTreeCoverLossAnalyticsIn:
                 forest_filter="natural_forest",
                 intersections=["driver"],
             )
+
+    def test_exact_analysis_keeps_its_thumbprint(self):
+        fields = dict(
+            aoi={"type": "protected_area", "ids": ["9823"]},
+            start_year="2021",
+            end_year="2024",
+            canopy_cover=30,
+            intersections=[],
+        )
+        exact = TreeCoverLossAnalyticsIn(**fields)
+
+        assert "approximate" not in exact.model_dump()
+        assert (
+            TreeCoverLossAnalyticsIn(**fields, approximate=False).thumbprint()
+            == exact.thumbprint()
+        )
+        assert (
+            TreeCoverLossAnalyticsIn(**fields, approximate=True).thumbprint()
+            != exact.thumbprint()
+        )
+
+    def test_approximate_admin_error(self):
+        with pytest.raises(ValueError):
+            TreeCoverLossAnalyticsIn(
+                aoi={"type": "admin", "ids": ["IDN"]},
+                start_year="2021",
+                end_year="2024",
+                canopy_cover=30,
+                intersections=[],
+                approximate=True,
+            )
+
+    @pytest.mark.parametrize("forest_filter", ["natural_forest", "intact_forest"])
+    def test_approximate_error_without_overviews(self, forest_filter):
+        with pytest.raises(ValueError, match="no overviews"):
+            TreeCoverLossAnalyticsIn(
+                aoi={"type": "protected_area", "ids": ["9823"]},
+                start_year="2021",
+                end_year="2024",
+                forest_filter=forest_filter,
+                intersections=[],
+                approximate=True,
+            )
@@ -5,13 +5,17 @@ import pytest
 from fastapi.testclient import TestClient
 
 from app.main import app
-from app.models.common.analysis import AnalysisStatus
+from app.models.common.analysis import AnalysisStatus, AnalyticsOut
 from app.models.common.areas_of_interest import AdminAreaOfInterest
 from app.models.common.base import DataMartResourceLink, DataMartResourceLinkResponse
 from app.models.land_change.tree_cover import TreeCoverAnalyticsIn
 from app.routers.land_change.tree_cover.tree_cover import (
     create_analysis_service,
 )
+from app.use_cases.analysis.analysis_scheduler import (
+    AnalysisScheduler,
+    SchedulerSaturatedError,
+)
 from app.use_cases.analysis.analysis_service import AnalysisService
 
 client = TestClient(app)
@@ -93,3 +97,22 @@ class TestTreeCoverPostUseCaseInitiation:
         mock_service.reset_mock(return_value=True)
 
         assert response.status_code == 202
+
+    def test_post_503_with_retry_after_when_queue_is_full(self, dummy_analytics_in):
+        app.dependency_overrides[create_analysis_service] = create_mock_service
+        mock_service.analytics_resource = AnalyticsOut()
+        scheduler = MagicMock(spec=AnalysisScheduler)
+        scheduler.submit.side_effect = SchedulerSaturatedError(42)
+        app.state.analysis_scheduler = scheduler
+
+        try:
+            response = client.post(
+                ENDPOINT_PATH,
+                json=json.loads(dummy_analytics_in.model_dump_json()),
+            )
+        finally:
+            del app.state.analysis_scheduler
+            mock_service.reset_mock(return_value=True)
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "42"
@@ -1,9 +1,15 @@
+import io
 import json
+import uuid
 from unittest.mock import MagicMock
 
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
 from fastapi.testclient import TestClient
 
+from app.domain.models.analysis import Analysis
+from app.domain.repositories.analysis_repository import AnalysisRepository
 from app.main import app
 from app.models.common.analysis import AnalysisStatus
 from app.models.common.areas_of_interest import AdminAreaOfInterest
@@ -11,6 +17,7 @@ from app.models.common.base import DataMartResourceLink, DataMartResourceLinkRes
 from app.routers.land_change.tree_cover_loss.tree_cover_loss import (
     TreeCoverLossAnalyticsIn,
     create_analysis_service,
+    get_analysis_repository,
 )
 from app.use_cases.analysis.analysis_service import AnalysisService
 
@@ -98,3 +105,120 @@ class TestTreeCoverLossPostUseCaseInitiation:
         mock_service.reset_mock(return_value=True)
 
         assert response.status_code == 202
+
+
+class SavedAnalysisRepository:
+    RESULT = {
+        "aoi_id": ["IDN.24.9"] * 3,
+        "tree_cover_loss_year": [2022, 2023, 2024],
+        "area_ha": [1.5, 2.5, 3.5],
+    }
+
+    async def load_analysis(self, resource_id):
+        return Analysis(
+            result=self.RESULT,
+            metadata={"start_year": "2022", "_version": "v1"},
+            status=AnalysisStatus.saved,
+        )
+
+
+class TestTreeCoverLossGetColumnarResult:
+    @pytest.fixture(autouse=True)
+    def saved_analysis(self):
+        app.dependency_overrides[get_analysis_repository] = SavedAnalysisRepository
+        yield
+        app.dependency_overrides.pop(get_analysis_repository)
+
+    def _get(self, accept=None):
+        resource_id = uuid.uuid5(uuid.NAMESPACE_OID, "tcl")
+        headers = {"Accept": accept} if accept else {}
+        return client.get(
+            f"/v0/land_change/tree_cover_loss/analytics/{resource_id}", headers=headers
+        )
+
+    def test_json_by_default(self):
+        response = self._get()
+
+        assert response.headers["content-type"] == "application/json"
+        assert response.json()["data"]["result"] == SavedAnalysisRepository.RESULT
+
+    def test_arrow_stream(self):
+        response = self._get("application/vnd.apache.arrow.stream")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+        table = pa.ipc.open_stream(response.content).read_all()
+        assert table.to_pydict() == SavedAnalysisRepository.RESULT
+        assert json.loads(table.schema.metadata[b"metadata"]) == {"start_year": "2022"}
+
+    def test_parquet_preferred_over_json(self):
+        response = self._get("application/json;q=0.5, application/vnd.apache.parquet")
+
+        assert response.headers["content-type"] == "application/vnd.apache.parquet"
+        table = pq.read_table(io.BytesIO(response.content))
+        assert table.to_pydict() == SavedAnalysisRepository.RESULT
+        assert table.schema.metadata[b"status"] == b"saved"
+
+
+class FinishingAnalysisRepository(AnalysisRepository):
+    """Pending until someone waits for a write, then saved."""
+
+    def __init__(self):
+        self.status = AnalysisStatus.pending
+
+    async def load_analysis(self, resource_id):
+        return Analysis(
+            result=(
+                SavedAnalysisRepository.RESULT
+                if self.status == AnalysisStatus.saved
+                else None
+            ),
+            metadata={"start_year": "2022"},
+            status=self.status,
+        )
+
+    async def store_analysis(self, resource_id, analytics):
+        pass
+
+    async def wait_for_write(self, resource_id, timeout):
+        self.status = AnalysisStatus.saved
+        return True
+
+
+class TestTreeCoverLossWaitForResult:
+    @pytest.fixture(autouse=True)
+    def finishing_analysis(self):
+        app.dependency_overrides[get_analysis_repository] = FinishingAnalysisRepository
+        yield
+        app.dependency_overrides.pop(get_analysis_repository)
+
+    def _url(self, suffix=""):
+        resource_id = uuid.uuid5(uuid.NAMESPACE_OID, "tcl")
+        return f"/v0/land_change/tree_cover_loss/analytics/{resource_id}{suffix}"
+
+    def test_pending_without_wait(self):
+        response = client.get(self._url())
+
+        assert response.json()["data"]["status"] == "pending"
+        assert response.headers["Retry-After"] == "1"
+
+    def test_wait_returns_once_saved(self):
+        response = client.get(self._url(), params={"wait": 10})
+
+        assert response.json()["data"]["status"] == "saved"
+        assert response.json()["data"]["result"] == SavedAnalysisRepository.RESULT
+
+    def test_wait_is_bounded(self):
+        response = client.get(self._url(), params={"wait": 3600})
+
+        assert response.status_code == 422
+
+    def test_events_stream_status_changes(self):
+        response = client.get(self._url("/events"))
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert response.text == (
+            'event: status\ndata: {"status": "pending"}\n\n'
+            'event: status\ndata: {"status": "saved"}\n\n'
+        )
@@ -1,5 +1,8 @@
 import re
+from datetime import date
 
+import duckdb
+import pandas as pd
 import pytest
 
 from app.analysis.common.analysis import (
@@ -7,7 +10,17 @@ from app.analysis.common.analysis import (
     get_geojsons_from_data_api,
     get_sql_in_list,
 )
-from app.analysis.dist_alerts.query import create_gadm_dist_query
+from app.analysis.dist_alerts.analysis import (
+    get_precomputed_statistics,
+    query_resident_table,
+)
+from app.analysis.dist_alerts.query import (
+    create_batched_gadm_dist_query,
+    create_gadm_dist_query,
+)
+from app.infrastructure.external_services.arrow_precalc_query_service import (
+    ResidentAdminTable,
+)
 
 
 class TestGadmQueryAdm2NoIntersections:
@@ -243,3 +256,147 @@ def test_get_geojson_request_for_data_api_notreal():
 
 def test_sql_in_list():
     assert get_sql_in_list(["1", "2", "3"]) == "('1', '2', '3')"
+
+
+@pytest.fixture
+def dist_table(tmp_path):
+    path = tmp_path / "admin-dist-alerts-by-driver.parquet"
+    pd.DataFrame(
+        {
+            "country": ["IDN", "IDN", "IDN", "IDN", "BRA", "BRA"],
+            "region": [24, 24, 24, 3, 1, 1],
+            "subregion": [9, 9, 10, 1, 2, 2],
+            "driver": [1, 1, 2, 1, 3, 3],
+            "dist_alert_date": [date(2024, 1, d) for d in (2, 2, 1, 3, 5, 4)],
+            "dist_alert_confidence": [2, 2, 3, 2, 3, 3],
+            "area_ha": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+        }
+    ).to_parquet(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    "aoi_ids,intersection",
+    [
+        (["IDN.24.9", "BRA", "IDN.24", "IDN"], "driver"),
+        (["IDN.24", "IDN.3"], None),
+        (["BRA.1.2", "IDN.24.10"], None),
+    ],
+)
+def test_batched_dist_query_matches_per_id_queries(dist_table, aoi_ids, intersection):
+    per_id = []
+    for aoi_id in aoi_ids:
+        df = duckdb.query(
+            create_gadm_dist_query(aoi_id.split("."), dist_table, intersection)
+        ).df()
+        df["aoi_id"] = aoi_id
+        per_id.append(df)
+    expected = pd.concat(per_id).reset_index(drop=True)
+
+    batched = duckdb.query(
+        create_batched_gadm_dist_query(aoi_ids, dist_table, intersection)
+    ).df()
+
+    pd.testing.assert_frame_equal(batched, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize(
+    "aoi_ids",
+    [["BRA", "IDN.24", "IDN.24.9"], ["IDN.24.9", "IDN.24", "BRA"]],
+)
+def test_batched_dist_query_keeps_concatenated_dtypes_and_order(dist_table, aoi_ids):
+    expected = pd.concat(
+        duckdb.query(create_gadm_dist_query(aoi_id.split("."), dist_table))
+        .df()
+        .assign(aoi_id=aoi_id)
+        for aoi_id in aoi_ids
+    ).reset_index(drop=True)
+
+    batched = duckdb.query(create_batched_gadm_dist_query(aoi_ids, dist_table)).df()
+
+    assert batched.columns.tolist() == expected.columns.tolist()
+    assert batched.dtypes.to_dict() == expected.dtypes.to_dict()
+    assert batched.region.dtype == "float64"
+    assert batched.subregion.dtype == "float64"
+    pd.testing.assert_frame_equal(batched, expected)
+
+
+class LocalQueryPool:
+    def __init__(self):
+        self.queries = []
+
+    async def run(self, sql, params=None):
+        self.queries.append(sql)
+        return duckdb.query(sql).df()
+
+
+@pytest.mark.asyncio
+async def test_precomputed_statistics_run_one_query(dist_table, monkeypatch):
+    monkeypatch.setattr(
+        "app.analysis.dist_alerts.analysis.get_precomputed_table",
+        lambda aoi_type, intersection, version: dist_table,
+    )
+    pool = LocalQueryPool()
+
+    alerts_df = await get_precomputed_statistics(
+        {"type": "admin", "ids": ["IDN.24.9", "BRA"]}, "driver", "v1", pool
+    )
+
+    assert len(pool.queries) == 1
+    assert alerts_df.aoi_id.tolist() == ["IDN.24.9", "BRA", "BRA"]
+    assert alerts_df.area_ha.tolist() == [3.0, 6.0, 5.0]
+    assert (alerts_df.aoi_type == "admin").all()
+
+
+@pytest.mark.parametrize(
+    "aoi_ids,intersection",
+    [
+        (["IDN.24.9", "BRA", "IDN.24", "IDN"], "driver"),
+        (["BRA", "IDN.24", "IDN.24.9"], None),
+        (["IDN.24", "IDN.3"], None),
+        (["BRA.1.2", "IDN.24.10", "USA"], "driver"),
+    ],
+)
+def test_resident_dist_table_matches_sql(dist_table, aoi_ids, intersection):
+    table = ResidentAdminTable.from_uri(dist_table)
+
+    resident = query_resident_table(table, aoi_ids, intersection)
+    sql = duckdb.query(
+        create_batched_gadm_dist_query(aoi_ids, dist_table, intersection)
+    ).df()
+
+    assert table.key == "country"
+    pd.testing.assert_frame_equal(resident, sql)
+
+
+class FakeResidentTables:
+    def __init__(self, tables):
+        self.tables = tables
+
+    def get(self, uri):
+        return self.tables.get(uri)
+
+
+@pytest.mark.asyncio
+async def test_precomputed_statistics_read_resident_table(dist_table, monkeypatch):
+    monkeypatch.setattr(
+        "app.analysis.dist_alerts.analysis.get_precomputed_table",
+        lambda aoi_type, intersection, version: dist_table,
+    )
+    pool = LocalQueryPool()
+    resident_tables = FakeResidentTables(
+        {dist_table: ResidentAdminTable.from_uri(dist_table)}
+    )
+
+    alerts_df = await get_precomputed_statistics(
+        {"type": "admin", "ids": ["IDN.24.9", "BRA"]},
+        "driver",
+        "v1",
+        pool,
+        resident_tables=resident_tables,
+    )
+
+    assert pool.queries == []
+    assert alerts_df.aoi_id.tolist() == ["IDN.24.9", "BRA", "BRA"]
+    assert alerts_df.area_ha.tolist() == [3.0, 6.0, 5.0]
+    assert (alerts_df.aoi_type == "admin").all()
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from app.use_cases.analysis.analysis_scheduler import (
+    AnalysisScheduler,
+    SchedulerSaturatedError,
+)
+
+
+class FakeResource:
+    def __init__(self, metadata):
+        self.metadata = metadata
+
+
+class FakeService:
+    """Stands in for AnalysisService; ``do`` blocks until released."""
+
+    def __init__(self, started, analytic="tree_cover_loss", aoi=None):
+        self.analytic = analytic
+        self.analytics_resource = FakeResource(
+            {"aoi": aoi or {"type": "protected_area", "ids": ["1"]}}
+        )
+        self.started = started
+        self.release = asyncio.Event()
+
+    def event_name(self):
+        return self.analytic
+
+    async def do(self):
+        self.started.append(self)
+        await self.release.wait()
+
+
+async def _settle():
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_limits_concurrency_per_analytic():
+    started = []
+    scheduler = AnalysisScheduler(max_concurrency=4, max_per_analytic=1)
+    services = [FakeService(started) for _ in range(2)] + [
+        FakeService(started, analytic="dist_alerts")
+    ]
+
+    for service in services:
+        scheduler.submit(service)
+    await _settle()
+
+    assert started == [services[0], services[2]]
+    assert scheduler.queue_depth == 1
+
+    services[0].release.set()
+    await _settle()
+    assert started[-1] is services[1]
+    assert scheduler.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_prefers_admin_and_small_jobs_when_a_slot_frees_up():
+    started = []
+    scheduler = AnalysisScheduler(max_concurrency=1)
+    first = FakeService(started)
+    large = FakeService(
+        started, aoi={"type": "protected_area", "ids": [str(i) for i in range(50)]}
+    )
+    small = FakeService(started, aoi={"type": "protected_area", "ids": ["1", "2"]})
+    admin = FakeService(started, aoi={"type": "admin", "ids": ["BRA"] * 100})
+
+    for service in [first, large, small, admin]:
+        scheduler.submit(service)
+    await _settle()
+
+    for expected in [admin, small, large]:
+        started[-1].release.set()
+        await _settle()
+        assert started[-1] is expected
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_rejected_with_retry_after():
+    started = []
+    scheduler = AnalysisScheduler(max_queue_size=1, max_concurrency=1)
+    scheduler.average_run_seconds = 30
+
+    scheduler.submit(FakeService(started))
+    scheduler.submit(FakeService(started))
+
+    with pytest.raises(SchedulerSaturatedError) as exc_info:
+        scheduler.submit(FakeService(started))
+    assert exc_info.value.retry_after_seconds == 60
@@ -1,3 +1,4 @@
+import asyncio
 import uuid
 from unittest.mock import AsyncMock, MagicMock, call
 
@@ -424,3 +425,59 @@ class TestResourceThumbprint:
         await service_b.set_resource_from(analytics_in)
 
         assert service_a.resource_thumbprint() == service_b.resource_thumbprint()
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_requests_run_one_analysis(
+        self, stub_analysis_in, mock_analysis_repository
+    ):
+        mock_analysis_repository.load_analysis.return_value = Analysis(
+            result=None, metadata=None, status=None
+        )
+        analyzer = MagicMock(spec=Analyzer)
+        analyzer.thumbprint.return_value = uuid.uuid4()
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow_analyze(analysis):
+            started.set()
+            await release.wait()
+            analysis.result = {"area_ha": [1.0]}
+
+        analyzer.analyze = AsyncMock(side_effect=slow_analyze)
+
+        services = [
+            AnalysisService(mock_analysis_repository, analyzer, "test_endpoint_name")
+            for _ in range(3)
+        ]
+        for service in services:
+            await service.set_resource_from(stub_analysis_in)
+
+        running = [asyncio.create_task(service.do()) for service in services]
+        await started.wait()
+        await asyncio.sleep(0)
+        assert not any(task.done() for task in running)  # all attached to one run
+
+        release.set()
+        await asyncio.gather(*running)
+        assert analyzer.analyze.await_count == 1
+        assert AnalysisService._in_flight == {}
+
+    @pytest.mark.asyncio
+    async def test_skips_analysis_leased_by_another_task(
+        self, stub_analysis_in, mock_analysis_repository, mock_analyzer
+    ):
+        mock_analysis_repository.load_analysis.return_value = Analysis(
+            result=None, metadata=None, status=None
+        )
+        mock_analysis_repository.acquire_lease.return_value = False
+        service = AnalysisService(
+            mock_analysis_repository, mock_analyzer, "test_endpoint_name"
+        )
+
+        await service.set_resource_from(stub_analysis_in)
+        await service.do()
+
+        mock_analyzer.analyze.assert_not_awaited()
+        assert mock_analysis_repository.store_analysis.call_count == 1  # placeholder
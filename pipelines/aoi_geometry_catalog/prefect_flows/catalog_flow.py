@@ -0,0 +1,30 @@
+from prefect import flow, task
+
+from pipelines.aoi_geometry_catalog import stages
+from pipelines.utils import s3_uri_exists
+
+
+@task
+def sync_layer(aoi_type: str, version: str, overwrite: bool = False) -> str:
+    uri = stages.layer_uri(stages.CATALOG_URI, aoi_type, version)
+    if not overwrite and s3_uri_exists(uri):
+        return uri
+    return stages.write_layer(stages.fetch_layer(aoi_type), uri)
+
+
+@flow(name="AOI geometry catalog")
+def aoi_geometry_catalog_flow(version: str, overwrite: bool = False) -> str:
+    """Snapshot the predefined AOI layers from the Data API into GeoParquet.
+
+    Args:
+        version: Catalog version, used in every layer's S3 path.
+        overwrite: If True, re-fetch layers that already exist for this version.
+
+    Returns:
+        The S3 URI of the catalog manifest.
+    """
+    for aoi_type in stages.LAYERS:
+        sync_layer.with_options(name=f"sync-{aoi_type}-geometries")(
+            aoi_type, version, overwrite=overwrite
+        )
+    return stages.write_manifest(stages.CATALOG_URI, version, list(stages.LAYERS))
@@ -0,0 +1,109 @@
+import json
+import os
+import urllib.parse
+import urllib.request
+from typing import Callable, Dict, List
+
+import fsspec
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+from pipelines.globals import ANALYTICS_BUCKET
+
+DATA_API_URL = "https://data-api.globalforestwatch.org"
+
+# The API reads the catalog from a local copy of this prefix
+# (see api/app/domain/repositories/aoi_geometry_catalog.py).
+CATALOG_URI = f"s3://{ANALYTICS_BUCKET}/aoi-geometry-catalog"
+MANIFEST_FILE = "manifest.json"
+
+# aoi_type -> (Data API dataset, id column). Must match the API's AOI types.
+LAYERS = {
+    "key_biodiversity_area": ("birdlife_key_biodiversity_areas", "sitrecid"),
+    "protected_area": ("wdpa_protected_areas", "wdpa_pid"),
+    "indigenous_land": ("landmark_ip_lc_and_indicative_poly", "landmark_id"),
+}
+
+# Small row groups keep the API's per-lookup reads small.
+ROW_GROUP_SIZE = 256
+PAGE_SIZE = 5000
+
+SendRequestType = Callable[[str, Dict[str, str]], Dict]
+
+
+def send_request_to_data_api(url: str, params: Dict[str, str]) -> Dict:
+    params = {**params, "x-api-key": os.environ["API_KEY"]}
+    with urllib.request.urlopen(f"{url}?{urllib.parse.urlencode(params)}") as response:
+        return json.loads(response.read())
+
+
+def fetch_layer(
+    aoi_type: str,
+    dataset_version: str = "latest",
+    send_request: SendRequestType = send_request_to_data_api,
+    page_size: int = PAGE_SIZE,
+) -> gpd.GeoDataFrame:
+    """Page through a Data API layer and return its ids, geometries and areas,
+    sorted by id."""
+    dataset, id_column = LAYERS[aoi_type]
+    url = f"{DATA_API_URL}/dataset/{dataset}/{dataset_version}/query"
+
+    pages: List[pd.DataFrame] = []
+    offset = 0
+    while True:
+        sql = (
+            f"select {id_column} as aoi_id, geom, gfw_area__ha from data "
+            f"order by {id_column} limit {page_size} offset {offset}"
+        )
+        response = send_request(url, {"sql": sql})
+        if "data" not in response:
+            raise ValueError(f"Unable to read {dataset} from Data API: {response}")
+        page = pd.DataFrame(
+            response["data"], columns=["aoi_id", "geom", "gfw_area__ha"]
+        )
+        pages.append(page)
+        if len(page) < page_size:
+            break
+        offset += page_size
+
+    df = pd.concat(pages, ignore_index=True)
+    return to_catalog_layer(df)
+
+
+def to_catalog_layer(df: pd.DataFrame) -> gpd.GeoDataFrame:
+    """Convert Data API rows (hex WKB ``geom``) to the catalog's layout."""
+    df = df.assign(aoi_id=df["aoi_id"].astype(str)).sort_values("aoi_id", kind="stable")
+    return gpd.GeoDataFrame(
+        {
+            "aoi_id": df["aoi_id"].to_numpy(),
+            "gfw_area__ha": df["gfw_area__ha"].fillna(0).astype(float).to_numpy(),
+        },
+        geometry=shapely.from_wkb(df["geom"].map(bytes.fromhex).to_numpy()),
+        crs="EPSG:4326",
+    )
+
+
+def layer_uri(catalog_uri: str, aoi_type: str, version: str) -> str:
+    return f"{catalog_uri}/{aoi_type}/{version}.parquet"
+
+
+def write_layer(layer: gpd.GeoDataFrame, uri: str) -> str:
+    layer.to_parquet(uri, index=False, row_group_size=ROW_GROUP_SIZE)
+    return uri
+
+
+def write_manifest(catalog_uri: str, version: str, aoi_types: List[str]) -> str:
+    """Point the catalog at ``version`` of each layer. Written last, so readers
+    never see a manifest referencing a layer that isn't there yet."""
+    manifest = {
+        aoi_type: {
+            "version": version,
+            "path": f"{aoi_type}/{version}.parquet",
+        }
+        for aoi_type in aoi_types
+    }
+    uri = f"{catalog_uri}/{MANIFEST_FILE}"
+    with fsspec.open(uri, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return uri
@@ -0,0 +1,107 @@
+"""Compare API-style admin queries against the old and the sorted results layout.
+
+Writes a synthetic admin results table twice, once the way results used to be
+written (``df.to_parquet``, in rollup order) and once with
+``write_sorted_parquet``, then times the ``WHERE aoi_id IN (...)`` queries the
+API runs against each through DuckDB.
+
+    python -m pipelines.benchmarks.admin_results_layout --rows 5000000
+
+Pass ``--directory s3://...`` to measure against S3 instead of local disk,
+where skipped row groups save round trips rather than just decoding. Needs
+duckdb, which is an API dependency rather than a pipelines one.
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from pipelines.prefect_flows.common_stages import write_sorted_parquet
+
+
+def synthetic_results(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    countries = [f"C{i:02d}" for i in range(200)]
+    aoi_ids = countries + [
+        f"{country}.{region}.{subregion}"
+        for country in countries
+        for region in range(1, 11)
+        for subregion in range(1, 21)
+    ]
+    return pd.DataFrame(
+        {
+            "aoi_id": rng.choice(aoi_ids, rows),
+            "aoi_type": "admin",
+            "tree_cover_loss_year": rng.integers(2001, 2025, rows),
+            "canopy_cover": rng.choice([10, 15, 20, 25, 30, 50, 75], rows),
+            "area_ha": rng.random(rows) * 100,
+        }
+    )
+
+
+def time_queries(run, queries, repeat):
+    latencies = []
+    for aoi_ids in queries:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run(aoi_ids)
+            latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies), max(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--ids-per-query", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--directory", default=None)
+    args = parser.parse_args()
+
+    directory = args.directory or tempfile.mkdtemp()
+    df = synthetic_results(args.rows)
+    current_uri = f"{directory}/current.parquet"
+    sorted_uri = f"{directory}/sorted.parquet"
+    df.to_parquet(current_uri, index=False)
+    write_sorted_parquet(df, sorted_uri)
+
+    rng = np.random.default_rng(1)
+    ids = df["aoi_id"].unique()
+    queries = [
+        list(rng.choice(ids, args.ids_per_query, replace=False))
+        for _ in range(args.queries)
+    ]
+
+    con = duckdb.connect()
+    if directory.startswith("s3://"):
+        con.execute("CREATE SECRET (TYPE s3, PROVIDER credential_chain)")
+
+    def duckdb_query(uri):
+        def run(aoi_ids):
+            return con.execute(
+                f"SELECT * FROM '{uri}' WHERE aoi_id IN ?", [aoi_ids]
+            ).fetchdf()
+
+        return run
+
+    results = {
+        "current layout, duckdb": time_queries(
+            duckdb_query(current_uri), queries, args.repeat
+        ),
+        "sorted layout, duckdb": time_queries(
+            duckdb_query(sorted_uri), queries, args.repeat
+        ),
+    }
+
+    print(f"{args.rows:,} rows, {args.ids_per_query} ids per query")
+    for name, (median, worst) in results.items():
+        print(f"{name:<30} median {median * 1000:8.1f} ms   max {worst * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
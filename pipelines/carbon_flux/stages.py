@@ -47,6 +47,7 @@ DATASETS = {
         "tiles_uri": f"s3://{DATA_LAKE_BUCKET}/gfw_forest_carbon_gross_emissions/{CARBON_GROSS_EMISSIONS_VERSION}/raster/epsg-4326/10/40000/Mg_CO2e_px-1/gdal-geotiff/tiles.geojson",
         "zarr_uri": f"s3://{ANALYTICS_BUCKET}/zarr/gfw-carbon-gross-emissions/{CARBON_GROSS_EMISSIONS_VERSION}/Mg_CO2e.zarr",
         "dtype": "float64",
+        "overview": "sum",
     },
 }
 
@@ -1,6 +1,13 @@
-from typing import Dict, List, Optional, Tuple
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
 
+import dask
+import dask.array
+import fsspec
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import xarray as xr
 from flox import ReindexArrayType, ReindexStrategy
 from flox.xarray import xarray_reduce
@@ -427,9 +434,163 @@ def save_results(df: pd.DataFrame, results_uri: str) -> str:
     return results_uri
 
 
+# Rows per row group of admin results. The rows are sorted by aoi_id, so each
+# row group covers a narrow range of ids and readers asking for a few AOIs can
+# skip the rest using the row group min/max statistics.
+RESULTS_ROW_GROUP_SIZE = 50_000
+
+
+def write_sorted_parquet(
+    df: pd.DataFrame,
+    results_uri: str,
+    row_group_size: int = RESULTS_ROW_GROUP_SIZE,
+    partition_by_country: bool = False,
+) -> None:
+    """Write admin results sorted by aoi_id.
+
+    String columns are dictionary encoded, since aoi_id and the class columns
+    repeat heavily.
+
+    With ``partition_by_country``, ``results_uri`` is a directory and each
+    country is written as its own hive partition, ``country=<ISO>/part-0.parquet``.
+    """
+    if partition_by_country:
+        countries = df["aoi_id"].str.split(".", n=1).str[0]
+        for country, country_df in df.groupby(countries, sort=True):
+            write_sorted_parquet(
+                country_df,
+                f"{results_uri}/country={country}/part-0.parquet",
+                row_group_size,
+            )
+        return
+
+    df = df.sort_values("aoi_id", kind="stable").reset_index(drop=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    string_columns = [
+        field.name
+        for field in table.schema
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type)
+    ]
+    with fsspec.open(results_uri, "wb") as f:
+        pq.write_table(
+            table,
+            f,
+            row_group_size=row_group_size,
+            use_dictionary=string_columns,
+            write_statistics=True,
+        )
+
+
+# Key of the grid in a chunk summary's parquet schema metadata. Should match
+# GRID_METADATA_KEY in api/app/domain/repositories/chunk_summary_repository.py
+CHUNK_SUMMARY_GRID_KEY = b"chunk_summary_grid"
+
+
+def _summarize_chunk(
+    chunk_row: int,
+    chunk_col: int,
+    groups: Dict[str, np.ndarray],
+    values: Dict[str, np.ndarray],
+) -> pd.DataFrame:
+    pixels = pd.DataFrame(
+        {
+            name: np.asarray(block).ravel()
+            for name, block in {**groups, **values}.items()
+        }
+    )
+    # keep nodata groups: a pixel missing from one layer still counts for
+    # queries that don't involve that layer
+    summary = (
+        pixels.groupby(list(groups), dropna=False)[list(values)].sum().reset_index()
+    )
+    summary.insert(0, "chunk_row", chunk_row)
+    summary.insert(1, "chunk_col", chunk_col)
+    return summary
+
+
+def summarize_chunks(
+    group_layers: Dict[str, xr.DataArray],
+    value_layers: Dict[str, xr.DataArray],
+) -> Tuple[pd.DataFrame, Dict]:
+    """Sum ``value_layers`` per chunk and per combination of ``group_layers`` values.
+
+    Chunks are those of the first group layer, which should be loaded from the
+    OTF zarr group so they match the chunks the API reads. Every other layer
+    is aligned and rechunked to it. Layers are keyed by the API field name of
+    their dataset, since the API reads the columns under those names.
+
+    Returns the summary rows and the grid the chunk indices refer to.
+    """
+    base = next(iter(group_layers.values()))
+    if "band" in base.dims:
+        base = base.squeeze("band", drop=True)
+
+    def align(layer: xr.DataArray) -> xr.DataArray:
+        if "band" in layer.dims:
+            layer = layer.squeeze("band", drop=True)
+        layer = layer.reindex_like(base, method="nearest", tolerance=1e-5)
+        return layer.chunk(base.chunksizes)
+
+    group_blocks = {
+        name: align(layer).data.to_delayed() for name, layer in group_layers.items()
+    }
+    value_blocks = {
+        name: align(layer).data.to_delayed() for name, layer in value_layers.items()
+    }
+    n_rows, n_cols = base.data.numblocks
+    summaries = [
+        dask.delayed(_summarize_chunk)(
+            row,
+            col,
+            {name: blocks[row, col] for name, blocks in group_blocks.items()},
+            {name: blocks[row, col] for name, blocks in value_blocks.items()},
+        )
+        for row in range(n_rows)
+        for col in range(n_cols)
+    ]
+    df = pd.concat(dask.compute(*summaries), ignore_index=True)
+
+    x_coords = base.x.values
+    y_coords = base.y.values
+    resolution = abs(float(x_coords[1] - x_coords[0]))
+    grid = {
+        "resolution": resolution,
+        "origin_x": float(x_coords[0]) - resolution / 2,
+        "origin_y": float(y_coords[0]) + resolution / 2,
+        "chunk_width": int(base.chunksizes["x"][0]),
+        "chunk_height": int(base.chunksizes["y"][0]),
+        "itemsize": base.dtype.itemsize,
+    }
+    return df, grid
+
+
+def save_chunk_summaries(
+    df: pd.DataFrame,
+    grid: Dict,
+    summary_uri: str,
+    row_group_size: int = RESULTS_ROW_GROUP_SIZE,
+) -> str:
+    """Write chunk summaries sorted by chunk, with the grid in the metadata.
+
+    The API reads a few chunks at a time, so sorting lets it skip every other
+    row group using the chunk_row/chunk_col statistics.
+    """
+    df = df.sort_values(["chunk_row", "chunk_col"], kind="stable")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {**(table.schema.metadata or {}), CHUNK_SUMMARY_GRID_KEY: json.dumps(grid)}
+    )
+    with fsspec.open(summary_uri, "wb") as f:
+        pq.write_table(table, f, row_group_size=row_group_size, write_statistics=True)
+    return summary_uri
+
+
 # _load_zarr and _save_parquet are the functions being mocked by the unit tests.
 def _save_parquet(df: pd.DataFrame, results_uri: str) -> None:
-    df.to_parquet(results_uri, index=False)
+    if "aoi_id" in df.columns:
+        write_sorted_parquet(df, results_uri)
+    else:
+        df.to_parquet(results_uri, index=False)
 
 
 def _load_zarr(zarr_uri, group=None):
@@ -523,5 +684,139 @@ def create_zarrs(
             overwrite=overwrite,
             dtype=cfg["dtype"],
         )
+        if "overview" in cfg:
+            create_overviews(
+                cfg["zarr_uri"],
+                cfg["overview"],
+                otf_chunk_size=otf_chunk_size,
+                overwrite=overwrite,
+            )
 
     return result_uris
+
+
+# Downsampling factors of the overview groups read by approximate analyses in
+# the API. Each must divide the otf chunk size.
+OVERVIEW_FACTORS = (4, 16, 80)
+
+
+def _block_mode(
+    block: np.ndarray, axis: Optional[Tuple[int, ...]] = None
+) -> np.ndarray:
+    """Most common non-NaN value of each coarsening window.
+
+    ``dask.array.coarsen`` reshapes every window into ``axis`` (all axes if
+    None); ties go to the smallest value, and all-NaN windows give NaN.
+    """
+    if axis is None:
+        axis = tuple(range(block.ndim))
+    windows = np.moveaxis(block, axis, tuple(range(-len(axis), 0)))
+    windows = windows.reshape(windows.shape[: -len(axis)] + (-1,))
+    flat = windows.reshape(-1, windows.shape[-1])
+    if np.issubdtype(flat.dtype, np.integer):
+        modes = _integer_window_modes(flat)
+    else:
+        modes = _sorted_window_modes(flat)
+    return modes.reshape(windows.shape[:-1])
+
+
+def _integer_window_modes(flat: np.ndarray) -> np.ndarray:
+    """Modes of each row of ``flat`` from per-row class counts."""
+    if flat.size == 0:
+        return np.empty(flat.shape[0], dtype=flat.dtype)
+    low = int(flat.min())
+    classes = int(flat.max()) - low + 1
+    if flat.shape[0] * classes > 64 * 1024**2:
+        return _sorted_window_modes(flat)
+
+    rows = np.arange(flat.shape[0], dtype=np.int64)[:, None] * classes
+    counts = np.bincount(
+        (rows + (flat.astype(np.int64) - low)).ravel(),
+        minlength=flat.shape[0] * classes,
+    ).reshape(flat.shape[0], classes)
+    # argmax takes the first maximum, i.e. the smallest tied value
+    return (counts.argmax(axis=1) + low).astype(flat.dtype)
+
+
+def _sorted_window_modes(flat: np.ndarray) -> np.ndarray:
+    """Modes of each row of ``flat`` from the run lengths of the sorted rows."""
+    ordered = np.sort(flat, axis=1)  # NaNs sort last
+    positions = np.arange(ordered.shape[1], dtype=np.int32)
+    run_starts = np.zeros(ordered.shape, dtype=np.int32)
+    run_starts[:, 1:] = np.where(ordered[:, 1:] != ordered[:, :-1], positions[1:], 0)
+    run_lengths = positions - np.maximum.accumulate(run_starts, axis=1) + 1
+    if np.issubdtype(ordered.dtype, np.floating):
+        run_lengths[np.isnan(ordered)] = 0
+
+    # runs are in ascending order, so the first longest is the smallest value
+    ends = run_lengths.argmax(axis=1)
+    rows = np.arange(ordered.shape[0])
+    modes = ordered[rows, ends]
+    if np.issubdtype(ordered.dtype, np.floating):
+        modes[run_lengths[rows, ends] == 0] = np.nan
+    return modes
+
+
+def create_overviews(
+    zarr_uri: str,
+    aggregation: str,
+    otf_chunk_size: int = 4_000,
+    factors: Iterable[int] = OVERVIEW_FACTORS,
+    overwrite: bool = False,
+) -> str:
+    """Write coarse overviews of a zarr's ``otf`` group as ``overview_{factor}``.
+
+    Each overview pixel covers ``factor`` x ``factor`` pixels of the otf group.
+    ``aggregation`` is ``"sum"`` for additive layers (area, emissions), so sums
+    over an overview match sums over the full data, or ``"mode"`` for
+    categorical layers, which keep their most common class. Rows and columns
+    past the last whole window are dropped.
+    """
+    if aggregation not in ("sum", "mode"):
+        raise ValueError(f"Unknown overview aggregation: {aggregation}")
+
+    band_data = None
+    for factor in factors:
+        if otf_chunk_size % factor:
+            raise ValueError(
+                f"Overview factor {factor} doesn't divide chunk size {otf_chunk_size}"
+            )
+        group = f"overview_{factor}"
+        if not overwrite and s3_uri_exists(f"{zarr_uri}/{group}/zarr.json"):
+            continue
+        if band_data is None:
+            band_data = xr.open_zarr(zarr_uri, group="otf").band_data
+        y_axis = band_data.get_axis_num("y")
+        x_axis = band_data.get_axis_num("x")
+        trimmed = band_data.isel(
+            y=slice(0, band_data.sizes["y"] // factor * factor),
+            x=slice(0, band_data.sizes["x"] // factor * factor),
+        )
+        if aggregation == "sum":
+            data = dask.array.coarsen(
+                np.nansum, trimmed.data, {y_axis: factor, x_axis: factor}
+            )
+        else:
+            data = dask.array.coarsen(
+                _block_mode, trimmed.data, {y_axis: factor, x_axis: factor}
+            ).astype(trimmed.dtype)
+        overview = xr.DataArray(
+            data,
+            dims=trimmed.dims,
+            coords={
+                **{
+                    name: coord
+                    for name, coord in trimmed.coords.items()
+                    if "y" not in coord.dims and "x" not in coord.dims
+                },
+                "y": trimmed.y.coarsen(y=factor).mean(),
+                "x": trimmed.x.coarsen(x=factor).mean(),
+            },
+            attrs=trimmed.attrs,
+            name="band_data",
+        )
+        overview_chunk_size = otf_chunk_size // factor
+        overview.chunk({"y": overview_chunk_size, "x": overview_chunk_size}).to_dataset(
+            name="band_data"
+        ).to_zarr(zarr_uri, mode="w", group=group)
+    return zarr_uri
@@ -10,6 +10,7 @@ from prefect import flow, task
 from prefect.logging import get_run_logger
 from shapely.geometry import box
 
+from pipelines.aoi_geometry_catalog.prefect_flows import catalog_flow
 from pipelines.carbon_flux.prefect_flows import carbon_flow
 from pipelines.disturbance.prefect_flows import dist_flow
 from pipelines.grasslands.prefect_flows import grasslands_flow
@@ -87,6 +88,13 @@ def run_integrated_alerts_update(
     return result_uris
 
 
+@flow
+def run_aoi_geometry_catalog_update(
+    version, overwrite=False, is_latest=False
+) -> list[str]:
+    return [catalog_flow.aoi_geometry_catalog_flow(version, overwrite=overwrite)]
+
+
 # flow_name -> land_ghg_inventory component to run; None means "run all".
 LAND_GHG_INVENTORY_COMPONENT = {
     "land_ghg_inventory_update": None,
@@ -133,6 +141,7 @@ class UpdateFlow(str, Enum):
     LAND_GHG_INVENTORY_AGRICULTURE_UPDATE = "land_ghg_inventory_agriculture_update"
     LAND_GHG_INVENTORY_MINERAL_SOIL_UPDATE = "land_ghg_inventory_mineral_soil_update"
     LAND_GHG_INVENTORY_ORGANIC_SOIL_UPDATE = "land_ghg_inventory_organic_soil_update"
+    AOI_GEOMETRY_CATALOG_UPDATE = "aoi_geometry_catalog_update"
 
 
 update_flows = {
@@ -144,6 +153,7 @@ update_flows = {
     UpdateFlow.LAND_GHG_INVENTORY_AGRICULTURE_UPDATE: run_land_ghg_inventory_update,
     UpdateFlow.LAND_GHG_INVENTORY_MINERAL_SOIL_UPDATE: run_land_ghg_inventory_update,
     UpdateFlow.LAND_GHG_INVENTORY_ORGANIC_SOIL_UPDATE: run_land_ghg_inventory_update,
+    UpdateFlow.AOI_GEOMETRY_CATALOG_UPDATE: run_aoi_geometry_catalog_update,
 }
 
 # flows that produce versioned outputs and therefore require an explicit version
@@ -154,6 +164,7 @@ VERSION_REQUIRED_FLOWS = (
     UpdateFlow.LAND_GHG_INVENTORY_AGRICULTURE_UPDATE,
     UpdateFlow.LAND_GHG_INVENTORY_MINERAL_SOIL_UPDATE,
     UpdateFlow.LAND_GHG_INVENTORY_ORGANIC_SOIL_UPDATE,
+    UpdateFlow.AOI_GEOMETRY_CATALOG_UPDATE,
 )
 
 # flow_name values that route into run_land_ghg_inventory_update
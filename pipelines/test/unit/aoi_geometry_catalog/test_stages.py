@@ -0,0 +1,59 @@
+import json
+from itertools import islice
+
+import pandas as pd
+import pyarrow.parquet as pq
+from shapely import from_wkb
+from shapely.geometry import box
+
+from pipelines.aoi_geometry_catalog import stages
+
+
+class FakeDataApi:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def __call__(self, url, params):
+        self.queries.append(params["sql"])
+        limit = int(params["sql"].split("limit ")[1].split(" ")[0])
+        offset = int(params["sql"].split("offset ")[1])
+        return {"data": list(islice(self.rows, offset, offset + limit))}
+
+
+def _row(aoi_id, geom, area):
+    return {"aoi_id": aoi_id, "geom": geom.wkb_hex, "gfw_area__ha": area}
+
+
+def test_fetch_layer_pages_through_the_layer_and_sorts_by_id():
+    data_api = FakeDataApi(
+        [
+            _row(3, box(2, 0, 3, 1), 30.0),
+            _row(1, box(0, 0, 1, 1), None),
+            _row(2, box(1, 0, 2, 1), 20.0),
+        ]
+    )
+
+    layer = stages.fetch_layer("protected_area", send_request=data_api, page_size=2)
+
+    assert len(data_api.queries) == 2
+    assert "from data order by wdpa_pid limit 2 offset 2" in data_api.queries[1]
+    assert layer["aoi_id"].tolist() == ["1", "2", "3"]
+    assert layer["gfw_area__ha"].tolist() == [0.0, 20.0, 30.0]
+    assert layer.geometry.iloc[0] == box(0, 0, 1, 1)
+
+
+def test_written_catalog_has_the_layout_the_api_reads(tmp_path):
+    layer = stages.to_catalog_layer(pd.DataFrame([_row("a", box(0, 0, 1, 1), 1.0)]))
+
+    uri = stages.layer_uri(str(tmp_path), "protected_area", "v1")
+    (tmp_path / "protected_area").mkdir()
+    stages.write_layer(layer, uri)
+    manifest_uri = stages.write_manifest(str(tmp_path), "v1", ["protected_area"])
+
+    table = pq.read_table(uri)
+    assert table.column("aoi_id").to_pylist() == ["a"]
+    assert from_wkb(table.column("geometry")[0].as_py()) == box(0, 0, 1, 1)
+    assert json.loads(open(manifest_uri).read()) == {
+        "protected_area": {"version": "v1", "path": "protected_area/v1.parquet"}
+    }
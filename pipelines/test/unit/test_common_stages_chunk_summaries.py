@@ -0,0 +1,70 @@
+import json
+
+import numpy as np
+import pyarrow.parquet as pq
+import xarray as xr
+
+from pipelines.prefect_flows.common_stages import (
+    CHUNK_SUMMARY_GRID_KEY,
+    save_chunk_summaries,
+    summarize_chunks,
+)
+
+
+def _layer(data, chunks=2):
+    # 1 degree pixels over x 0..6, y 4..0
+    coords = {"y": np.arange(3.5, 0, -1), "x": np.arange(0.5, 6)}
+    return xr.DataArray(np.asarray(data), coords=coords, dims=("y", "x")).chunk(chunks)
+
+
+def test_sums_values_per_chunk_and_group():
+    year = _layer(np.tile([1, 1, 2, 2, 3, 3], (4, 1)))
+    canopy = _layer([[0, 1] * 3] * 2 + [[np.nan] * 6] * 2)
+    area = _layer(np.arange(24, dtype=float).reshape(4, 6))
+
+    df, grid = summarize_chunks(
+        {"tree_cover_loss_year": year, "canopy_cover": canopy}, {"area_ha": area}
+    )
+
+    assert grid == {
+        "resolution": 1.0,
+        "origin_x": 0.0,
+        "origin_y": 4.0,
+        "chunk_width": 2,
+        "chunk_height": 2,
+        "itemsize": 8,
+    }
+    assert len(df[["chunk_row", "chunk_col"]].drop_duplicates()) == 6
+    # every pixel is counted once, including those with no canopy value
+    assert df["area_ha"].sum() == area.sum()
+
+    top_left = df[(df["chunk_row"] == 0) & (df["chunk_col"] == 0)]
+    assert top_left["canopy_cover"].tolist() == [0, 1]
+    assert top_left["area_ha"].tolist() == [0 + 6, 1 + 7]
+
+    bottom_right = df[(df["chunk_row"] == 1) & (df["chunk_col"] == 2)]
+    assert bottom_right["tree_cover_loss_year"].tolist() == [3]
+    assert bottom_right["canopy_cover"].isna().all()
+    assert bottom_right["area_ha"].tolist() == [16 + 17 + 22 + 23]
+
+
+def test_writes_summaries_sorted_by_chunk_with_grid(tmp_path):
+    year = _layer(np.ones((4, 6)))
+    area = _layer(np.ones((4, 6)))
+    df, grid = summarize_chunks({"tree_cover_loss_year": year}, {"area_ha": area})
+    uri = str(tmp_path / "summary.parquet")
+
+    save_chunk_summaries(df.iloc[::-1], grid, uri, row_group_size=2)
+
+    parquet = pq.ParquetFile(uri)
+    assert parquet.num_row_groups == 3
+    assert json.loads(parquet.schema_arrow.metadata[CHUNK_SUMMARY_GRID_KEY]) == grid
+    chunks = parquet.read().select(["chunk_row", "chunk_col"]).to_pylist()
+    assert [(c["chunk_row"], c["chunk_col"]) for c in chunks] == [
+        (0, 0),
+        (0, 1),
+        (0, 2),
+        (1, 0),
+        (1, 1),
+        (1, 2),
+    ]
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+import xarray as xr
+
+from pipelines.prefect_flows import common_stages
+from pipelines.prefect_flows.common_stages import _block_mode, create_overviews
+
+
+def test_block_mode_ignores_nan_and_prefers_smaller_values_on_ties():
+    windows = np.array(
+        [
+            [[1.0, 2.0], [2.0, np.nan]],
+            [[3.0, 1.0], [np.nan, np.nan]],
+            [[np.nan, np.nan], [np.nan, np.nan]],
+        ]
+    )
+
+    modes = _block_mode(windows, axis=(1, 2))
+
+    assert modes[:2].tolist() == [2.0, 1.0]
+    assert np.isnan(modes[2])
+
+
+def test_block_mode_matches_for_integer_and_float_windows():
+    windows = np.array(
+        [
+            [[2024, 2001], [2024, 2001]],
+            [[2003, 2003], [2002, 0]],
+            [[7, 7], [7, 7]],
+        ],
+        dtype="uint16",
+    )
+
+    modes = _block_mode(windows, axis=(1, 2))
+
+    assert modes.dtype == np.uint16
+    assert modes.tolist() == [2001, 2003, 7]
+    assert _block_mode(windows.astype(float), axis=(1, 2)).tolist() == modes.tolist()
+
+
+@pytest.fixture
+def otf_zarr(tmp_path, monkeypatch):
+    monkeypatch.setattr(common_stages, "s3_uri_exists", lambda uri: False)
+    uri = str(tmp_path / "layer.zarr")
+
+    def write(data):
+        # 1 degree pixels over x 0..5, y 5..0, with a band like the real zarrs
+        coords = {"band": [1], "y": np.arange(4.5, 0, -1), "x": np.arange(0.5, 5)}
+        layer = xr.DataArray(
+            np.asarray(data)[None], coords=coords, dims=("band", "y", "x")
+        )
+        layer.to_dataset(name="band_data").chunk(2).to_zarr(uri, group="otf", mode="w")
+        return uri
+
+    return write
+
+
+def test_sum_overview_keeps_block_totals(otf_zarr):
+    area = np.arange(25, dtype=float).reshape(5, 5)
+    uri = otf_zarr(area)
+
+    create_overviews(uri, "sum", otf_chunk_size=4, factors=(2,))
+
+    overview = xr.open_zarr(uri, group="overview_2").band_data
+    # the last row and column don't fill a whole window, so they're dropped
+    assert overview.squeeze("band").values.tolist() == [[12, 20], [52, 60]]
+    assert overview.y.values.tolist() == [4.0, 2.0]
+    assert overview.x.values.tolist() == [1.0, 3.0]
+    assert overview.chunks[-2:] == ((2,), (2,))
+
+
+def test_mode_overview_keeps_majority_class(otf_zarr):
+    uri = otf_zarr(
+        np.array(
+            [
+                [1, 1, 2, 2, 9],
+                [1, 3, 2, 2, 9],
+                [0, 0, 5, 5, 9],
+                [0, 4, 5, 6, 9],
+                [9, 9, 9, 9, 9],
+            ],
+            dtype="uint8",
+        )
+    )
+
+    create_overviews(uri, "mode", otf_chunk_size=4, factors=(2,))
+
+    overview = xr.open_zarr(uri, group="overview_2").band_data
+    assert overview.dtype == np.uint8
+    assert overview.squeeze("band").values.tolist() == [[1, 2], [0, 5]]
+
+
+def test_overview_factors_must_divide_chunks(otf_zarr):
+    uri = otf_zarr(np.ones((5, 5)))
+
+    with pytest.raises(ValueError):
+        create_overviews(uri, "sum", otf_chunk_size=4, factors=(3,))
@@ -0,0 +1,57 @@
+import pandas as pd
+import pyarrow.parquet as pq
+
+from pipelines.prefect_flows.common_stages import write_sorted_parquet
+
+
+def _results_df():
+    return pd.DataFrame(
+        {
+            "aoi_id": ["BRA.2", "AFG", "BRA.1", "AFG", "BRA.2", "BRA.1", "AFG"],
+            "aoi_type": ["admin"] * 7,
+            "tree_cover_loss_year": [2021, 2021, 2021, 2022, 2022, 2022, 2023],
+            "area_ha": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0],
+        }
+    )
+
+
+def test_writes_rows_sorted_by_aoi_id(tmp_path):
+    uri = str(tmp_path / "results.parquet")
+
+    write_sorted_parquet(_results_df(), uri, row_group_size=2)
+
+    parquet = pq.ParquetFile(uri)
+    assert parquet.num_row_groups == 4
+    assert parquet.read().column("aoi_id").to_pylist() == [
+        "AFG",
+        "AFG",
+        "AFG",
+        "BRA.1",
+        "BRA.1",
+        "BRA.2",
+        "BRA.2",
+    ]
+    # sorting keeps each id's rows in their original order
+    assert parquet.read().column("tree_cover_loss_year").to_pylist()[:3] == [
+        2021,
+        2022,
+        2023,
+    ]
+    assert "RLE_DICTIONARY" in parquet.metadata.row_group(0).column(0).encodings
+    # each row group covers a narrow aoi_id range readers can skip on
+    stats = parquet.metadata.row_group(3).column(0).statistics
+    assert (stats.min, stats.max) == ("BRA.2", "BRA.2")
+
+
+def test_partition_by_country_writes_one_file_per_country(tmp_path):
+    uri = str(tmp_path / "results")
+
+    write_sorted_parquet(_results_df(), uri, partition_by_country=True)
+
+    assert sorted(p.name for p in tmp_path.joinpath("results").iterdir()) == [
+        "country=AFG",
+        "country=BRA",
+    ]
+    rows = pq.read_table(f"{uri}/country=BRA/part-0.parquet").to_pandas()
+    assert rows["aoi_id"].tolist() == ["BRA.1", "BRA.1", "BRA.2", "BRA.2"]
+    assert rows["area_ha"].tolist() == [3.0, 6.0, 1.0, 5.0]
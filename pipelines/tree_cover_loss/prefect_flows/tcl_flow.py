@@ -2,6 +2,9 @@ import logging
 from typing import Optional, Tuple
 
 import numpy as np
+from prefect import flow
+from shapely.geometry import box
+
 from pipelines.carbon_flux.stages import DATASETS as CARBON_FLUX_DATASETS
 from pipelines.globals import (
     ANALYTICS_BUCKET,
@@ -16,8 +19,6 @@ from pipelines.globals import (
 from pipelines.prefect_flows import common_tasks
 from pipelines.tree_cover_loss.prefect_flows import tcl_tasks
 from pipelines.utils import s3_uri_exists
-from prefect import flow
-from shapely.geometry import box
 
 
 @flow(name="Tree Cover Loss")
@@ -49,7 +50,28 @@ def umd_tree_cover_loss_flow(
         overwrite=overwrite
     )
 
-    if bbox is not None:
+    # chunk summaries cover the whole grid, so only full runs write them
+    if bbox is None:
+        tcl_tasks.create_chunk_summaries.with_options(
+            name="create-tcl-chunk-summaries"
+        )(
+            tcl_zarr_uris["tree_cover_loss"],
+            pixel_area_uri=pixel_area_zarr_uri,
+            carbon_emissions_uri=CARBON_FLUX_DATASETS["carbon_gross_emissions"][
+                "zarr_uri"
+            ],
+            tree_cover_density_uri=tree_cover_density_2000_zarr_uri,
+            drivers_uri=tcl_zarr_uris["drivers"],
+            primary_forests_uri=umd_primary_forests_zarr_uri,
+            overwrite=overwrite,
+        )
+        tcl_tasks.create_static_overviews.with_options(name="create-static-overviews")(
+            pixel_area_uri=pixel_area_zarr_uri,
+            tree_cover_density_uri=tree_cover_density_2000_zarr_uri,
+            primary_forests_uri=umd_primary_forests_zarr_uri,
+            overwrite=overwrite,
+        )
+    else:
         bbox = box(*bbox)
 
     expected_groups = (
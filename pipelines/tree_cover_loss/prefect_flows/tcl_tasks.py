@@ -48,6 +48,42 @@ def load_data(
     )
 
 
+@task
+def create_chunk_summaries(
+    tree_cover_loss_uri: str,
+    pixel_area_uri: str,
+    carbon_emissions_uri: str,
+    tree_cover_density_uri: str,
+    drivers_uri: str,
+    primary_forests_uri: str,
+    overwrite: bool = False,
+) -> str:
+    return stages.create_chunk_summaries(
+        tree_cover_loss_uri,
+        pixel_area_uri,
+        carbon_emissions_uri,
+        tree_cover_density_uri,
+        drivers_uri,
+        primary_forests_uri,
+        overwrite=overwrite,
+    )
+
+
+@task
+def create_static_overviews(
+    pixel_area_uri: str,
+    tree_cover_density_uri: str,
+    primary_forests_uri: str,
+    overwrite: bool = False,
+) -> None:
+    return stages.create_static_overviews(
+        pixel_area_uri,
+        tree_cover_density_uri,
+        primary_forests_uri,
+        overwrite=overwrite,
+    )
+
+
 @task
 def setup_compute(
     datasets: Tuple,
@@ -3,6 +3,8 @@ from typing import Dict, Optional, Tuple
 import numpy as np
 import pandas as pd
 import xarray as xr
+from shapely.geometry import Polygon
+
 from pipelines.globals import (
     ANALYTICS_BUCKET,
     DATA_LAKE_BUCKET,
@@ -13,18 +15,21 @@ from pipelines.globals import (
 )
 from pipelines.prefect_flows.common_stages import (
     _load_zarr,
+    create_overviews,
 )
 from pipelines.prefect_flows.common_stages import create_zarrs as common_create_zarrs
 from pipelines.prefect_flows.common_stages import (
     numeric_to_alpha3,
     rollup_by_gadm_and_convert_to_aoi,
+    save_chunk_summaries,
+    summarize_chunks,
     symmetric_relative_difference,
 )
 from pipelines.repositories.google_earth_engine_dataset_repository import (
     GoogleEarthEngineDatasetRepository,
 )
 from pipelines.repositories.qc_feature_repository import QCFeaturesRepository
-from shapely.geometry import Polygon
+from pipelines.utils import s3_uri_exists
 
 PIPELINE_CHUNK_SIZE = 10_000
 OTF_CHUNK_SIZE = 4_000
@@ -38,16 +43,19 @@ DATASETS = {
         "tiles_uri": f"s3://{DATA_LAKE_BUCKET}/umd_tree_cover_loss/{TCL_VERSION}/raster/epsg-4326/10/40000/year/gdal-geotiff/tiles.geojson",
         "zarr_uri": f"s3://{ANALYTICS_BUCKET}/zarr/umd-tree-cover-loss/{TCL_VERSION}/year.zarr",
         "dtype": "uint8",
+        "overview": "mode",
     },
     "tree_cover_loss_from_fires": {
         "tiles_uri": f"s3://{DATA_LAKE_BUCKET}/umd_tree_cover_loss_from_fires/{TCLF_VERSION}/raster/epsg-4326/10/40000/year/gdal-geotiff/tiles.geojson",
         "zarr_uri": f"s3://{ANALYTICS_BUCKET}/zarr/umd-tree-cover-loss-from-fires/{TCLF_VERSION}/year.zarr",
         "dtype": "uint8",
+        "overview": "mode",
     },
     "drivers": {
         "tiles_uri": f"s3://{DATA_LAKE_BUCKET}/wri_google_tree_cover_loss_drivers/{DRIVERS_VERSION}/raster/epsg-4326/10/40000/category/gdal-geotiff/tiles.geojson",
         "zarr_uri": f"s3://{ANALYTICS_BUCKET}/zarr/wri-google-tree-cover-loss-drivers/{DRIVERS_VERSION}/category.zarr",
         "dtype": "uint8",
+        "overview": "mode",
     },
 }
 
@@ -62,6 +70,71 @@ def create_zarrs(overwrite: bool = False) -> Dict[str, str]:
     )
 
 
+# Should match the summary in api/app/domain/repositories/chunk_summary_repository.py
+CHUNK_SUMMARY_URI = (
+    f"s3://{ANALYTICS_BUCKET}/chunk-summaries/umd-tree-cover-loss/{TCL_VERSION}/"
+    "year_canopy_driver_primary.parquet"
+)
+
+
+def create_chunk_summaries(
+    tree_cover_loss_uri: str,
+    pixel_area_uri: str,
+    carbon_emissions_uri: str,
+    tree_cover_density_uri: str,
+    drivers_uri: str,
+    primary_forests_uri: str,
+    overwrite: bool = False,
+) -> str:
+    """Area and emissions per OTF chunk by loss year, canopy, driver and primary forest.
+
+    The API answers chunks lying fully inside a custom AOI from these sums
+    instead of reading their pixels. Columns use the API field names.
+    """
+    if not overwrite and s3_uri_exists(CHUNK_SUMMARY_URI):
+        return CHUNK_SUMMARY_URI
+
+    group_layers = {
+        "tree_cover_loss_year": _load_zarr(tree_cover_loss_uri, group="otf"),
+        "canopy_cover": _load_zarr(tree_cover_density_uri, group="otf"),
+        "tree_cover_loss_driver": _load_zarr(drivers_uri, group="otf"),
+        "is_primary_forest": _load_zarr(primary_forests_uri, group="otf"),
+    }
+    value_layers = {
+        "area_ha": _load_zarr(pixel_area_uri, group="otf"),
+        "carbon_emissions_MgCO2e": _load_zarr(carbon_emissions_uri, group="otf"),
+    }
+    df, grid = summarize_chunks(
+        {name: ds.band_data for name, ds in group_layers.items()},
+        {name: ds.band_data for name, ds in value_layers.items()},
+    )
+    return save_chunk_summaries(df, grid, CHUNK_SUMMARY_URI)
+
+
+def create_static_overviews(
+    pixel_area_uri: str,
+    tree_cover_density_uri: str,
+    primary_forests_uri: str,
+    overwrite: bool = False,
+) -> None:
+    """Overviews of the static layers that approximate TCL analyses read.
+
+    The API reads these together with the TCL, drivers and emissions
+    overviews written by ``create_zarrs``.
+    """
+    for uri, aggregation in [
+        (pixel_area_uri, "sum"),
+        (tree_cover_density_uri, "mode"),
+        (primary_forests_uri, "mode"),
+    ]:
+        create_overviews(
+            uri.rstrip("/"),
+            aggregation,
+            otf_chunk_size=OTF_CHUNK_SIZE,
+            overwrite=overwrite,
+        )
+
+
 def load_data(
     tree_cover_loss_uri: str,
     pixel_area_uri: Optional[str] = None,